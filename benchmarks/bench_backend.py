@@ -0,0 +1,466 @@
+"""
+Benchmarks for the Plugin backend in main.py.
+
+The plugin runs outside Decky Loader with a fake `decky` module, a stub yt-dlp that prints canned JSON
+lines after a configurable delay, and a local aiohttp server standing in for iTunes, GitHub and audio
+downloads. Synthetic music directories are generated for each requested size.
+
+    python benchmarks/bench_backend.py --files 10,1000,100000
+    python benchmarks/bench_backend.py --json before.json
+    python benchmarks/bench_backend.py --compare before.json
+
+With --compare, the run exits with status 1 when a median time or peak memory regressed by more than
+--threshold against the baseline.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import shutil
+import statistics
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
+import aiohttp
+from aiohttp import web
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+YTDLP_VERSION = "2099.01.01"
+AUDIO_PAYLOAD = bytes(random.Random(0).getrandbits(8) for _ in range(256 * 1024))
+LARGE_PAYLOAD = AUDIO_PAYLOAD * 32
+
+STUB_YTDLP = """#!{python}
+import json, os, sys, time
+
+delay = float(os.environ.get("BENCH_YTDLP_DELAY", "0.02"))
+args = sys.argv[1:]
+if "--version" in args:
+    print("{version}")
+    sys.exit(0)
+target = args[0]
+if target.startswith("ytsearch"):
+    count, _, term = target[len("ytsearch"):].partition(":")
+    for i in range(int(count or 1)):
+        time.sleep(delay)
+        video_id = ("%08x" % (hash(term) & 0xFFFFFFFF))[:7] + "%04d" % i
+        print(json.dumps({{"_type": "url", "id": video_id, "title": f"{{term}} {{i}}", "duration": 120,
+                          "thumbnails": [{{"url": "https://i.ytimg.com/vi/x/hqdefault.jpg"}}]}}), flush=True)
+else:
+    time.sleep(delay)
+    print(json.dumps({{"id": target, "title": target, "duration": 120,
+                      "url": f"https://rr1---sn.googlevideo.com/videoplayback?id={{target}}&expire=9999999999"}}))
+"""
+
+
+class FakeSettingsManager:
+    """
+    In-memory stand-in for Decky's SettingsManager.
+    """
+
+    defaults: dict = {}
+
+    def __init__(self, name: str, settings_directory: str | None = None):
+        self.path = os.path.join(settings_directory or ".", f"{name}.json")
+        self.settings = dict(self.defaults)
+
+    def read(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def getSetting(self, key: str, defaults=None):
+        return self.settings.get(key, defaults)
+
+    def setSetting(self, key: str, value):
+        self.settings[key] = value
+
+
+def install_fake_decky(root: Path):
+    """
+    Create the plugin directories under root and register fake `decky` and `settings` modules.
+    :param root: Path Benchmark working directory
+    :return: None
+    """
+    for name in ("plugin/bin", "runtime", "settings", "logs"):
+        (root / name).mkdir(parents=True, exist_ok=True)
+    decky = types.ModuleType("decky")
+    decky.DECKY_PLUGIN_DIR = str(root / "plugin")
+    decky.DECKY_PLUGIN_RUNTIME_DIR = str(root / "runtime")
+    decky.DECKY_PLUGIN_SETTINGS_DIR = str(root / "settings")
+    decky.DECKY_PLUGIN_LOG_DIR = str(root / "logs")
+    decky.logger = logging.getLogger("decky")
+    settings = types.ModuleType("settings")
+    settings.SettingsManager = FakeSettingsManager
+    sys.modules["decky"] = decky
+    sys.modules["settings"] = settings
+
+    ytdlp_path = root / "plugin" / "bin" / "yt-dlp"
+    ytdlp_path.write_text(STUB_YTDLP.format(python=sys.executable, version=YTDLP_VERSION))
+    ytdlp_path.chmod(0o755)
+
+
+def make_music_dir(music_path: Path, count: int, seed: int = 0) -> list[str]:
+    """
+    Fill the music directory with small files named like downloaded themes.
+    :param music_path: Path Music directory, emptied first
+    :param count: int Number of files
+    :param seed: int Random seed, so runs are comparable
+    :return: list[str] IDs of the created files
+    """
+    shutil.rmtree(music_path, ignore_errors=True)
+    music_path.mkdir(parents=True)
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits + "-_"
+    extensions = ("webm", "m4a", "mp3", "opus")
+    ids = []
+    for i in range(count):
+        stem = "".join(rng.choice(alphabet) for _ in range(11)) if i % 5 else f"itunes_{rng.randrange(10 ** 9)}"
+        (music_path / f"{stem}.{rng.choice(extensions)}").write_bytes(b"\0" * rng.randrange(64, 512))
+        ids.append(stem)
+    return ids
+
+
+async def start_upstream_server() -> tuple[web.AppRunner, str]:
+    """
+    Start the local server standing in for iTunes, GitHub and audio hosts.
+    :return: tuple[web.AppRunner, str] Runner and base URL
+    """
+
+    async def itunes_search(request: web.Request) -> web.Response:
+        limit = int(request.query.get("limit", 10))
+        term = request.query.get("term", "")
+        results = [
+            {
+                "trackId": 1000 + i,
+                "trackName": f"{term} {i}",
+                "artistName": "Artist",
+                "collectionName": "Album",
+                "previewUrl": f"{request.url.origin()}/audio/preview{i}.m4a",
+                "artworkUrl100": "https://is1-ssl.mzstatic.com/image/100x100bb.jpg",
+                "trackTimeMillis": 30000,
+            }
+            for i in range(limit)
+        ]
+        return web.json_response({"resultCount": len(results), "results": results})
+
+    async def github_release(_: web.Request) -> web.Response:
+        return web.json_response({"tag_name": YTDLP_VERSION, "assets": []})
+
+    async def audio(request: web.Request) -> web.StreamResponse:
+        if not request.match_info["name"].startswith("large"):
+            return web.Response(body=AUDIO_PAYLOAD, content_type="audio/mpeg")
+        # Streamed in pieces so this server, which shares the event loop, does not add to the lag
+        response = web.StreamResponse(headers={"Content-Type": "audio/mpeg"})
+        response.content_length = len(LARGE_PAYLOAD)
+        await response.prepare(request)
+        for start in range(0, len(LARGE_PAYLOAD), len(AUDIO_PAYLOAD)):
+            await response.write(LARGE_PAYLOAD[start:start + len(AUDIO_PAYLOAD)])
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_get("/search", itunes_search)
+    app.router.add_get("/repos/yt-dlp/yt-dlp/releases/latest", github_release)
+    app.router.add_get("/audio/{name}", audio)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+
+class RedirectSession:
+    """
+    Wraps a client session, sending iTunes and GitHub API requests to the local upstream server.
+    Only the parts of the ClientSession API used by the plugin are provided.
+    """
+
+    REDIRECTED_HOSTS = ("https://itunes.apple.com", "https://api.github.com")
+
+    def __init__(self, base_url: str):
+        self.session = aiohttp.ClientSession()
+        self.base_url = base_url
+
+    @property
+    def closed(self) -> bool:
+        return self.session.closed
+
+    def get(self, url, **kwargs):
+        url = str(url)
+        for host in self.REDIRECTED_HOSTS:
+            if url.startswith(host):
+                url = self.base_url + url[len(host):]
+        return self.session.get(url, **kwargs)
+
+    async def close(self):
+        await self.session.close()
+
+
+class BenchmarkRunner:
+    """
+    Times benchmark functions and records the results.
+    """
+
+    def __init__(self, repeat: int):
+        self.repeat = repeat
+        self.results: list[dict] = []
+
+    async def run(self, name: str, files: int, fn: Callable[[int], Awaitable], number: int = 1, repeat: int | None = None):
+        """
+        Time fn(i) `number` times per sample, then measure peak Python memory of one more call.
+        :param name: str Benchmark name
+        :param files: int Size of the music directory the benchmark ran against
+        :param fn: Callable Coroutine function taking the call index
+        :param number: int Calls per sample, for fast operations
+        :param repeat: int | None Samples, defaults to --repeat
+        :return: None
+        """
+        calls = 0
+        await fn(calls)
+        calls += 1
+        samples = []
+        for _ in range(repeat or self.repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                await fn(calls)
+                calls += 1
+            samples.append((time.perf_counter() - start) / number)
+        tracemalloc.start()
+        await fn(calls)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.record(name, files, samples, peak)
+
+    async def run_lag(self, name: str, files: int, fn: Callable[[int], Awaitable], interval: float = 0.005):
+        """
+        Measure how late the event loop wakes up from `interval` sleeps while fn(i) runs `repeat` times.
+        :param name: str Benchmark name
+        :param files: int Size of the music directory the benchmark ran against
+        :param fn: Callable Coroutine function taking the call index
+        :param interval: float Probe sleep in seconds
+        :return: None
+        """
+        loop = asyncio.get_running_loop()
+        samples = []
+
+        async def probe():
+            while True:
+                start = loop.time()
+                await asyncio.sleep(interval)
+                samples.append(max(loop.time() - start - interval, 0.0))
+
+        task = asyncio.create_task(probe())
+        try:
+            for i in range(self.repeat):
+                await fn(i)
+        finally:
+            task.cancel()
+        self.record(name, files, samples or [0.0], 0)
+
+    def record(self, name: str, files: int, samples: list[float], peak: int):
+        """
+        Store and print one result.
+        :param name: str Benchmark name
+        :param files: int Size of the music directory the benchmark ran against
+        :param samples: list[float] Durations in seconds
+        :param peak: int Peak Python memory in bytes
+        :return: None
+        """
+        samples.sort()
+        result = {
+            "name": name,
+            "files": files,
+            "median_ms": statistics.median(samples) * 1000,
+            "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+            "min_ms": samples[0] * 1000,
+            "peak_kib": peak / 1024,
+        }
+        self.results.append(result)
+        print(
+            f"{name:<34} {files:>7} {result['median_ms']:>10.3f} {result['p95_ms']:>10.3f} "
+            f"{result['min_ms']:>10.3f} {result['peak_kib']:>10.1f}"
+        )
+
+
+async def run_suite(root: Path, files: int, runner: BenchmarkRunner, base_url: str, assignments: int):
+    """
+    Start a plugin against a synthetic music directory of the given size and run every benchmark.
+    :param root: Path Benchmark working directory
+    :param files: int Number of files in the music directory
+    :param runner: BenchmarkRunner Result collector
+    :param base_url: str Base URL of the upstream server
+    :param assignments: int Number of theme assignments for the cache benchmarks
+    :return: None
+    """
+    import main
+
+    for path in (root / "runtime").iterdir():
+        if path.is_dir():
+            shutil.rmtree(path)
+        else:
+            path.unlink()
+    ids = make_music_dir(root / "runtime" / "music", files)
+    known_id = ids[len(ids) // 2]
+
+    plugin = main.Plugin()
+    plugin.http_session = RedirectSession(base_url)
+    start = time.perf_counter()
+    await plugin._main()
+    print(f"{'_main (startup)':<34} {files:>7} {(time.perf_counter() - start) * 1000:>10.3f}")
+
+    async def index_reload(_):
+        plugin.music_index.reload()
+
+    async def local_match_hit(_):
+        plugin.local_match(known_id)
+
+    async def local_match_miss(_):
+        plugin.local_match("doesnotexist")
+
+    async def search_local_music(_):
+        await plugin.search_local_music("ab", 100)
+
+    async def single_yt_url_local(_):
+        await plugin.single_yt_url(known_id)
+
+    async def single_yt_url_cached(_):
+        await plugin.single_yt_url("cachedvideo")
+
+    async def single_yt_url_resolve(i):
+        await plugin.single_yt_url(f"resolve{i:04d}")
+
+    async def search_yt_listing(i):
+        handle = await plugin.search_yt(f"bench term {i}")
+        while await plugin.next_yt_result(handle) is not None:
+            pass
+        await plugin.close_yt_search(handle)
+
+    async def search_itunes(i):
+        await plugin.search_itunes(f"bench term {i}", 10)
+
+    async def download_url(i):
+        await plugin.download_url(f"{base_url}/audio/download{i}.mp3", f"download{i:05d}")
+
+    import_source = root / "import.mp3"
+    import_source.write_bytes(LARGE_PAYLOAD)
+
+    async def concurrent_io(i):
+        await asyncio.gather(
+            *(plugin.import_local_music(str(import_source), f"import{i:03d}_{n}") for n in range(4)),
+            *(plugin.download_url(f"{base_url}/audio/large{i}_{n}.mp3", f"large{i:03d}_{n}") for n in range(4)),
+            plugin.search_local_music("ab", 100),
+        )
+
+    app_ids = [str(100000 + i) for i in range(assignments)]
+    await plugin.set_assignments({app_id: {"videoId": ids[i % len(ids)]} for i, app_id in enumerate(app_ids)})
+
+    async def resolve_many(_):
+        await plugin.resolve_many(app_ids[:50])
+
+    async def export_cache(i):
+        await plugin.set_assignments({app_ids[i % len(app_ids)]: {"volume": (i % 100) / 100}})
+        await plugin.export_cache()
+
+    async def import_cache(_):
+        await plugin.import_cache((await plugin.list_cache_backups())[0])
+
+    fast = max(1, min(1000, 100000 // max(files, 1)))
+    await runner.run("music_index.reload", files, index_reload, repeat=max(3, runner.repeat // 4))
+    await runner.run("local_match (hit)", files, local_match_hit, number=1000)
+    await runner.run("local_match (miss)", files, local_match_miss, number=1000)
+    await runner.run("search_local_music", files, search_local_music, number=fast)
+    await runner.run("single_yt_url (local file)", files, single_yt_url_local, number=100)
+    plugin.stream_url_cache.put("cachedvideo", "https://rr1---sn.googlevideo.com/videoplayback?expire=9999999999")
+    await runner.run("single_yt_url (cached stream)", files, single_yt_url_cached, number=100)
+    await runner.run("single_yt_url (stub yt-dlp)", files, single_yt_url_resolve)
+    await runner.run("search_yt + next_yt_result", files, search_yt_listing)
+    await runner.run("search_itunes (uncached)", files, search_itunes)
+    await runner.run("download_url (256 KiB)", files, download_url)
+    await runner.run_lag("loop lag (4 imports + 4 downloads)", files, concurrent_io)
+    await runner.run("resolve_many (50 apps)", files, resolve_many, number=10)
+    await runner.run(f"export_cache ({assignments} apps)", files, export_cache)
+    await runner.run(f"import_cache ({assignments} apps)", files, import_cache)
+
+    await plugin._unload()
+
+
+def compare(results: list[dict], baseline_path: str, threshold: float) -> bool:
+    """
+    Print the change against a baseline run and report regressions.
+    :param results: list[dict] Results of this run
+    :param baseline_path: str JSON file written by --json
+    :param threshold: float Allowed relative slowdown or memory growth, e.g. 0.25
+    :return: bool True if nothing regressed
+    """
+    with open(baseline_path) as file:
+        baseline = {(result["name"], result["files"]): result for result in json.load(file)["results"]}
+    ok = True
+    print(f"\n{'benchmark':<34} {'files':>7} {'time':>9} {'memory':>9}")
+    for result in results:
+        before = baseline.get((result["name"], result["files"]))
+        if before is None:
+            continue
+        time_change = result["median_ms"] / before["median_ms"] - 1 if before["median_ms"] else 0
+        memory_change = result["peak_kib"] / before["peak_kib"] - 1 if before["peak_kib"] else 0
+        flag = ""
+        if time_change > threshold or memory_change > threshold:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"{result['name']:<34} {result['files']:>7} {time_change:>+9.1%} {memory_change:>+9.1%}{flag}")
+    return ok
+
+
+async def run(args: argparse.Namespace) -> int:
+    root = Path(args.workdir or tempfile.mkdtemp(prefix="gtm-bench-"))
+    install_fake_decky(root)
+    os.environ["BENCH_YTDLP_DELAY"] = str(args.ytdlp_delay)
+    FakeSettingsManager.defaults = {"audio_analysis": False, "transcode_on_ingest": False}
+    sys.path.insert(0, str(REPO_DIR))
+    logging.getLogger("GameThemeMusic").setLevel(logging.DEBUG if args.verbose else logging.CRITICAL)
+
+    upstream, base_url = await start_upstream_server()
+    runner = BenchmarkRunner(args.repeat)
+    print(f"{'benchmark':<34} {'files':>7} {'median ms':>10} {'p95 ms':>10} {'min ms':>10} {'peak KiB':>10}")
+    try:
+        for files in args.files:
+            await run_suite(root, files, runner, base_url, args.assignments)
+    finally:
+        await upstream.cleanup()
+        if not args.workdir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"python": sys.version, "results": runner.results}, file, indent=2)
+    if args.compare and not compare(runner.results, args.compare, args.threshold):
+        return 1
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=lambda value: [int(n) for n in value.split(",")], default=[10, 1000, 10000],
+                        help="comma-separated music directory sizes (default: 10,1000,10000)")
+    parser.add_argument("--repeat", type=int, default=20, help="samples per benchmark (default: 20)")
+    parser.add_argument("--assignments", type=int, default=2000, help="theme assignments for cache benchmarks")
+    parser.add_argument("--ytdlp-delay", type=float, default=0.02, help="stub yt-dlp delay per line in seconds")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="compare against results written by --json")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed regression (default: 0.25)")
+    parser.add_argument("--workdir", help="keep the generated plugin directories here")
+    parser.add_argument("--verbose", action="store_true", help="show plugin logs")
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,42 @@
 import asyncio
 import base64
+import bisect
+import contextlib
 import datetime
+import functools
+import glob
+import gzip
+import heapq
+import inspect
+import itertools
 import json
 import logging
+import math
+import mmap
+import operator
 import os
 import platform
 import re
+import shutil
+import sqlite3
 import ssl
+import stat
+import struct
 import sys
+import threading
+import time
+import unicodedata
+import uuid
+import zipfile
+from collections import OrderedDict, deque
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from urllib.parse import parse_qs, quote, urlparse
 
 import aiohttp
 import certifi
+from aiohttp import web
 
 import decky
 from settings import SettingsManager
@@ -25,13 +50,2355 @@ logging.basicConfig(
 )
 logger = logging.getLogger("GameThemeMusic")
 
+AUDIO_MIME_TYPES = {
+    "mp3": "audio/mpeg",
+    "m4a": "audio/mp4",
+    "webm": "audio/webm",
+    "ogg": "audio/ogg",
+    "wav": "audio/wav",
+    "flac": "audio/flac",
+    "aac": "audio/aac",
+    "opus": "audio/opus"
+}
+AUDIO_EXTENSIONS = {f".{ext}" for ext in AUDIO_MIME_TYPES}
 
+
+class Metrics:
+    """
+    In-process timings, counters and gauges for the backend hot paths.
+    Timers keep the last `window` samples, so percentiles describe recent behaviour.
+    """
+
+    def __init__(self, window: int = 1024):
+        self.window = window
+        self.started = time.time()
+        self.timers: dict[str, dict] = {}
+        self.counters: dict[str, float] = {}
+        self.gauges: dict[str, Callable[[], float]] = {}
+
+    def observe(self, name: str, seconds: float):
+        """
+        Record one duration.
+        :param name: str Timer name
+        :param seconds: float Duration in seconds
+        :return: None
+        """
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = {"count": 0, "sum": 0.0, "max": 0.0, "samples": deque(maxlen=self.window)}
+        timer["count"] += 1
+        timer["sum"] += seconds
+        timer["max"] = max(timer["max"], seconds)
+        timer["samples"].append(seconds)
+
+    def count(self, name: str, value: float = 1):
+        """
+        Increase a counter.
+        :param name: str Counter name
+        :param value: float Amount to add
+        :return: None
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name: str, read: Callable[[], float]):
+        """
+        Register a value read when metrics are collected, like a queue depth.
+        :param name: str Gauge name
+        :param read: Callable Function returning the current value
+        :return: None
+        """
+        self.gauges[name] = read
+
+    @contextlib.contextmanager
+    def timer(self, name: str):
+        """
+        Time the enclosed block, also when it raises.
+        :param name: str Timer name
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self) -> dict:
+        """
+        Get every metric. Durations are in milliseconds.
+        :return: dict {"uptime", "timers", "counters", "hit_rates", "gauges"}
+        """
+        timers = {}
+        for name, timer in self.timers.items():
+            samples = sorted(timer["samples"])
+            timers[name] = {
+                "count": timer["count"],
+                "sum_ms": round(timer["sum"] * 1000, 3),
+                "max_ms": round(timer["max"] * 1000, 3),
+                **{
+                    f"p{quantile}_ms": round(samples[min(len(samples) - 1, len(samples) * quantile // 100)] * 1000, 3)
+                    for quantile in (50, 95, 99)
+                },
+            }
+        hit_rates = {}
+        for name, hits in self.counters.items():
+            if name.endswith(".hit"):
+                total = hits + self.counters.get(f"{name[:-4]}.miss", 0)
+                hit_rates[name[:-4]] = round(hits / total, 4) if total else None
+        gauges = {}
+        for name, read in self.gauges.items():
+            try:
+                gauges[name] = read()
+            except Exception as e:
+                logger.debug(f"Could not read gauge {name}: {e}")
+        return {
+            "uptime": round(time.time() - self.started, 1),
+            "timers": timers,
+            "counters": dict(self.counters),
+            "hit_rates": hit_rates,
+            "gauges": gauges,
+        }
+
+    def to_prometheus(self, prefix: str = "gamethememusic") -> str:
+        """
+        Render the metrics in the Prometheus text exposition format.
+        :param prefix: str Metric name prefix
+        :return: str Exposition text
+        """
+
+        def metric_name(name: str) -> str:
+            return f"{prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}"
+
+        lines = []
+        for name, timer in self.timers.items():
+            samples = sorted(timer["samples"])
+            metric = metric_name(name) + "_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            for quantile in (50, 95, 99):
+                value = samples[min(len(samples) - 1, len(samples) * quantile // 100)]
+                lines.append(f'{metric}{{quantile="0.{quantile}"}} {value:.6f}')
+            lines.append(f"{metric}_sum {timer['sum']:.6f}")
+            lines.append(f"{metric}_count {timer['count']}")
+        for name, value in self.counters.items():
+            metric = metric_name(name) + "_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        for name, value in self.snapshot()["gauges"].items():
+            metric = metric_name(name)
+            lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def instrument_rpc_methods(cls):
+    """
+    Class decorator timing every public coroutine method as `rpc.<name>` and counting its errors.
+    :param cls: type Plugin class
+    :return: type The same class
+    """
+
+    def instrument(name: str, method):
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            except Exception:
+                metrics.count(f"rpc.{name}.errors")
+                raise
+            finally:
+                metrics.observe(f"rpc.{name}", time.perf_counter() - start)
+
+        return wrapper
+
+    for name, method in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.iscoroutinefunction(method):
+            setattr(cls, name, instrument(name, method))
+    return cls
+
+
+class LibrarySearchIndex:
+    """
+    Inverted token index over the local library, for ranked search as you type.
+    Each document is an ID with weighted text fields (the file name, and tags when known).
+    Query tokens match index tokens exactly, by prefix, or by trigram similarity for typos,
+    and rare tokens count more than common ones. Safe to update from the I/O thread pool.
+    """
+
+    field_weights = {"name": 1.0, "title": 1.0, "artist": 0.7, "album": 0.5}
+    min_similarity = 0.5
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.documents: dict[str, dict[str, float]] = {}
+        self.postings: dict[str, dict[str, float]] = {}
+        self.vocabulary: list[str] = []
+        self.trigrams: dict[str, set[str]] = {}
+
+    @staticmethod
+    def tokenize(text: str) -> list[str]:
+        """
+        Split text into lower case ASCII-folded words, treating `_`, `-` and punctuation as spaces.
+        :param text: str Text
+        :return: list[str] Tokens
+        """
+        folded = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+        return re.findall(r"[a-z0-9]+", folded.lower())
+
+    @staticmethod
+    def _trigrams(token: str) -> set[str]:
+        padded = f"${token}$"
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def add(self, doc_id: str, fields: dict[str, str]):
+        """
+        Index a document, replacing its previous fields.
+        :param doc_id: str ID
+        :param fields: dict[str, str] Text per field name, see `field_weights`
+        :return: None
+        """
+        weights: dict[str, float] = {}
+        for field, text in fields.items():
+            for token in self.tokenize(text or ""):
+                weights[token] = max(weights.get(token, 0.0), self.field_weights.get(field, 0.5))
+        # Shorter names are closer matches for the same words
+        norm = 1 + 0.05 * len(weights)
+        weights = {token: weight / norm for token, weight in weights.items()}
+        with self.lock:
+            self._remove(doc_id)
+            self.documents[doc_id] = weights
+            for token, weight in weights.items():
+                posting = self.postings.get(token)
+                if posting is None:
+                    posting = self.postings[token] = {}
+                    bisect.insort(self.vocabulary, token)
+                    for trigram in self._trigrams(token):
+                        self.trigrams.setdefault(trigram, set()).add(token)
+                posting[doc_id] = weight
+
+    def remove(self, doc_id: str):
+        """
+        Drop a document from the index.
+        :param doc_id: str ID
+        :return: None
+        """
+        with self.lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id: str):
+        for token in self.documents.pop(doc_id, {}):
+            posting = self.postings[token]
+            posting.pop(doc_id, None)
+            if posting:
+                continue
+            del self.postings[token]
+            del self.vocabulary[bisect.bisect_left(self.vocabulary, token)]
+            for trigram in self._trigrams(token):
+                tokens = self.trigrams[trigram]
+                tokens.discard(token)
+                if not tokens:
+                    del self.trigrams[trigram]
+
+    def _match_tokens(self, term: str) -> dict[str, float]:
+        """
+        Find the index tokens a query token can stand for, with the quality of each match.
+        :param term: str Query token
+        :return: dict[str, float] {token: quality}, 1.0 for an exact match
+        """
+        matches = {}
+        start = bisect.bisect_left(self.vocabulary, term)
+        for token in itertools.islice(self.vocabulary, start, None):
+            if not token.startswith(term):
+                break
+            matches[token] = 1.0 if token == term else 0.5 + 0.4 * len(term) / len(token)
+        if len(term) >= 3:
+            term_trigrams = self._trigrams(term)
+            shared = {}
+            for trigram in term_trigrams:
+                for token in self.trigrams.get(trigram, ()):
+                    shared[token] = shared.get(token, 0) + 1
+            for token, count in shared.items():
+                # A padded token of n characters has n trigrams
+                similarity = 2 * count / (len(term_trigrams) + len(token))
+                if similarity >= self.min_similarity:
+                    matches[token] = max(matches.get(token, 0.0), 0.7 * similarity)
+        return matches
+
+    def search(self, query: str, limit: int) -> list[tuple[str, float]]:
+        """
+        Rank documents against a query. Documents matching more query tokens come first, then
+        higher scores. The last token of a query being typed is matched as a prefix, so partial
+        words work as you type.
+        :param query: str Search query
+        :param limit: int Maximum number of results
+        :return: list[tuple[str, float]] (ID, score) pairs, best first
+        """
+        terms = list(dict.fromkeys(self.tokenize(query)))
+        if not terms:
+            return []
+        with self.lock:
+            total = len(self.documents)
+            term_matches = []
+            for term in terms:
+                term_matches.append({
+                    token: quality * math.log(1 + total / len(self.postings[token]))
+                    for token, quality in self._match_tokens(term).items()
+                })
+            if len(terms) == 1:
+                return self._search_term(term_matches[0], limit)
+            # Enough documents match every token: only those need scoring
+            candidates = set.intersection(*(set().union(*map(self.postings.get, matches)) for matches in term_matches))
+            if len(candidates) < limit:
+                candidates = None
+            matched: dict[str, int] = {}
+            scores: dict[str, float] = {}
+            for matches in term_matches:
+                best: dict[str, float] = {}
+                for token, value in matches.items():
+                    posting = self.postings[token]
+                    if candidates is not None:
+                        posting = {doc_id: posting[doc_id] for doc_id in candidates & posting.keys()}
+                    for doc_id, weight in posting.items():
+                        if value * weight > best.get(doc_id, 0.0):
+                            best[doc_id] = value * weight
+                for doc_id, score in best.items():
+                    matched[doc_id] = matched.get(doc_id, 0) + 1
+                    scores[doc_id] = scores.get(doc_id, 0.0) + score
+            ranked = heapq.nlargest(limit, scores, key=lambda doc_id: (matched[doc_id], scores[doc_id]))
+            return [(doc_id, round(scores[doc_id], 3)) for doc_id in ranked]
+
+    def _search_term(self, matches: dict[str, float], limit: int) -> list[tuple[str, float]]:
+        """
+        Rank documents for a single query token. A document scores its best matching index token,
+        so the overall best are among the best of each index token's own postings.
+        :param matches: dict[str, float] {token: match quality times IDF}
+        :param limit: int Maximum number of results
+        :return: list[tuple[str, float]] (ID, score) pairs, best first
+        """
+        best: dict[str, float] = {}
+        for token, value in matches.items():
+            for doc_id, weight in heapq.nlargest(limit, self.postings[token].items(), key=operator.itemgetter(1)):
+                if value * weight > best.get(doc_id, 0.0):
+                    best[doc_id] = value * weight
+        ranked = heapq.nlargest(limit, best.items(), key=operator.itemgetter(1))
+        return [(doc_id, round(score, 3)) for doc_id, score in ranked]
+
+
+class TrackMetadataReader:
+    """
+    Reads the duration and title/artist/album tags of an audio file from its container headers,
+    without decoding any audio. Handles ID3 and MPEG audio frames, MP4 atoms, Ogg (Vorbis and Opus),
+    FLAC, Matroska/WebM and WAV. Blocking; missing fields are None.
+    """
+
+    max_block = 16 * 1024 * 1024
+    mp3_bitrates = {
+        1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+        2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    }
+    mp3_sample_rates = [44100, 48000, 32000]
+    comment_fields = {"title": "title", "artist": "artist", "album": "album"}
+
+    @classmethod
+    def read(cls, path: str) -> dict:
+        """
+        Read the metadata of a file.
+        :param path: str Path of the audio file
+        :return: dict {"format", "duration" (seconds), "title", "artist", "album"}
+        """
+        info = {"format": None, "duration": None, "title": None, "artist": None, "album": None}
+        with open(path, "rb") as file:
+            head = file.read(12)
+            file.seek(0)
+            size = os.fstat(file.fileno()).st_size
+            if head.startswith(b"fLaC"):
+                parser, info["format"] = cls._read_flac, "flac"
+            elif head.startswith(b"OggS"):
+                parser, info["format"] = cls._read_ogg, "ogg"
+            elif head[4:8] == b"ftyp":
+                parser, info["format"] = cls._read_mp4, "mp4"
+            elif head.startswith(b"\x1a\x45\xdf\xa3"):
+                parser, info["format"] = cls._read_matroska, "matroska"
+            elif head.startswith(b"RIFF") and head[8:12] == b"WAVE":
+                parser, info["format"] = cls._read_wav, "wav"
+            elif head.startswith(b"ID3") or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+                parser, info["format"] = cls._read_mp3, "mp3"
+            else:
+                return info
+            try:
+                parser(file, size, info)
+            except (struct.error, ValueError, IndexError, OverflowError) as e:
+                logger.debug(f"Stopped reading metadata of {path}: {e}")
+        if info["duration"] is not None:
+            # Garbage headers can give durations that round down to nothing
+            duration = round(info["duration"], 3)
+            info["duration"] = duration if duration > 0 else None
+        return info
+
+    @staticmethod
+    def _set_tag(info: dict, field: str, value: str | None):
+        value = (value or "").strip("\x00 \t\r\n")
+        if value and info.get(field) is None:
+            info[field] = value
+
+    @classmethod
+    def _read_comments(cls, data: bytes, info: dict):
+        """
+        Parse a Vorbis comment block (Ogg Vorbis, Opus, FLAC). Stops quietly at truncated data.
+        :param data: bytes Block starting at the vendor string length
+        :param info: dict Metadata to fill
+        :return: None
+        """
+        offset = 4 + struct.unpack_from("<I", data)[0]
+        count = struct.unpack_from("<I", data, offset)[0]
+        offset += 4
+        for _ in range(count):
+            if offset + 4 > len(data):
+                return
+            length = struct.unpack_from("<I", data, offset)[0]
+            key, _, value = data[offset + 4:offset + 4 + length].decode("utf-8", "replace").partition("=")
+            offset += 4 + length
+            if field := cls.comment_fields.get(key.lower()):
+                cls._set_tag(info, field, value)
+
+    # MP3
+
+    @classmethod
+    def _read_mp3(cls, file, size: int, info: dict):
+        audio_start = 0
+        header = file.read(10)
+        if header.startswith(b"ID3"):
+            tag_size = cls._syncsafe(header[6:10])
+            audio_start = 10 + tag_size + (10 if header[5] & 0x10 else 0)
+            cls._read_id3v2(header[3], header[5], file.read(min(tag_size, cls.max_block)), info)
+        audio_end = size
+        if size >= 128:
+            file.seek(size - 128)
+            trailer = file.read(128)
+            if trailer.startswith(b"TAG"):
+                audio_end -= 128
+                for field, start in (("title", 3), ("artist", 33), ("album", 63)):
+                    cls._set_tag(info, field, trailer[start:start + 30].decode("latin-1"))
+        file.seek(audio_start)
+        data = file.read(64 * 1024)
+        offset = data.find(b"\xff")
+        while 0 <= offset < len(data) - 4:
+            if data[offset + 1] & 0xE0 == 0xE0:
+                duration = cls._mp3_duration(data[offset:], audio_end - audio_start - offset)
+                if duration is not None:
+                    if info["duration"] is None:
+                        info["duration"] = duration
+                    return
+            offset = data.find(b"\xff", offset + 1)
+
+    @classmethod
+    def _mp3_duration(cls, frame: bytes, audio_size: int) -> float | None:
+        """
+        Get the duration from the first MPEG audio frame: its Xing/Info or VBRI frame count when present,
+        otherwise the bitrate of a constant bitrate stream.
+        :param frame: bytes Data starting at a frame sync
+        :param audio_size: int Bytes of audio from this frame on
+        :return: float | None Duration in seconds, None if this is not a valid Layer III frame header
+        """
+        version_bits, layer_bits = (frame[1] >> 3) & 3, (frame[1] >> 1) & 3
+        bitrate_index, rate_index = frame[2] >> 4, (frame[2] >> 2) & 3
+        if version_bits == 1 or layer_bits != 1 or bitrate_index in (0, 15) or rate_index == 3:
+            return None
+        mpeg1 = version_bits == 3
+        sample_rate = cls.mp3_sample_rates[rate_index] // (1 if mpeg1 else 2 if version_bits == 2 else 4)
+        samples_per_frame = 1152 if mpeg1 else 576
+        mono = frame[3] >> 6 == 3
+        xing = 4 + (17 if mono else 32) if mpeg1 else 4 + (9 if mono else 17)
+        if frame[xing:xing + 4] in (b"Xing", b"Info") and struct.unpack_from(">I", frame, xing + 4)[0] & 1:
+            return struct.unpack_from(">I", frame, xing + 8)[0] * samples_per_frame / sample_rate
+        if frame[36:40] == b"VBRI":
+            return struct.unpack_from(">I", frame, 50)[0] * samples_per_frame / sample_rate
+        bitrate = cls.mp3_bitrates[1 if mpeg1 else 2][bitrate_index] * 1000
+        return audio_size * 8 / bitrate
+
+    @staticmethod
+    def _syncsafe(data: bytes) -> int:
+        return (data[0] & 0x7F) << 21 | (data[1] & 0x7F) << 14 | (data[2] & 0x7F) << 7 | (data[3] & 0x7F)
+
+    @classmethod
+    def _read_id3v2(cls, version: int, flags: int, data: bytes, info: dict):
+        """
+        Read the text frames of an ID3v2.2/2.3/2.4 tag.
+        :param version: int Major version
+        :param flags: int Tag header flags
+        :param data: bytes Tag body after the 10 byte header
+        :param info: dict Metadata to fill
+        :return: None
+        """
+        if version == 2:
+            frames, id_size, header_size = {"TT2": "title", "TP1": "artist", "TAL": "album", "TLE": "length"}, 3, 6
+        else:
+            frames, id_size, header_size = {"TIT2": "title", "TPE1": "artist", "TALB": "album", "TLEN": "length"}, 4, 10
+        offset = 0
+        if flags & 0x40 and version >= 3:
+            # Extended header, its size excludes itself in 2.3
+            offset = cls._syncsafe(data[0:4]) if version == 4 else 4 + struct.unpack_from(">I", data)[0]
+        while offset + header_size <= len(data) and data[offset] != 0:
+            frame_id = data[offset:offset + id_size].decode("latin-1")
+            if version == 2:
+                frame_size = int.from_bytes(data[offset + 3:offset + 6], "big")
+            elif version == 4:
+                frame_size = cls._syncsafe(data[offset + 4:offset + 8])
+            else:
+                frame_size = struct.unpack_from(">I", data, offset + 4)[0]
+            body = data[offset + header_size:offset + header_size + frame_size]
+            offset += header_size + frame_size
+            field = frames.get(frame_id)
+            if field is None or not body:
+                continue
+            encoding = {0: "latin-1", 1: "utf-16", 2: "utf-16-be", 3: "utf-8"}.get(body[0], "latin-1")
+            text = body[1:].decode(encoding, "replace").split("\x00")[0]
+            if field == "length":
+                if text.strip().isdigit() and info["duration"] is None:
+                    info["duration"] = int(text) / 1000
+            else:
+                cls._set_tag(info, field, text)
+
+    # MP4
+
+    @classmethod
+    def _read_mp4(cls, file, size: int, info: dict):
+        for box_type, start, end in cls._mp4_boxes(file, 0, size):
+            if box_type == b"moov":
+                file.seek(start)
+                cls._read_mp4_moov(file.read(min(end - start, cls.max_block)), info)
+                return
+
+    @staticmethod
+    def _mp4_boxes(source, start: int, end: int):
+        """
+        Iterate over the boxes between two offsets of a file or bytes object.
+        :return: Iterator of (type, payload start, payload end)
+        """
+        offset = start
+        while offset + 8 <= end:
+            if isinstance(source, bytes):
+                header = source[offset:offset + 16]
+            else:
+                source.seek(offset)
+                header = source.read(16)
+            if len(header) < 8:
+                return
+            box_size, box_type = struct.unpack_from(">I4s", header)
+            header_size = 8
+            if box_size == 1:
+                box_size = struct.unpack_from(">Q", header, 8)[0]
+                header_size = 16
+            elif box_size == 0:
+                box_size = end - offset
+            if box_size < header_size:
+                return
+            yield box_type, offset + header_size, min(offset + box_size, end)
+            offset += box_size
+
+    @classmethod
+    def _read_mp4_moov(cls, moov: bytes, info: dict):
+        for box_type, start, end in cls._mp4_boxes(moov, 0, len(moov)):
+            if box_type == b"mvhd":
+                if moov[start] == 1:
+                    timescale, duration = struct.unpack_from(">IQ", moov, start + 20)
+                else:
+                    timescale, duration = struct.unpack_from(">II", moov, start + 12)
+                if timescale:
+                    info["duration"] = duration / timescale
+            elif box_type == b"udta":
+                for meta_type, meta_start, meta_end in cls._mp4_boxes(moov, start, end):
+                    if meta_type != b"meta":
+                        continue
+                    # ISO meta boxes carry version and flags, QuickTime ones start with a child box
+                    if moov[meta_start + 4:meta_start + 8] != b"hdlr":
+                        meta_start += 4
+                    for ilst_type, ilst_start, ilst_end in cls._mp4_boxes(moov, meta_start, meta_end):
+                        if ilst_type == b"ilst":
+                            cls._read_mp4_ilst(moov, ilst_start, ilst_end, info)
+
+    @classmethod
+    def _read_mp4_ilst(cls, moov: bytes, start: int, end: int, info: dict):
+        fields = {b"\xa9nam": "title", b"\xa9ART": "artist", b"aART": "artist", b"\xa9alb": "album"}
+        for item_type, item_start, item_end in cls._mp4_boxes(moov, start, end):
+            field = fields.get(item_type)
+            if field is None:
+                continue
+            for data_type, data_start, data_end in cls._mp4_boxes(moov, item_start, item_end):
+                # data box: 4 bytes type indicator, 4 bytes locale, then the value (1 = UTF-8)
+                if data_type == b"data" and struct.unpack_from(">I", moov, data_start)[0] == 1:
+                    cls._set_tag(info, field, moov[data_start + 8:data_end].decode("utf-8", "replace"))
+
+    # Ogg
+
+    @classmethod
+    def _read_ogg(cls, file, size: int, info: dict):
+        packets = []
+        packet = b""
+        serial = None
+        data = file.read(min(size, cls.max_block))
+        offset = 0
+        while len(packets) < 2 and data.startswith(b"OggS", offset):
+            page_serial = struct.unpack_from("<I", data, offset + 14)[0]
+            segments = data[offset + 26]
+            lacing = data[offset + 27:offset + 27 + segments]
+            position = offset + 27 + segments
+            if serial is None:
+                serial = page_serial
+            for length in lacing:
+                if page_serial == serial:
+                    packet += data[position:position + length]
+                    if length < 255:
+                        packets.append(packet)
+                        packet = b""
+                position += length
+            offset = position
+        if len(packet) and len(packets) < 2:
+            # Comment packet cut off by the read limit, the fields before the cut are still usable
+            packets.append(packet)
+        if not packets:
+            return
+        if packets[0].startswith(b"OpusHead"):
+            rate, skip = 48000, struct.unpack_from("<H", packets[0], 10)[0]
+            comments = packets[1][8:] if len(packets) > 1 and packets[1].startswith(b"OpusTags") else None
+        elif packets[0].startswith(b"\x01vorbis"):
+            rate, skip = struct.unpack_from("<I", packets[0], 12)[0], 0
+            comments = packets[1][7:] if len(packets) > 1 and packets[1].startswith(b"\x03vorbis") else None
+        else:
+            return
+        if comments:
+            cls._read_comments(comments, info)
+        file.seek(max(0, size - 64 * 1024))
+        tail = file.read()
+        offset = tail.rfind(b"OggS")
+        while offset >= 0:
+            if len(tail) >= offset + 18 and struct.unpack_from("<I", tail, offset + 14)[0] == serial:
+                granule = struct.unpack_from("<q", tail, offset + 6)[0]
+                if granule > 0 and rate:
+                    info["duration"] = (granule - skip) / rate
+                return
+            offset = tail.rfind(b"OggS", 0, offset)
+
+    # FLAC
+
+    @classmethod
+    def _read_flac(cls, file, size: int, info: dict):
+        file.seek(4)
+        while True:
+            header = file.read(4)
+            if len(header) < 4:
+                return
+            last, block_type = header[0] & 0x80, header[0] & 0x7F
+            length = int.from_bytes(header[1:4], "big")
+            if block_type == 0:
+                block = file.read(length)
+                sample_rate = int.from_bytes(block[10:13], "big") >> 4
+                total_samples = int.from_bytes(block[13:18], "big") & 0xFFFFFFFFF
+                if sample_rate and total_samples:
+                    info["duration"] = total_samples / sample_rate
+            elif block_type == 4:
+                cls._read_comments(file.read(min(length, cls.max_block)), info)
+            else:
+                file.seek(length, os.SEEK_CUR)
+            if last:
+                return
+
+    # Matroska / WebM
+
+    @staticmethod
+    def _ebml_vint(data: bytes, offset: int, keep_marker: bool) -> tuple[int | None, int]:
+        """
+        Decode an EBML variable length integer.
+        :return: tuple (value, length), value None for the reserved "unknown size"
+        """
+        first = data[offset]
+        length = 1
+        while length <= 8 and not first & (0x80 >> (length - 1)):
+            length += 1
+        if length > 8:
+            raise ValueError("invalid EBML variable length integer")
+        value = int.from_bytes(data[offset:offset + length], "big")
+        if keep_marker:
+            return value, length
+        value &= (1 << (7 * length)) - 1
+        return (None if value == (1 << (7 * length)) - 1 else value), length
+
+    @classmethod
+    def _ebml_elements(cls, data: bytes, start: int, end: int):
+        """
+        Iterate over EBML elements in a buffer.
+        :return: Iterator of (element ID, element start, data start, data size or None when unknown)
+        """
+        offset = start
+        while offset < end - 1:
+            element_id, id_length = cls._ebml_vint(data, offset, True)
+            size, size_length = cls._ebml_vint(data, offset + id_length, False)
+            data_start = offset + id_length + size_length
+            yield element_id, offset, data_start, size
+            if size is None:
+                return
+            offset = data_start + size
+
+    @classmethod
+    def _read_matroska(cls, file, size: int, info: dict):
+        """
+        Read the Info and Tags elements of the segment, found before the first cluster or through
+        the SeekHead (muxers often write tags after the audio).
+        """
+        segment_id, cluster_id, seek_head_id, info_id, tags_id = 0x18538067, 0x1F43B675, 0x114D9B74, 0x1549A966, 0x1254C367
+        head = file.read(min(size, 256 * 1024))
+        segment_start = None
+        for element_id, _, data_start, _ in cls._ebml_elements(head, 0, len(head)):
+            if element_id == segment_id:
+                segment_start = data_start
+                break
+        if segment_start is None:
+            return
+        positions = {}
+        for element_id, element_start, data_start, element_size in cls._ebml_elements(head, segment_start, len(head)):
+            if element_id == cluster_id or element_size is None:
+                break
+            if element_id == seek_head_id:
+                for _, _, seek_start, seek_size in cls._ebml_elements(head, data_start, data_start + element_size):
+                    target, position = None, None
+                    for child_id, _, child_start, child_size in cls._ebml_elements(head, seek_start, seek_start + seek_size):
+                        value = int.from_bytes(head[child_start:child_start + child_size], "big")
+                        if child_id == 0x53AB:
+                            target = value
+                        elif child_id == 0x53AC:
+                            position = value
+                    if target is not None and position is not None:
+                        positions.setdefault(target, segment_start + position)
+            elif element_id in (info_id, tags_id):
+                positions[element_id] = element_start
+        for element_id in (info_id, tags_id):
+            if element_id not in positions:
+                continue
+            file.seek(positions[element_id])
+            header = file.read(16)
+            found_id, id_length = cls._ebml_vint(header, 0, True)
+            element_size, size_length = cls._ebml_vint(header, id_length, False)
+            if found_id != element_id or element_size is None:
+                continue
+            file.seek(positions[element_id] + id_length + size_length)
+            body = file.read(min(element_size, cls.max_block))
+            if element_id == info_id:
+                cls._read_matroska_info(body, info)
+            else:
+                cls._read_matroska_tags(body, info)
+
+    @classmethod
+    def _read_matroska_info(cls, body: bytes, info: dict):
+        timecode_scale, duration = 1000000, None
+        for element_id, _, start, size in cls._ebml_elements(body, 0, len(body)):
+            value = body[start:start + size]
+            if element_id == 0x2AD7B1:
+                timecode_scale = int.from_bytes(value, "big")
+            elif element_id == 0x4489:
+                duration = struct.unpack(">f" if size == 4 else ">d", value)[0]
+            elif element_id == 0x7BA9:
+                cls._set_tag(info, "title", value.decode("utf-8", "replace"))
+        if duration is not None:
+            info["duration"] = duration * timecode_scale / 1e9
+
+    @classmethod
+    def _read_matroska_tags(cls, body: bytes, info: dict):
+        for tag_id, _, tag_start, tag_size in cls._ebml_elements(body, 0, len(body)):
+            if tag_id != 0x7373:
+                continue
+            for simple_id, _, simple_start, simple_size in cls._ebml_elements(body, tag_start, tag_start + tag_size):
+                if simple_id != 0x67C8:
+                    continue
+                name, value = None, None
+                for child_id, _, child_start, child_size in cls._ebml_elements(body, simple_start, simple_start + simple_size):
+                    if child_id == 0x45A3:
+                        name = body[child_start:child_start + child_size].decode("utf-8", "replace")
+                    elif child_id == 0x4487:
+                        value = body[child_start:child_start + child_size].decode("utf-8", "replace")
+                if name and (field := cls.comment_fields.get(name.lower())):
+                    cls._set_tag(info, field, value)
+
+    # WAV
+
+    @classmethod
+    def _read_wav(cls, file, size: int, info: dict):
+        fields = {b"INAM": "title", b"IART": "artist", b"IPRD": "album"}
+        byte_rate = None
+        offset = 12
+        while offset + 8 <= size:
+            file.seek(offset)
+            chunk_id, chunk_size = struct.unpack("<4sI", file.read(8))
+            if chunk_id == b"fmt ":
+                byte_rate = struct.unpack_from("<I", file.read(12), 8)[0]
+            elif chunk_id == b"data" and byte_rate:
+                info["duration"] = min(chunk_size, size - offset - 8) / byte_rate
+            elif chunk_id == b"LIST":
+                body = file.read(min(chunk_size, cls.max_block))
+                if body.startswith(b"INFO"):
+                    position = 4
+                    while position + 8 <= len(body):
+                        sub_id, sub_size = struct.unpack_from("<4sI", body, position)
+                        if field := fields.get(sub_id):
+                            cls._set_tag(info, field, body[position + 8:position + 8 + sub_size].decode("utf-8", "replace"))
+                        position += 8 + sub_size + (sub_size & 1)
+            offset += 8 + chunk_size + (chunk_size & 1)
+
+
+class MusicLibraryIndex:
+    """
+    In-memory index of the music directory, keyed by file stem (the theme ID).
+    Each entry stores the file name, extension, size and mtime so lookups never touch the disk.
+    The index reloads itself when the directory mtime changes behind our back.
+    Audio files are also kept in a LibrarySearchIndex, updated with each change.
+    It is used from the event loop and from I/O pool threads, so every public method holds `lock`.
+    """
+
+    def __init__(self, music_path: str):
+        self.music_path = music_path
+        self.entries: dict[str, dict] = {}
+        self.dir_mtime_ns: int | None = None
+        self.search = LibrarySearchIndex()
+        self.tags: dict[str, dict] = {}
+        self.lock = threading.RLock()
+
+    def _update_search(self, stem: str, entry: dict | None):
+        if entry is not None and f".{entry['extension'].lower()}" in AUDIO_EXTENSIONS:
+            tags = self.tags.get(stem, {})
+            self.search.add(stem, {"name": stem, **{field: tags.get(field) for field in ("title", "artist", "album")}})
+        else:
+            self.search.remove(stem)
+
+    def set_tags(self, tags: dict[str, dict]):
+        """
+        Make the title/artist/album tags of files searchable.
+        :param tags: dict[str, dict] {ID: track metadata}
+        :return: None
+        """
+        with self.lock:
+            for stem, track_tags in tags.items():
+                self.tags[stem] = track_tags
+                if stem in self.entries:
+                    self._update_search(stem, self.entries[stem])
+
+    @staticmethod
+    def _entry_from_stat(name: str, st: os.stat_result) -> dict:
+        return {
+            "filename": name,
+            "extension": os.path.splitext(name)[1].lstrip('.'),
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+        }
+
+    def _dir_mtime_ns(self) -> int | None:
+        try:
+            return os.stat(self.music_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload(self):
+        """
+        Rebuild the index from a single scan of the music directory.
+        :return: None
+        """
+        # Scan without the lock, so lookups from the loop do not wait for the disk.
+        # A file added meanwhile changes the directory mtime, which triggers another reload.
+        entries = {}
+        dir_mtime_ns = self._dir_mtime_ns()
+        try:
+            with os.scandir(self.music_path) as it:
+                for item in sorted(it, key=lambda e: e.name):
+                    try:
+                        if not item.is_file():
+                            continue
+                        stem = os.path.splitext(item.name)[0]
+                        if stem in entries:
+                            logger.warning(f"Multiple local matches found for ID {stem}: {entries[stem]['filename']}, {item.name}")
+                            continue
+                        entries[stem] = self._entry_from_stat(item.name, item.stat())
+                    except OSError as e:
+                        logger.debug(f"Skipping inaccessible item {item.path}: {e}")
+        except FileNotFoundError:
+            logger.warning(f"Music path does not exist: {self.music_path}")
+        with self.lock:
+            for stem in self.entries.keys() - entries.keys():
+                self.search.remove(stem)
+            for stem, entry in entries.items():
+                previous = self.entries.get(stem)
+                if previous is None or previous["filename"] != entry["filename"]:
+                    self._update_search(stem, entry)
+            self.entries = entries
+            self.dir_mtime_ns = dir_mtime_ns
+            logger.info(f"Indexed {len(entries)} files in {self.music_path}")
+
+    def _reload_if_changed(self):
+        if self._dir_mtime_ns() != self.dir_mtime_ns:
+            logger.debug("Music directory changed on disk, reloading index")
+            self.reload()
+
+    def get(self, stem: str) -> dict | None:
+        """
+        Get the index entry for an ID.
+        :param stem: str ID (file name without extension)
+        :return: dict | None Entry or None if not indexed
+        """
+        self._reload_if_changed()
+        with self.lock:
+            return self.entries.get(stem)
+
+    def get_path(self, stem: str) -> str | None:
+        """
+        Get the full path of the file indexed for an ID.
+        :param stem: str ID (file name without extension)
+        :return: str | None Path or None if not indexed
+        """
+        entry = self.get(stem)
+        if entry is None:
+            return None
+        return os.path.join(self.music_path, entry["filename"])
+
+    def values(self) -> list[dict]:
+        """
+        Get all index entries.
+        :return: list Entries in file name order
+        """
+        self._reload_if_changed()
+        with self.lock:
+            return list(self.entries.values())
+
+    def find(self, query: str, limit: int) -> list[tuple[dict, float]]:
+        """
+        Search the audio files by name (and tags), best match first.
+        :param query: str Search query
+        :param limit: int Maximum number of results
+        :return: list[tuple[dict, float]] (entry, score) pairs
+        """
+        self._reload_if_changed()
+        with self.lock:
+            entries = self.entries
+            return [(entries[stem], score) for stem, score in self.search.search(query, limit) if stem in entries]
+
+    def add(self, file_path: str | Path):
+        """
+        Add or update a single file in the index.
+        :param file_path: str | Path Path of a file inside the music directory
+        :return: None
+        """
+        with self.lock:
+            path = Path(file_path)
+            try:
+                self.entries[path.stem] = self._entry_from_stat(path.name, path.stat())
+            except OSError as e:
+                logger.warning(f"Could not index {path}: {e}")
+                self.entries.pop(path.stem, None)
+            self._update_search(path.stem, self.entries.get(path.stem))
+            self.dir_mtime_ns = self._dir_mtime_ns()
+
+    def refresh(self, stem: str):
+        """
+        Re-index the file for an ID whose extension is not known in advance (e.g. yt-dlp output).
+        :param stem: str ID (file name without extension)
+        :return: None
+        """
+        with self.lock:
+            self.entries.pop(stem, None)
+            for match in sorted(Path(self.music_path).glob(f"{glob.escape(stem)}.*")):
+                if match.stem == stem and match.is_file():
+                    self.add(match)
+                    return
+            self.search.remove(stem)
+            self.dir_mtime_ns = self._dir_mtime_ns()
+
+    def remove(self, stem: str):
+        """
+        Remove an ID from the index.
+        :param stem: str ID (file name without extension)
+        :return: None
+        """
+        with self.lock:
+            self.entries.pop(stem, None)
+            self.tags.pop(stem, None)
+            self.search.remove(stem)
+            self.dir_mtime_ns = self._dir_mtime_ns()
+
+
+YTDLP_WORKER_SCRIPT = r'''
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+sys.path.insert(0, sys.argv[1])
+import yt_dlp  # noqa: E402
+
+# Keep the real stdout for the protocol and send anything yt-dlp prints to stderr
+out = os.fdopen(os.dup(1), "w")
+os.dup2(2, 1)
+out_lock = threading.Lock()
+jobs = queue.Queue()
+cancelled = set()
+STRIP_KEYS = ("formats", "thumbnails", "automatic_captions", "subtitles", "heatmap", "requested_formats")
+
+
+def send(msg):
+    with out_lock:
+        out.write(json.dumps(msg) + "\n")
+        out.flush()
+
+
+def read_requests():
+    for line in sys.stdin:
+        try:
+            req = json.loads(line)
+        except ValueError:
+            continue
+        if req.get("op") == "cancel":
+            cancelled.add(req.get("target"))
+        else:
+            jobs.put(req)
+    jobs.put(None)
+
+
+class Logger:
+    def debug(self, msg):
+        pass
+
+    def info(self, msg):
+        pass
+
+    def warning(self, msg):
+        sys.stderr.write(f"{msg}\n")
+
+    def error(self, msg):
+        sys.stderr.write(f"{msg}\n")
+
+
+def slim(ydl, info):
+    info = ydl.sanitize_info(info)
+    for key in STRIP_KEYS:
+        info.pop(key, None)
+    return info
+
+
+def progress_hook(job_id):
+    last = 0.0
+
+    def hook(status):
+        nonlocal last
+        now = time.monotonic()
+        if status.get("status") == "downloading" and now - last < 0.5:
+            return
+        last = now
+        total = status.get("total_bytes") or status.get("total_bytes_estimate")
+        send({"id": job_id, "progress": {
+            "downloaded": int(status.get("downloaded_bytes") or 0),
+            "total": int(total) if total else None,
+        }})
+    return hook
+
+
+def run(req):
+    opts = dict(req.get("opts") or {})
+    opts.update(quiet=True, no_warnings=True, noprogress=True, logger=Logger())
+    if req["op"] == "download":
+        opts["progress_hooks"] = [progress_hook(req["id"])]
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        if req["op"] == "extract":
+            return slim(ydl, ydl.extract_info(req["url"], download=False))
+        if req["op"] == "download":
+            return ydl.download([req["url"]])
+        if req["op"] == "search":
+            listing = ydl.extract_info(req["url"], download=False, process=False)
+            max_duration = req.get("max_duration")
+            for entry in listing.get("entries") or []:
+                if req["id"] in cancelled:
+                    break
+                duration = entry.get("duration")
+                if max_duration and duration and duration >= max_duration:
+                    continue
+                if req.get("flat"):
+                    send({"id": req["id"], "entry": entry})
+                    continue
+                try:
+                    info = ydl.extract_info(entry.get("url") or entry["id"], download=False)
+                except Exception as e:
+                    sys.stderr.write(f"Skipping search entry {entry.get('id')}: {e}\n")
+                    continue
+                if info is not None:
+                    send({"id": req["id"], "entry": slim(ydl, info)})
+            return None
+        raise ValueError(f"Unknown op {req['op']}")
+
+
+threading.Thread(target=read_requests, daemon=True).start()
+send({"ready": True, "version": yt_dlp.version.__version__})
+while (job := jobs.get()) is not None:
+    try:
+        send({"id": job["id"], "done": True, "result": run(job)})
+    except Exception as e:
+        send({"id": job["id"], "error": str(e)})
+    cancelled.discard(job["id"])
+'''
+
+
+YTDLP_PROGRESS_PREFIX = "[progress]"
+YTDLP_PROGRESS_RE = re.compile(re.escape(YTDLP_PROGRESS_PREFIX) + r" (\d+(?:\.\d+)?) (\d+(?:\.\d+)?|NA)")
+
+
+class YtDlpWorkerError(Exception):
+    """Raised when a yt-dlp worker cannot be started or reached."""
+
+
+class YtDlpJobError(Exception):
+    """Raised when yt-dlp reports an error for a job run by a worker."""
+
+
+class DownloadIntegrityError(Exception):
+    """Raised when a downloaded file does not match the length announced by the server."""
+
+
+class YtDlpDownloadError(Exception):
+    """Raised when yt-dlp fails to download the audio of a video."""
+
+
+class YtDlpJob:
+    """
+    A single request sent to a yt-dlp worker.
+    Entries streamed by the worker are queued until read with `next`.
+    Download progress updates are passed to `on_progress` as they are read.
+    """
+
+    def __init__(self, worker: "YtDlpWorker", job_id: int):
+        self.worker = worker
+        self.job_id = job_id
+        self.messages: asyncio.Queue = asyncio.Queue()
+        self.finished = False
+        self.result_value = None
+        self.on_progress: Callable[[dict], None] | None = None
+
+    async def next(self) -> dict | None:
+        """
+        Wait for the next streamed entry.
+        :return: dict | None Entry, or None once the job is done
+        """
+        if self.finished:
+            return None
+        msg = await self.messages.get()
+        while "progress" in msg:
+            if self.on_progress is not None:
+                self.on_progress(msg["progress"])
+            msg = await self.messages.get()
+        if "entry" in msg:
+            return msg["entry"]
+        self.finished = True
+        if "error" in msg:
+            raise YtDlpJobError(msg["error"])
+        self.result_value = msg.get("result")
+        return None
+
+    async def result(self):
+        """
+        Wait for the job to finish, discarding any streamed entries.
+        :return: Job result sent by the worker
+        """
+        while await self.next() is not None:
+            pass
+        return self.result_value
+
+    async def cancel(self):
+        """
+        Ask the worker to stop the job early. Safe to call on finished jobs.
+        :return: None
+        """
+        if not self.finished:
+            await self.worker.send({"op": "cancel", "target": self.job_id})
+
+
+class YtDlpWorker:
+    """
+    A long-lived Python process that imports yt-dlp once and runs JSON-line requests over stdin/stdout.
+    """
+
+    def __init__(self, pool: "YtDlpWorkerPool"):
+        self.pool = pool
+        self.process: asyncio.subprocess.Process | None = None
+        self.jobs: dict[int, YtDlpJob] = {}
+        self.jobs_done = 0
+        self.last_used = time.monotonic()
+        self.tasks: list[asyncio.Task] = []
+
+    @property
+    def busy(self) -> bool:
+        return len(self.jobs) > 0
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self):
+        """
+        Start the worker process and wait until yt-dlp is imported.
+        :return: None
+        """
+        start = time.perf_counter()
+        self.process = await asyncio.create_subprocess_exec(
+            self.pool.python_path,
+            "-c",
+            YTDLP_WORKER_SCRIPT,
+            self.pool.module_path,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=10 * 1024 ** 2,
+            env=self.pool.env,
+            **self.pool.subprocess_flags,
+        )
+        self.tasks.append(asyncio.create_task(self._log_stderr()))
+        try:
+            line = await asyncio.wait_for(self.process.stdout.readline(), timeout=60)
+            ready = json.loads(line) if line else {}
+        except (TimeoutError, asyncio.TimeoutError, json.JSONDecodeError):
+            ready = {}
+        if not ready.get("ready"):
+            await self.stop()
+            raise YtDlpWorkerError("yt-dlp worker failed to start")
+        metrics.observe("ytdlp.worker_start", time.perf_counter() - start)
+        logger.info(f"yt-dlp worker started (pid {self.process.pid}, yt-dlp {ready.get('version')})")
+        self.tasks.append(asyncio.create_task(self._read_messages()))
+
+    async def _log_stderr(self):
+        async for line in self.process.stderr:
+            logger.debug(f"yt-dlp worker: {line.decode(errors='replace').rstrip()}")
+
+    async def _read_messages(self):
+        async for line in self.process.stdout:
+            try:
+                msg = json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.error(f"Error parsing yt-dlp worker message: {e}")
+                continue
+            job = self.jobs.get(msg.get("id"))
+            if job is None:
+                continue
+            job.messages.put_nowait(msg)
+            if "entry" not in msg and "progress" not in msg:
+                self._finish(job)
+        for job in list(self.jobs.values()):
+            job.messages.put_nowait({"error": "yt-dlp worker exited"})
+            self._finish(job)
+
+    def _finish(self, job: YtDlpJob):
+        self.jobs.pop(job.job_id, None)
+        self.jobs_done += 1
+        self.last_used = time.monotonic()
+        self.pool.release(self)
+
+    async def send(self, msg: dict):
+        if not self.alive:
+            raise YtDlpWorkerError("yt-dlp worker is not running")
+        self.process.stdin.write(f"{json.dumps(msg)}\n".encode())
+        await self.process.stdin.drain()
+
+    async def submit(self, job_id: int, op: str, params: dict) -> YtDlpJob:
+        job = YtDlpJob(self, job_id)
+        self.jobs[job_id] = job
+        self.last_used = time.monotonic()
+        try:
+            await self.send({"id": job_id, "op": op, **params})
+        except Exception:
+            self.jobs.pop(job_id, None)
+            raise
+        return job
+
+    async def stop(self):
+        """
+        Terminate the worker process.
+        :return: None
+        """
+        if self.alive:
+            self.process.terminate()
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout=5)
+            except (TimeoutError, asyncio.TimeoutError):
+                logger.warning("yt-dlp worker did not terminate in time, killing it")
+                self.process.kill()
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+
+
+class YtDlpWorkerPool:
+    """
+    Lazily started pool of yt-dlp workers. Each worker runs one job at a time and is
+    recycled after `max_jobs` jobs or after being idle for `idle_timeout` seconds.
+    When a worker fails to start, the pool reports itself unavailable (callers use the yt-dlp
+    binary) for a back-off that doubles with each consecutive failure, up to `max_retry_delay`.
+    """
+
+    def __init__(self, python_path: str | None, module_path: str | None, env: dict, subprocess_flags: dict,
+                 size: int = 2, max_jobs: int = 50, idle_timeout: float = 300):
+        self.python_path = python_path
+        self.module_path = module_path
+        self.env = env
+        self.subprocess_flags = subprocess_flags
+        self.size = size
+        self.max_jobs = max_jobs
+        self.idle_timeout = idle_timeout
+        self.workers: list[YtDlpWorker] = []
+        self.starting = 0
+        self.next_job_id = 0
+        self.condition = asyncio.Condition()
+        self.reaper: asyncio.Task | None = None
+        self.start_failures = 0
+        self.retry_at = 0.0
+        self.retry_delay = 30.0
+        self.max_retry_delay = 1800.0
+
+    @property
+    def available(self) -> bool:
+        return (
+            self.python_path is not None
+            and self.module_path is not None
+            and time.monotonic() >= self.retry_at
+        )
+
+    async def _acquire(self) -> YtDlpWorker:
+        async with self.condition:
+            while True:
+                for worker in self.workers:
+                    if worker.alive and not worker.busy:
+                        return worker
+                if len(self.workers) + self.starting < self.size:
+                    break
+                await self.condition.wait()
+            self.starting += 1
+        worker = YtDlpWorker(self)
+        try:
+            await worker.start()
+        except Exception as e:
+            self.start_failures += 1
+            delay = min(self.retry_delay * 2 ** (self.start_failures - 1), self.max_retry_delay)
+            self.retry_at = time.monotonic() + delay
+            logger.error(f"Could not start yt-dlp worker, using the yt-dlp binary for {delay:.0f}s: {e}")
+            raise YtDlpWorkerError(str(e)) from e
+        finally:
+            async with self.condition:
+                self.starting -= 1
+                self.condition.notify_all()
+        self.start_failures = 0
+        self.workers.append(worker)
+        if self.reaper is None or self.reaper.done():
+            self.reaper = asyncio.create_task(self._reap_idle())
+        return worker
+
+    def release(self, worker: YtDlpWorker):
+        if worker.jobs_done >= self.max_jobs and not worker.busy:
+            logger.info(f"Recycling yt-dlp worker after {worker.jobs_done} jobs")
+            self._retire(worker)
+        asyncio.create_task(self._notify())
+
+    async def _notify(self):
+        async with self.condition:
+            self.condition.notify_all()
+
+    def _retire(self, worker: YtDlpWorker):
+        if worker in self.workers:
+            self.workers.remove(worker)
+        asyncio.create_task(worker.stop())
+
+    async def _reap_idle(self):
+        while self.workers:
+            await asyncio.sleep(min(self.idle_timeout, 30))
+            now = time.monotonic()
+            for worker in list(self.workers):
+                if not worker.alive or (not worker.busy and now - worker.last_used > self.idle_timeout):
+                    logger.info("Stopping idle yt-dlp worker")
+                    self._retire(worker)
+            await self._notify()
+
+    async def submit(self, op: str, **params) -> YtDlpJob:
+        """
+        Run a job on the first free worker, starting one if needed.
+        :param op: str One of "search", "extract", "download"
+        :param params: Job parameters (url, opts, ...)
+        :return: YtDlpJob Handle to read entries and the result from
+        """
+        if not self.available:
+            raise YtDlpWorkerError("yt-dlp worker pool is not available")
+        worker = await self._acquire()
+        self.next_job_id += 1
+        return await worker.submit(self.next_job_id, op, params)
+
+    async def stop(self):
+        """
+        Stop all workers.
+        :return: None
+        """
+        if self.reaper is not None:
+            self.reaper.cancel()
+            self.reaper = None
+        workers, self.workers = self.workers, []
+        for worker in workers:
+            await worker.stop()
+
+
+class PersistentTTLCache:
+    """
+    LRU cache with per-entry expiry, persisted to a JSON file.
+    Writes are delayed a few seconds so a burst of updates only costs one write.
+    """
+
+    def __init__(self, file_path: str, max_entries: int = 500, default_ttl: float = 3600):
+        self.file_path = file_path
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.entries: OrderedDict[str, dict] = OrderedDict()
+        self.save_handle: asyncio.TimerHandle | None = None
+
+    def load(self):
+        """
+        Load persisted entries, dropping the expired ones.
+        :return: None
+        """
+        try:
+            with open(self.file_path, "r") as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Error loading cache {self.file_path}: {e}")
+            return
+        now = time.time()
+        self.entries = OrderedDict(
+            (key, entry) for key, entry in data.items() if "value" in entry and entry.get("expires", 0) > now
+        )
+        logger.info(f"Loaded {len(self.entries)} entries from {Path(self.file_path).name}")
+
+    def save(self):
+        """
+        Write the cache to disk atomically.
+        :return: None
+        """
+        if self.save_handle is not None:
+            self.save_handle.cancel()
+            self.save_handle = None
+        temp_path = f"{self.file_path}.tmp"
+        try:
+            with open(temp_path, "w") as file:
+                json.dump(self.entries, file)
+            os.replace(temp_path, self.file_path)
+        except OSError as e:
+            logger.error(f"Error saving cache {self.file_path}: {e}")
+
+    def get(self, key: str):
+        """
+        Get a value that has not expired yet.
+        :param key: str Cache key
+        :return: Cached value or None on miss
+        """
+        name = Path(self.file_path).stem
+        entry = self.entries.get(key)
+        if entry is None:
+            metrics.count(f"cache.{name}.miss")
+            return None
+        if entry["expires"] <= time.time():
+            del self.entries[key]
+            metrics.count(f"cache.{name}.miss")
+            return None
+        self.entries.move_to_end(key)
+        metrics.count(f"cache.{name}.hit")
+        return entry["value"]
+
+    def put(self, key: str, value, expires: float | None = None):
+        """
+        Store a value and schedule a write to disk.
+        :param key: str Cache key
+        :param value: JSON-serialisable value
+        :param expires: float | None Expiry timestamp, defaults to now + default_ttl
+        :return: None
+        """
+        if expires is None:
+            expires = time.time() + self.default_ttl
+        if expires <= time.time():
+            return
+        self.entries[key] = {"value": value, "expires": expires}
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        if self.save_handle is None:
+            self.save_handle = asyncio.get_running_loop().call_later(5, self.save)
+
+
+class StreamUrlCache(PersistentTTLCache):
+    """
+    Cache of resolved stream URLs keyed by video ID.
+    Entries expire at the `expire=` timestamp googlevideo puts in the URL, minus a safety margin.
+    """
+
+    def __init__(self, file_path: str, max_entries: int = 500, default_ttl: float = 3600, margin: float = 300):
+        super().__init__(file_path, max_entries, default_ttl)
+        self.margin = margin
+
+    def _expiry(self, url: str) -> float:
+        try:
+            expire = parse_qs(urlparse(url).query).get("expire")
+            if expire:
+                return float(expire[0]) - self.margin
+        except ValueError:
+            pass
+        return time.time() + self.default_ttl
+
+    def put(self, video_id: str, url: str, expires: float | None = None):
+        """
+        Store a resolved stream URL, expiring when the URL does.
+        :param video_id: str Video ID
+        :param url: str Stream URL
+        :param expires: float | None Override for the expiry timestamp
+        :return: None
+        """
+        super().put(video_id, url, self._expiry(url) if expires is None else expires)
+
+
+class ThemeDatabase:
+    """
+    SQLite database (WAL mode) holding the app to theme assignments and the per-file records of the
+    record stores. Batch operations run in a single transaction.
+    The connection is shared by the event loop and the I/O pool, so each method holds `lock`.
+    """
+
+    ASSIGNMENT_FIELDS = {"videoId": "video_id", "volume": "volume"}
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.connection: sqlite3.Connection | None = None
+        self.lock = threading.Lock()
+
+    def open(self):
+        """
+        Open the database and create the tables if needed.
+        :return: None
+        """
+        self.connection = sqlite3.connect(self.file_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS assignments (app_id TEXT PRIMARY KEY, video_id TEXT, volume REAL)"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS records "
+                "(store TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, PRIMARY KEY (store, key))"
+            )
+
+    def close(self):
+        """
+        Close the database.
+        :return: None
+        """
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    def get_assignments(self, app_ids: list[str] | None = None) -> dict[str, dict]:
+        """
+        Get the assignments of some or all apps.
+        :param app_ids: list[str] | None App IDs to look up, None for all
+        :return: dict[str, dict] {app_id: {"videoId", "volume"}}, unset fields omitted
+        """
+        with self.lock:
+            if app_ids is None:
+                rows = self.connection.execute("SELECT app_id, video_id, volume FROM assignments").fetchall()
+            else:
+                rows = []
+                # Stay below SQLite's bound parameter limit
+                for i in range(0, len(app_ids), 500):
+                    chunk = [str(app_id) for app_id in app_ids[i:i + 500]]
+                    rows += self.connection.execute(
+                        f"SELECT app_id, video_id, volume FROM assignments WHERE app_id IN ({','.join('?' * len(chunk))})",
+                        chunk,
+                    ).fetchall()
+            assignments = {}
+            for app_id, video_id, volume in rows:
+                assignment = {}
+                if video_id is not None:
+                    assignment["videoId"] = video_id
+                if volume is not None:
+                    assignment["volume"] = volume
+                assignments[app_id] = assignment
+            return assignments
+
+    def set_assignments(self, assignments: dict[str, dict], overwrite: bool = True):
+        """
+        Merge assignments into the table. Fields given as None are cleared, missing fields are kept.
+        :param assignments: dict[str, dict] {app_id: {"videoId", "volume"}}
+        :param overwrite: bool False to leave apps that already have an assignment untouched
+        :return: None
+        """
+        with self.lock:
+            with self.connection:
+                for app_id, assignment in assignments.items():
+                    fields = {
+                        column: assignment[key] for key, column in self.ASSIGNMENT_FIELDS.items() if key in assignment
+                    }
+                    if not overwrite:
+                        self.connection.execute(
+                            "INSERT OR IGNORE INTO assignments (app_id, video_id, volume) VALUES (?, ?, ?)",
+                            (str(app_id), fields.get("video_id"), fields.get("volume")),
+                        )
+                        continue
+                    self.connection.execute("INSERT OR IGNORE INTO assignments (app_id) VALUES (?)", (str(app_id),))
+                    if fields:
+                        self.connection.execute(
+                            f"UPDATE assignments SET {', '.join(f'{column} = ?' for column in fields)} WHERE app_id = ?",
+                            (*fields.values(), str(app_id)),
+                        )
+
+    def delete_assignments(self, app_ids: list[str] | None = None):
+        """
+        Delete the assignments of some or all apps.
+        :param app_ids: list[str] | None App IDs to delete, None for all
+        :return: None
+        """
+        with self.lock:
+            with self.connection:
+                if app_ids is None:
+                    self.connection.execute("DELETE FROM assignments")
+                else:
+                    self.connection.executemany(
+                        "DELETE FROM assignments WHERE app_id = ?", [(str(app_id),) for app_id in app_ids]
+                    )
+
+    def replace_assignments(self, assignments: dict[str, dict]):
+        """
+        Replace every assignment in one transaction.
+        :param assignments: dict[str, dict] {app_id: {"videoId", "volume"}}
+        :return: None
+        """
+        with self.lock:
+            with self.connection:
+                self.connection.execute("DELETE FROM assignments")
+                self.connection.executemany(
+                    "INSERT INTO assignments (app_id, video_id, volume) VALUES (?, ?, ?)",
+                    [
+                        (str(app_id), assignment.get("videoId"), assignment.get("volume"))
+                        for app_id, assignment in assignments.items()
+                    ],
+                )
+
+    def load_records(self, store: str) -> dict[str, dict]:
+        """
+        Load every record of a store.
+        :param store: str Store name
+        :return: dict[str, dict] {key: record}
+        """
+        with self.lock:
+            rows = self.connection.execute("SELECT key, value FROM records WHERE store = ?", (store,)).fetchall()
+            return {key: json.loads(value) for key, value in rows}
+
+    def write_records(self, store: str, entries: dict[str, dict], keys: set[str]):
+        """
+        Write some keys of a store in one transaction. Keys missing from `entries` are deleted.
+        :param store: str Store name
+        :param entries: dict[str, dict] Current records of the store
+        :param keys: set[str] Keys that changed
+        :return: None
+        """
+        with self.lock:
+            with self.connection:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO records (store, key, value) VALUES (?, ?, ?)",
+                    [(store, key, json.dumps(entries[key])) for key in keys if key in entries],
+                )
+                self.connection.executemany(
+                    "DELETE FROM records WHERE store = ? AND key = ?",
+                    [(store, key) for key in keys if key not in entries],
+                )
+
+    def restore(self, source_path: str):
+        """
+        Replace the database contents with a copy of another SQLite database file.
+        :param source_path: str Backup file
+        :return: None
+        """
+        with self.lock:
+            source = sqlite3.connect(source_path)
+            try:
+                source.backup(self.connection)
+            finally:
+                source.close()
+
+
+class RecordStore:
+    """
+    Dictionary of JSON records kept in memory and persisted to a ThemeDatabase store. Writes are
+    delayed a few seconds so a burst of updates only costs one transaction.
+    """
+
+    def __init__(self, database: ThemeDatabase, name: str):
+        self.database = database
+        self.name = name
+        self.entries: dict[str, dict] = {}
+        self.dirty: set[str] = set()
+        self.save_handle: asyncio.TimerHandle | None = None
+
+    def load(self):
+        """
+        Load the store from the database.
+        :return: None
+        """
+        try:
+            self.entries = self.database.load_records(self.name)
+        except (sqlite3.Error, json.JSONDecodeError) as e:
+            logger.error(f"Error loading {self.name} records: {e}")
+            return
+        self.dirty = set()
+        logger.info(f"Loaded {len(self.entries)} {self.name} records")
+
+    def save(self):
+        """
+        Write the changed records to the database.
+        :return: None
+        """
+        if self.save_handle is not None:
+            self.save_handle.cancel()
+            self.save_handle = None
+        if not self.dirty:
+            return
+        try:
+            self.database.write_records(self.name, self.entries, self.dirty)
+            self.dirty = set()
+        except sqlite3.Error as e:
+            logger.error(f"Error saving {self.name} records: {e}")
+
+    def _schedule_save(self, key: str):
+        self.dirty.add(key)
+        if self.save_handle is None:
+            self.save_handle = asyncio.get_running_loop().call_later(5, self.save)
+
+    def remove(self, key: str):
+        """
+        Forget a key.
+        :param key: str Key to remove
+        :return: None
+        """
+        if self.entries.pop(key, None) is not None:
+            self._schedule_save(key)
+
+    def clear(self):
+        """
+        Forget every key.
+        :return: None
+        """
+        self.replace({})
+
+    def replace(self, entries: dict[str, dict]):
+        """
+        Replace every record.
+        :param entries: dict[str, dict] New records
+        :return: None
+        """
+        keys = self.entries.keys() | entries.keys()
+        self.entries = dict(entries)
+        for key in keys:
+            self._schedule_save(key)
+
+
+class SidecarStore(RecordStore):
+    """
+    Persistent per-file metadata keyed by ID.
+    Each record remembers the size and mtime of the file it was computed from, and is ignored once the
+    file changes.
+    """
+
+    def get(self, stem: str, file_entry: dict | None) -> dict | None:
+        """
+        Get the record for an ID if it still matches the file.
+        :param stem: str ID (file name without extension)
+        :param file_entry: dict | None MusicLibraryIndex entry of the file
+        :return: dict | None Record or None if missing or stale
+        """
+        record = self.entries.get(stem)
+        if record is None or file_entry is None:
+            return None
+        if record.get("size") != file_entry["size"] or record.get("mtime") != file_entry["mtime"]:
+            return None
+        return record["data"]
+
+    def put(self, stem: str, file_entry: dict, data: dict):
+        """
+        Store the record for an ID.
+        :param stem: str ID (file name without extension)
+        :param file_entry: dict MusicLibraryIndex entry the data was computed from
+        :param data: dict JSON-serialisable record
+        :return: None
+        """
+        self.entries[stem] = {"size": file_entry["size"], "mtime": file_entry["mtime"], "data": data}
+        self._schedule_save(stem)
+
+
+class PlayStatsStore(RecordStore):
+    """
+    Last-played time, play count and pin flag per ID, used to pick which themes to evict.
+    """
+
+    def record_play(self, stem: str):
+        """
+        Record that a file started playing.
+        :param stem: str ID (file name without extension)
+        :return: None
+        """
+        stats = self.entries.setdefault(stem, {})
+        stats["last_played"] = time.time()
+        stats["plays"] = stats.get("plays", 0) + 1
+        self._schedule_save(stem)
+
+    def last_played(self, stem: str) -> float:
+        return self.entries.get(stem, {}).get("last_played", 0)
+
+    def is_pinned(self, stem: str) -> bool:
+        return self.entries.get(stem, {}).get("pinned", False)
+
+    def is_imported(self, stem: str) -> bool:
+        return self.entries.get(stem, {}).get("imported", False)
+
+    def is_downloaded(self, stem: str) -> bool:
+        return self.entries.get(stem, {}).get("downloaded", False)
+
+    def set_downloaded(self, stem: str):
+        """
+        Mark an ID as a file fetched by a download, which can be downloaded again after eviction.
+        :param stem: str ID (file name without extension)
+        :return: None
+        """
+        self.entries.setdefault(stem, {})["downloaded"] = True
+        self._schedule_save(stem)
+
+    def set_imported(self, stem: str):
+        """
+        Mark an ID as a file imported by the user, which cannot be downloaded again.
+        :param stem: str ID (file name without extension)
+        :return: None
+        """
+        self.entries.setdefault(stem, {})["imported"] = True
+        self._schedule_save(stem)
+
+    def set_pinned(self, stem: str, pinned: bool):
+        """
+        Protect an ID from eviction, or remove that protection.
+        :param stem: str ID (file name without extension)
+        :param pinned: bool Whether the ID is protected
+        :return: None
+        """
+        self.entries.setdefault(stem, {})["pinned"] = pinned
+        self._schedule_save(stem)
+
+
+class BackupSnapshotStore:
+    """
+    Cache backups stored as gzip-compressed JSON snapshots of {section: {key: value}} state.
+    A snapshot is either a full checkpoint or a delta against the previous snapshot; a full checkpoint
+    is written every `full_every` snapshots. Restoring replays the deltas on top of their checkpoint.
+    """
+
+    PREFIX = "backup-"
+    SUFFIXES = {"full": ".full.json.gz", "delta": ".delta.json.gz"}
+    TIME_FORMAT = "%Y-%m-%d %H-%M-%S"
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    def list(self) -> list[dict]:
+        """
+        List the snapshots, oldest first.
+        :return: list[dict] [{"name", "kind", "path", "created"}]
+        """
+        snapshots = []
+        if not self.directory.is_dir():
+            return snapshots
+        for path in self.directory.iterdir():
+            for kind, suffix in self.SUFFIXES.items():
+                if path.name.startswith(self.PREFIX) and path.name.endswith(suffix):
+                    name = path.name[:-len(suffix)]
+                    try:
+                        created = datetime.datetime.strptime(name[len(self.PREFIX):][:19], self.TIME_FORMAT)
+                    except ValueError:
+                        continue
+                    snapshots.append({"name": name, "kind": kind, "path": path, "created": created})
+        snapshots.sort(key=lambda snapshot: snapshot["name"])
+        return snapshots
+
+    def find(self, name: str) -> dict | None:
+        return next((snapshot for snapshot in self.list() if snapshot["name"] == name), None)
+
+    @staticmethod
+    def _read(path: Path) -> dict:
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            return json.load(file)
+
+    def _write(self, name: str, kind: str, payload: dict) -> Path:
+        path = self.directory / f"{name}{self.SUFFIXES[kind]}"
+        temp_path = path.with_name(f"{path.name}.tmp")
+        with gzip.open(temp_path, "wt", encoding="utf-8") as file:
+            json.dump(payload, file, separators=(",", ":"))
+        os.replace(temp_path, path)
+        return path
+
+    def state(self, name: str) -> dict[str, dict]:
+        """
+        Rebuild the state saved by a snapshot.
+        :param name: str Snapshot name
+        :return: dict[str, dict] {section: {key: value}}
+        """
+        chain = []
+        snapshot = self.find(name)
+        while snapshot is not None:
+            payload = self._read(snapshot["path"])
+            chain.append(payload)
+            if snapshot["kind"] == "full":
+                break
+            snapshot = self.find(payload["parent"])
+        else:
+            raise FileNotFoundError(f"Backup {name} or one of its parents is missing")
+        state = chain.pop()["state"]
+        for payload in reversed(chain):
+            for section, changes in payload["changes"].items():
+                values = state.setdefault(section, {})
+                values.update(changes["set"])
+                for key in changes["deleted"]:
+                    values.pop(key, None)
+        return state
+
+    def snapshot(self, state: dict[str, dict], full_every: int = 10) -> str:
+        """
+        Save a snapshot of the state. Nothing is written if it did not change since the last snapshot.
+        :param state: dict[str, dict] {section: {key: value}}
+        :param full_every: int Write a full checkpoint after this many deltas
+        :return: str Name of the snapshot holding the state
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        snapshots = self.list()
+        name = f"{self.PREFIX}{datetime.datetime.now().strftime(self.TIME_FORMAT)}"
+        if any(snapshot["name"] == name for snapshot in snapshots):
+            name = f"{name} {uuid.uuid4().hex[:6]}"
+        if snapshots:
+            previous = snapshots[-1]
+            previous_state = self.state(previous["name"])
+            changes = {}
+            for section in state.keys() | previous_state.keys():
+                new_values, old_values = state.get(section, {}), previous_state.get(section, {})
+                changed = {key: value for key, value in new_values.items() if old_values.get(key) != value}
+                deleted = [key for key in old_values if key not in new_values]
+                if changed or deleted:
+                    changes[section] = {"set": changed, "deleted": deleted}
+            if not changes:
+                logger.info(f"Cache unchanged since {previous['name']}, not writing a new backup")
+                return previous["name"]
+            deltas = 0
+            for snapshot in reversed(snapshots):
+                if snapshot["kind"] == "full":
+                    break
+                deltas += 1
+            if deltas < full_every:
+                self._write(name, "delta", {"parent": previous["name"], "changes": changes})
+                return name
+        self._write(name, "full", {"state": state})
+        return name
+
+    def delete(self, names: set[str]):
+        """
+        Delete snapshots. Kept deltas that depended on a deleted snapshot are turned into checkpoints.
+        :param names: set[str] Snapshot names to delete
+        :return: None
+        """
+        snapshots = self.list()
+        deleted = set()
+        for snapshot in snapshots:
+            if snapshot["name"] in names:
+                deleted.add(snapshot["name"])
+                continue
+            if snapshot["kind"] == "delta" and self._read(snapshot["path"])["parent"] in deleted:
+                state = self.state(snapshot["name"])
+                self._write(snapshot["name"], "full", {"state": state})
+                snapshot["path"].unlink()
+        for snapshot in snapshots:
+            if snapshot["name"] in deleted:
+                snapshot["path"].unlink(missing_ok=True)
+
+    def prune(self, keep_last: int, keep_daily: int, keep_weekly: int) -> int:
+        """
+        Delete the snapshots outside the retention policy: the newest `keep_last`, plus the newest
+        snapshot of each of the last `keep_daily` days and `keep_weekly` weeks that have one.
+        :param keep_last: int Number of most recent snapshots to keep
+        :param keep_daily: int Number of daily rollups to keep
+        :param keep_weekly: int Number of weekly rollups to keep
+        :return: int Number of deleted snapshots
+        """
+        snapshots = list(reversed(self.list()))
+        keep = {snapshot["name"] for snapshot in snapshots[:keep_last]}
+        for count, period in ((keep_daily, lambda date: date.date()), (keep_weekly, lambda date: date.isocalendar()[:2])):
+            seen = []
+            for snapshot in snapshots:
+                key = period(snapshot["created"])
+                if key not in seen:
+                    seen.append(key)
+                    if len(seen) > count:
+                        break
+                    keep.add(snapshot["name"])
+        names = {snapshot["name"] for snapshot in snapshots} - keep
+        if names:
+            self.delete(names)
+            logger.info(f"Pruned {len(names)} cache backups")
+        return len(names)
+
+
+class DownloadManager:
+    """
+    Background download queue with a bounded number of workers.
+    Jobs are deduplicated by ID: callers asking for an ID already queued or running wait on the same job.
+    Each caller gets its own future, so a caller cancelling its wait does not affect the others.
+    Lower priority values run first.
+    """
+    PRIORITY_FOCUSED = 0
+    PRIORITY_NORMAL = 10
+    PRIORITY_BACKGROUND = 20
+
+    def __init__(self, size: int = 3):
+        self.size = size
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self.jobs: dict[str, dict] = {}
+        self.workers: list[asyncio.Task] = []
+        self.sequence = 0
+        self.completed = 0
+        self.failed = 0
+
+    def enqueue(self, key: str, download: Callable[[dict], Awaitable], priority: int = PRIORITY_NORMAL) -> asyncio.Future:
+        """
+        Queue a download unless the same ID is already queued or running.
+        :param key: str ID the download is saved as
+        :param download: Callable Coroutine function taking the job dict, used to report progress
+        :param priority: int Queue priority, lower runs first
+        :return: asyncio.Future This caller's future, resolved when the download finishes
+        """
+        job = self.jobs.get(key)
+        if job is None:
+            future = asyncio.get_running_loop().create_future()
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            job = {
+                "id": key,
+                "status": "queued",
+                "priority": priority,
+                "downloaded": 0,
+                "total": None,
+                "future": future,
+                "download": download,
+            }
+            self.jobs[key] = job
+        elif job["status"] != "queued" or priority >= job["priority"]:
+            logger.debug(f"Download already {job['status']} for ID: {key}")
+            return self._waiter(job["future"])
+        else:
+            logger.debug(f"Raising download priority for ID: {key} to {priority}")
+            job["priority"] = priority
+        self.sequence += 1
+        self.queue.put_nowait((priority, self.sequence, key))
+        self._start_workers()
+        return self._waiter(job["future"])
+
+    @staticmethod
+    def _waiter(future: asyncio.Future) -> asyncio.Future:
+        """
+        Make a future that follows the shared future of a job, but can be cancelled on its own.
+        :param future: asyncio.Future Shared job future
+        :return: asyncio.Future Future for one caller
+        """
+        waiter = future.get_loop().create_future()
+        waiter.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+        def resolve(done: asyncio.Future):
+            if waiter.done():
+                return
+            if done.cancelled():
+                waiter.cancel()
+            elif done.exception() is not None:
+                waiter.set_exception(done.exception())
+            else:
+                waiter.set_result(done.result())
+
+        future.add_done_callback(resolve)
+        return waiter
+
+    def _start_workers(self):
+        self.workers = [worker for worker in self.workers if not worker.done()]
+        while len(self.workers) < self.size:
+            self.workers.append(asyncio.create_task(self._work()))
+
+    async def _work(self):
+        while True:
+            priority, _, key = await self.queue.get()
+            job = self.jobs.get(key)
+            # Stale entry left behind by a priority bump
+            if job is None or job["status"] != "queued" or job["priority"] != priority:
+                continue
+            job["status"] = "running"
+            start = time.perf_counter()
+            future = job["future"]
+            try:
+                await job["download"](job)
+                self.completed += 1
+                if not future.done():
+                    future.set_result(None)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                self.failed += 1
+                metrics.count("download.failed")
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self.jobs.pop(key, None)
+                metrics.observe("download.job", time.perf_counter() - start)
+                metrics.count("download.bytes", job["downloaded"])
+
+    def cancel(self, key: str, priority: int | None = None) -> bool:
+        """
+        Drop a download that has not started yet. Its waiters are cancelled.
+        :param key: str ID of the download
+        :param priority: int | None Only drop it if still queued at this priority (not raised by another caller)
+        :return: bool True if the download was dropped
+        """
+        job = self.jobs.get(key)
+        if job is None or job["status"] != "queued" or (priority is not None and job["priority"] != priority):
+            return False
+        # The worker skips the stale queue entry once the job is gone
+        del self.jobs[key]
+        job["future"].cancel()
+        logger.debug(f"Cancelled queued download for ID: {key}")
+        return True
+
+    def status(self) -> dict:
+        """
+        Get the state of the queue.
+        :return: dict Queued and running jobs with their progress and overall counters
+        """
+        jobs = [
+            {key: job[key] for key in ("id", "status", "priority", "downloaded", "total")}
+            for job in sorted(self.jobs.values(), key=lambda j: (j["status"] != "running", j["priority"]))
+        ]
+        return {
+            "workers": self.size,
+            "jobs": jobs,
+            "queued": sum(1 for job in jobs if job["status"] == "queued"),
+            "running": sum(1 for job in jobs if job["status"] == "running"),
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+    async def stop(self):
+        """
+        Cancel all workers and pending downloads.
+        :return: None
+        """
+        for worker in self.workers:
+            worker.cancel()
+        self.workers = []
+        for job in self.jobs.values():
+            job["future"].cancel()
+        self.jobs = {}
+
+
+class YtSearchSession:
+    """
+    State of one YouTube search: the worker job or yt-dlp process streaming its results.
+    Each session is read under its own lock so parallel searches never wait on each other.
+    """
+
+    def __init__(self, session_id: str, term: str):
+        self.session_id = session_id
+        self.term = term
+        self.job: YtDlpJob | None = None
+        self.process: asyncio.subprocess.Process | None = None
+        self.start_task: asyncio.Task | None = None
+        self.started = asyncio.Event()
+        self.lock = asyncio.Lock()
+        self.has_slot = False
+        self.count = 0
+        self.created = time.perf_counter()
+        self.last_used = time.monotonic()
+
+    async def next_entry(self) -> dict | None:
+        """
+        Read the next raw yt-dlp entry.
+        :return: dict | None Entry, or None when the search is exhausted
+        """
+        if self.job is not None:
+            return await self.job.next()
+        if (
+                not self.process
+                or not (output := self.process.stdout)
+                or not (line := (await output.readline()).strip())
+        ):
+            return None
+        return json.loads(line)
+
+    async def stop(self):
+        """
+        Stop the search job or process.
+        :return: None
+        """
+        if self.start_task is not None and not self.start_task.done():
+            self.start_task.cancel()
+        if self.job is not None:
+            await self.job.cancel()
+        if self.process is not None and self.process.returncode is None:
+            # After EOF the process is exiting by itself, signalling it would reap it behind asyncio's back
+            if not (self.process.stdout and self.process.stdout.at_eof()):
+                self.process.terminate()
+            try:
+                await asyncio.wait_for(self.process.communicate(), timeout=5)
+            except (TimeoutError, asyncio.TimeoutError):
+                logger.warning("yt-dlp search process did not terminate in time, killing it")
+                self.process.kill()
+
+
+class OpenTrack:
+    """
+    A local music file opened for chunked reads over the RPC bridge.
+    The file is memory mapped, so each chunk is a slice of the page cache instead of a seek and read.
+    Reads run on the I/O pool while the loop may close the track, so both hold `lock`.
+    """
+
+    def __init__(self, handle: str, path: Path):
+        self.handle = handle
+        self.path = path
+        self.lock = threading.Lock()
+        self.closed = False
+        self.file = open(path, "rb")
+        try:
+            self.size = os.fstat(self.file.fileno()).st_size
+            # mmap refuses empty files, those are served as a single empty chunk
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        except Exception:
+            self.file.close()
+            raise
+        extension = path.suffix.lstrip('.').lower()
+        self.mime_type = AUDIO_MIME_TYPES.get(extension, f"audio/{extension}")
+        self.last_used = time.monotonic()
+
+    def read(self, offset: int, size: int) -> str | None:
+        """
+        Read a slice of the file as base64. Blocking, run it with _run_io.
+        :param offset: int Byte offset to start at
+        :param size: int Number of bytes to read
+        :return: str | None Base64 encoded bytes, shorter than `size` at the end of the file,
+            or None if the track was closed
+        """
+        with self.lock:
+            if self.closed:
+                return None
+            if self.map is None:
+                return ""
+            return base64.b64encode(self.map[offset:offset + size]).decode()
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            if self.map is not None:
+                self.map.close()
+                self.map = None
+            self.file.close()
+
+
+class DirectoryListingCache:
+    """
+    Recently listed directories for the file browser, least recently used first.
+    A listing is only reused while the directory mtime is unchanged, which is bumped by any
+    entry being added, removed or renamed.
+    """
+
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self.listings: OrderedDict[tuple[str, str], tuple[int, list[dict]]] = OrderedDict()
+
+    def get(self, path: str, sort: str, mtime_ns: int) -> list[dict] | None:
+        """
+        Get a cached listing.
+        :param path: str Directory path
+        :param sort: str Sort order of the listing
+        :param mtime_ns: int Current directory mtime
+        :return: list[dict] | None Sorted entries, or None if missing or stale
+        """
+        key = (path, sort)
+        cached = self.listings.get(key)
+        if cached is None:
+            metrics.count("browser.cache.miss")
+            return None
+        if cached[0] != mtime_ns:
+            metrics.count("browser.cache.stale")
+            del self.listings[key]
+            return None
+        metrics.count("browser.cache.hit")
+        self.listings.move_to_end(key)
+        return cached[1]
+
+    def put(self, path: str, sort: str, mtime_ns: int, entries: list[dict]):
+        self.listings[(path, sort)] = (mtime_ns, entries)
+        self.listings.move_to_end((path, sort))
+        while len(self.listings) > self.max_entries:
+            self.listings.popitem(last=False)
+
+
+@instrument_rpc_methods
 class Plugin:
-    yt_process: asyncio.subprocess.Process | None = None
-    yt_process_lock = asyncio.Lock()
+    yt_searches: dict[str, YtSearchSession] = {}
+    yt_last_search: str | None = None
+    yt_search_slots: asyncio.Semaphore
+    yt_search_idle_timeout = 120
+    yt_search_prefetch = 3
+    yt_resolves: dict[str, asyncio.Task] = {}
+    open_tracks: dict[str, OpenTrack] = {}
+    directory_cache = DirectoryListingCache()
+    directory_page_size = 200
+    open_track_idle_timeout = 60
+    track_chunk_size = 256 * 1024
+    track_chunk_max_size = 1024 * 1024
+    warm_streams: OrderedDict[str, dict] = OrderedDict()
+    warm_tasks: dict[str, asyncio.Task] = {}
+    focus_hint_ids: list[str] = []
+    focus_hint_handle: asyncio.TimerHandle | None = None
+    metrics_task: asyncio.Task | None = None
+    io_executor: ThreadPoolExecutor | None = None
+    io_pending = 0
+    loop_lag_task: asyncio.Task | None = None
+    idle_reaper_task: asyncio.Task | None = None
+    ytdlp_pool: YtDlpWorkerPool
+    stream_url_cache: StreamUrlCache
+    itunes_search_cache: PersistentTTLCache
+    itunes_track_cache: PersistentTTLCache
+    itunes_searches: dict[str, asyncio.Task] = {}
+    download_manager: DownloadManager
+    prefetch_state_path = str(Path(decky.DECKY_PLUGIN_RUNTIME_DIR) / "prefetch.json")
+    prefetch_state: dict
+    prefetch_task: asyncio.Task | None = None
+    prefetch_downloads: set[str] = set()
+    theme_db: ThemeDatabase
+    cache_backups: BackupSnapshotStore
+    audio_analysis: SidecarStore
+    track_info: SidecarStore
+    play_stats: PlayStatsStore
+    ffmpeg_slots: asyncio.Semaphore
+    background_tasks: set[asyncio.Task] = set()
     music_path = str(Path(decky.DECKY_PLUGIN_RUNTIME_DIR) / "music")
     cache_path = str(Path(decky.DECKY_PLUGIN_RUNTIME_DIR) / "cache")
+    incoming_path = str(Path(decky.DECKY_PLUGIN_RUNTIME_DIR) / "incoming")
+    incoming_max_age = 7 * 24 * 3600
     ssl_context = ssl.create_default_context(cafile=certifi.where())
+    http_session: aiohttp.ClientSession | None = None
+    music_index: MusicLibraryIndex
+    music_server: web.AppRunner | None = None
+    music_server_host = "127.0.0.1"
+    music_server_port: int | None = None
     is_windows = platform.system() == "Windows"
     
     subprocess_flags = {}
@@ -46,36 +2413,613 @@ class Plugin:
         )
         os.makedirs(self.music_path, exist_ok=True)
         os.makedirs(self.cache_path, exist_ok=True)
+        os.makedirs(self.incoming_path, exist_ok=True)
         logger.info(f"Music path: {self.music_path}")
         logger.info(f"Cache path: {self.cache_path}")
-        
+        self.io_executor = ThreadPoolExecutor(max_workers=self.settings.getSetting("io_workers", 4), thread_name_prefix="gtm-io")
+        self.music_index = MusicLibraryIndex(self.music_path)
+        await self._run_io(self.music_index.reload)
+        self.ytdlp_pool = self._create_ytdlp_pool()
+        self.yt_search_slots = asyncio.Semaphore(self.settings.getSetting("ytdlp_max_searches", 3))
+        self.stream_url_cache = StreamUrlCache(str(Path(decky.DECKY_PLUGIN_RUNTIME_DIR) / "stream_urls.json"))
+        self.stream_url_cache.load()
+        self.itunes_search_cache = PersistentTTLCache(
+            str(Path(decky.DECKY_PLUGIN_RUNTIME_DIR) / "itunes_search.json"), max_entries=200, default_ttl=24 * 3600
+        )
+        self.itunes_search_cache.load()
+        self.itunes_track_cache = PersistentTTLCache(
+            str(Path(decky.DECKY_PLUGIN_RUNTIME_DIR) / "itunes_tracks.json"), max_entries=2000, default_ttl=7 * 24 * 3600
+        )
+        self.itunes_track_cache.load()
+        self.download_manager = DownloadManager(self.settings.getSetting("download_workers", 3))
+        self.prefetch_state = self._load_prefetch_state()
+        self.theme_db = ThemeDatabase(str(Path(decky.DECKY_PLUGIN_RUNTIME_DIR) / "themes.db"))
+        self.theme_db.open()
+        self.cache_backups = BackupSnapshotStore(self.cache_path)
+        self.audio_analysis = SidecarStore(self.theme_db, "audio_analysis")
+        self.audio_analysis.load()
+        self.track_info = SidecarStore(self.theme_db, "track_info")
+        self.track_info.load()
+        self.play_stats = PlayStatsStore(self.theme_db, "play_stats")
+        self.play_stats.load()
+        self.ffmpeg_slots = asyncio.Semaphore(self.settings.getSetting("ffmpeg_workers", 1))
+        self._get_http_session()
+        self._register_gauges()
+        self.loop_lag_task = asyncio.create_task(self._monitor_loop_lag())
+        self.idle_reaper_task = asyncio.create_task(self._reap_idle_handles())
+        if self.settings.getSetting("metrics_dump_interval", 0) > 0:
+            self.metrics_task = asyncio.create_task(self._dump_metrics_periodically())
+
+        try:
+            await self._migrate_download_records()
+            await self._enforce_music_budget()
+        except Exception as e:
+            logger.error(f"Error enforcing music quota: {e}")
+
+        try:
+            await self._run_io(self._prune_incoming, self.incoming_max_age)
+        except Exception as e:
+            logger.error(f"Error removing stale partial downloads: {e}")
+
+        try:
+            await self._start_music_server()
+        except Exception as e:
+            logger.error(f"Error starting local music server: {e}")
+
+        try:
+            await self.check_and_update_ytdlp()
+        except Exception as e:
+            logger.error(f"Error checking for yt-dlp updates: {e}")
+
+        if self.prefetch_state["pending"]:
+            logger.info("Resuming interrupted prefetch")
+            self._start_prefetch()
+
+        task = asyncio.create_task(self._scan_track_info())
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+    async def _unload(self):
+        logger.info("Plugin unloading...")
+        for session in list(self.yt_searches.values()):
+            await self._close_yt_search(session)
+        for track in list(self.open_tracks.values()):
+            self._close_open_track(track)
+        if self.prefetch_task is not None:
+            self.prefetch_task.cancel()
+        if self.focus_hint_handle is not None:
+            self.focus_hint_handle.cancel()
+        for task in self.warm_tasks.values():
+            task.cancel()
+        if self.loop_lag_task is not None:
+            self.loop_lag_task.cancel()
+        if self.idle_reaper_task is not None:
+            self.idle_reaper_task.cancel()
+        if self.metrics_task is not None:
+            self.metrics_task.cancel()
+            await self.dump_metrics()
+        await self.download_manager.stop()
+        await self.ytdlp_pool.stop()
+        self.stream_url_cache.save()
+        self.itunes_search_cache.save()
+        self.itunes_track_cache.save()
+        self.audio_analysis.save()
+        self.track_info.save()
+        self.play_stats.save()
+        self.theme_db.close()
+        await self._stop_music_server()
+        if self.http_session is not None:
+            await self.http_session.close()
+            self.http_session = None
+        if self.io_executor is not None:
+            self.io_executor.shutdown(wait=False, cancel_futures=True)
+            self.io_executor = None
+        logger.info("Plugin unloaded")
+
+    async def set_setting(self, key, value):
+        logger.debug(f"Setting {key} = {value}")
+        self.settings.setSetting(key, value)
+
+    async def get_setting(self, key, default):
+        value = self.settings.getSetting(key, default)
+        logger.debug(f"Getting {key} = {value}")
+        return value
+
+    def _register_gauges(self):
+        """
+        Register the queue depths and pool sizes read when metrics are collected.
+        :return: None
+        """
+        metrics.gauge("download.queued", lambda: sum(1 for job in self.download_manager.jobs.values() if job["status"] == "queued"))
+        metrics.gauge("download.running", lambda: sum(1 for job in self.download_manager.jobs.values() if job["status"] == "running"))
+        metrics.gauge("ytdlp.search_sessions", lambda: len(self.yt_searches))
+        metrics.gauge("local.open_tracks", lambda: len(self.open_tracks))
+        metrics.gauge("ytdlp.resolves_in_flight", lambda: len(self.yt_resolves))
+        metrics.gauge("ytdlp.workers", lambda: len(self.ytdlp_pool.workers))
+        metrics.gauge("ytdlp.workers_busy", lambda: sum(1 for worker in self.ytdlp_pool.workers if worker.busy))
+        metrics.gauge("warm.streams", lambda: len(self.warm_streams))
+        metrics.gauge("background_tasks", lambda: len(self.background_tasks))
+        metrics.gauge("library.files", lambda: len(self.music_index.entries))
+        metrics.gauge("io.pending", lambda: self.io_pending)
+
+    async def _run_io(self, func: Callable, *args):
+        """
+        Run blocking file I/O in the I/O thread pool so the event loop keeps serving other calls.
+        At most `io_workers` calls run at once, the rest wait in the pool's queue.
+        :param func: Callable Blocking function
+        :param args: Arguments for func
+        :return: The return value of func
+        """
+        self.io_pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.io_executor, func, *args)
+        finally:
+            self.io_pending -= 1
+
+    async def _monitor_loop_lag(self, interval: float = 0.25):
+        """
+        Measure how late the event loop wakes up from a fixed sleep, as `loop.lag`.
+        Lag means a callback blocked the loop and every other call had to wait for it.
+        :param interval: float Sleep between measurements in seconds
+        :return: None
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(interval)
+            lag = max(loop.time() - start - interval, 0.0)
+            metrics.observe("loop.lag", lag)
+            if lag > 0.5:
+                logger.warning(f"Event loop was blocked for {lag * 1000:.0f} ms")
+
+    async def _reap_idle_handles(self, interval: float = 30):
+        """
+        Close the handles a frontend abandoned without closing them (page unmounted, crash),
+        so they do not hold on to their search slots or file mappings.
+        :param interval: float Seconds between sweeps
+        :return: None
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self._expire_yt_searches()
+                self._expire_open_tracks()
+            except Exception as e:
+                logger.error(f"Error closing idle handles: {e}")
+
+    async def get_metrics(self, prometheus: bool = False) -> dict | str:
+        """
+        Get the backend timings, counters, cache hit rates and queue depths.
+        :param prometheus: bool Return the Prometheus text format instead of a dict
+        :return: dict | str Metrics snapshot, durations in milliseconds
+        """
+        return metrics.to_prometheus() if prometheus else metrics.snapshot()
+
+    async def dump_metrics(self) -> str:
+        """
+        Write the metrics in the Prometheus text format to runtime/metrics.prom.
+        :return: str Path of the written file
+        """
+        file_path = Path(decky.DECKY_PLUGIN_RUNTIME_DIR) / "metrics.prom"
+        temp_path = file_path.with_name(f"{file_path.name}.tmp")
+        try:
+            temp_path.write_text(metrics.to_prometheus())
+            os.replace(temp_path, file_path)
+        except OSError as e:
+            logger.error(f"Error writing metrics to {file_path}: {e}")
+        return str(file_path)
+
+    async def _dump_metrics_periodically(self):
+        """
+        Write the metrics file every `metrics_dump_interval` seconds.
+        :return: None
+        """
+        while True:
+            await asyncio.sleep(self.settings.getSetting("metrics_dump_interval", 0))
+            await self.dump_metrics()
+
+    async def _start_music_server(self):
+        """
+        Start the loopback HTTP server that streams files from the music directory and proxies warm
+        YouTube streams. Files are served with Range/206, ETag and sendfile support by aiohttp's FileResponse.
+        :return: None
+        """
+        app = web.Application()
+        app.router.add_get("/music/{filename}", self._handle_music_request)
+        app.router.add_get("/stream/{id_yt}", self._handle_stream_request)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, self.music_server_host, 0)
+        await site.start()
+        self.music_server = runner
+        self.music_server_port = runner.addresses[0][1]
+        logger.info(f"Local music server listening on http://{self.music_server_host}:{self.music_server_port}")
+
+    async def _stop_music_server(self):
+        """
+        Stop the loopback HTTP server if it is running.
+        :return: None
+        """
+        if self.music_server is None:
+            return
+        logger.info("Stopping local music server...")
+        try:
+            await self.music_server.cleanup()
+        except Exception as e:
+            logger.error(f"Error stopping local music server: {e}")
+        self.music_server = None
+        self.music_server_port = None
+
+    async def _handle_music_request(self, request: web.Request) -> web.StreamResponse:
+        """
+        Serve a single file from the music directory.
+        :param request: web.Request Incoming request
+        :return: web.StreamResponse File response or 404
+        """
+        filename = request.match_info["filename"]
+        music_path = Path(self.music_path).resolve()
+        file_path = (music_path / filename).resolve()
+        if file_path.parent != music_path or not file_path.is_file():
+            logger.debug(f"Local music server: not found {filename}")
+            raise web.HTTPNotFound()
+        extension = file_path.suffix.lstrip('.').lower()
+        return web.FileResponse(
+            file_path,
+            headers={"Content-Type": AUDIO_MIME_TYPES.get(extension, f"audio/{extension}")},
+        )
+
+    async def _handle_stream_request(self, request: web.Request) -> web.StreamResponse:
+        """
+        Proxy a YouTube audio stream, answering the start of it from the warm pool when buffered.
+        :param request: web.Request Incoming request
+        :return: web.StreamResponse Proxied stream, 404 for streams that are not warm or cached,
+            502 when the upstream answers with an error
+        """
+        id_yt = request.match_info["id_yt"]
+        url = self.stream_url_cache.get(id_yt)
+        if url is None:
+            # Only streams handed out by _get_warm_stream_url are proxied, not arbitrary IDs
+            if id_yt not in self.warm_streams:
+                raise web.HTTPNotFound()
+            url = await asyncio.shield(self._get_yt_resolve(id_yt))
+        if not url:
+            raise web.HTTPNotFound()
+
+        start, end = 0, None
+        range_match = re.fullmatch(r"bytes=(\d+)-(\d*)", request.headers.get("Range", ""))
+        if range_match:
+            start = int(range_match.group(1))
+            end = int(range_match.group(2)) if range_match.group(2) else None
+
+        warm = self.warm_streams.get(id_yt)
+        if warm is not None and warm["url"] != url:
+            # The head came from a stream URL that has since expired, it cannot be joined with the new one
+            logger.debug(f"Dropping stale buffered stream for {id_yt}")
+            del self.warm_streams[id_yt]
+            warm = None
+        if warm is not None and warm["total"] and start < len(warm["head"]):
+            self.warm_streams.move_to_end(id_yt)
+            head, total = warm["head"], warm["total"]
+            end = total - 1 if end is None else min(end, total - 1)
+            async with contextlib.AsyncExitStack() as stack:
+                upstream = None
+                if end >= len(head):
+                    upstream = await stack.enter_async_context(
+                        self._get_http_session().get(url, headers={"Range": f"bytes={len(head)}-{end}"})
+                    )
+                    if upstream.status != 206:
+                        logger.warning(f"Stream upstream for {id_yt} answered HTTP {upstream.status}")
+                        self.warm_streams.pop(id_yt, None)
+                        raise web.HTTPBadGateway()
+                response = web.StreamResponse(status=206 if range_match else 200)
+                response.headers["Content-Type"] = warm["content_type"]
+                response.headers["Accept-Ranges"] = "bytes"
+                response.content_length = end - start + 1
+                if range_match:
+                    response.headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+                await response.prepare(request)
+                await response.write(head[start:end + 1])
+                if upstream is not None:
+                    async for chunk in upstream.content.iter_chunked(64 * 1024):
+                        await response.write(chunk)
+            await response.write_eof()
+            return response
+
+        headers = {"Range": request.headers["Range"]} if "Range" in request.headers else {}
+        async with self._get_http_session().get(url, headers=headers) as upstream:
+            if upstream.status == 416:
+                raise web.HTTPRequestRangeNotSatisfiable()
+            if upstream.status not in (200, 206):
+                # An expired or forbidden URL answers with an error page, which must not reach the player as audio
+                logger.warning(f"Stream upstream for {id_yt} answered HTTP {upstream.status}")
+                raise web.HTTPBadGateway()
+            response = web.StreamResponse(status=upstream.status)
+            for header in ("Content-Type", "Content-Length", "Content-Range", "Accept-Ranges"):
+                if header in upstream.headers:
+                    response.headers[header] = upstream.headers[header]
+            await response.prepare(request)
+            async for chunk in upstream.content.iter_chunked(64 * 1024):
+                await response.write(chunk)
+        await response.write_eof()
+        return response
+
+    async def _get_local_file_url(self, local_path: str) -> str:
+        """
+        Get a playable URL for a file in the music directory.
+        Uses the local music server, falls back to a base64 data URL if it is not running.
+        :param local_path: str Path to the local file
+        :return: str Audio URL
+        """
+        path = Path(local_path)
+        if self.music_server is not None and self.music_server_port is not None:
+            version = (await self._run_io(path.stat)).st_mtime_ns
+            url = f"http://{self.music_server_host}:{self.music_server_port}/music/{quote(path.name)}?v={version}"
+            analysis = self.audio_analysis.get(path.stem, self.music_index.get(path.stem))
+            if analysis and analysis["start"] > 0:
+                # Media fragment so the player starts after the leading silence
+                url += f"#t={analysis['start']}"
+            return url
+
+        logger.warning("Local music server is not running, falling back to base64 data URL")
+        with metrics.timer("local.base64_encode"):
+            return await self._run_io(self._encode_data_url, path)
+
+    @staticmethod
+    def _encode_data_url(path: Path) -> str:
+        """
+        Read a file into a base64 data URL. Blocking, run it with _run_io.
+        :param path: Path File to read
+        :return: str data: URL
+        """
+        extension = path.suffix.lstrip('.').lower()
+        mime_type = AUDIO_MIME_TYPES.get(extension, f"audio/{extension}")
+        with open(path, "rb") as file:
+            data = file.read()
+        metrics.count("local.base64_bytes", len(data))
+        return f"data:{mime_type};base64,{base64.b64encode(data).decode()}"
+
+    async def _write_response(self, response: aiohttp.ClientResponse, file_path: Path, job: dict | None = None,
+                              buffer_size: int = 1024 * 1024, append: bool = False):
+        """
+        Stream a response body to a file. Chunks are gathered into `buffer_size` blocks that are
+        written from the I/O thread pool, so slow storage does not stall the event loop.
+        Bytes written before an error are flushed too, so an interrupted download can be resumed.
+        :param response: aiohttp.ClientResponse Response to read
+        :param file_path: Path Destination file
+        :param job: dict | None Download job whose `downloaded` counter is advanced
+        :param buffer_size: int Bytes gathered before each write
+        :param append: bool Append to the file instead of overwriting it
+        :return: None
+        """
+        file = await self._run_io(open, file_path, "ab" if append else "wb")
+        buffer = bytearray()
+        try:
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                buffer += chunk
+                if job is not None:
+                    job["downloaded"] += len(chunk)
+                if len(buffer) >= buffer_size:
+                    await self._run_io(file.write, bytes(buffer))
+                    buffer.clear()
+        finally:
+            try:
+                if buffer:
+                    await self._run_io(file.write, bytes(buffer))
+                await self._run_io(file.flush)
+                await self._run_io(os.fsync, file.fileno())
+            finally:
+                await self._run_io(file.close)
+
+    async def _download_to_library(self, url: str, save_id: str, job: dict, extension: str | None = None) -> Path:
+        """
+        Download a file into the music directory as `{save_id}.{extension}`.
+        The body goes to `incoming/{save_id}.part`, which is kept when the transfer fails: the next
+        attempt resumes it with a Range request, unless the server reports the file changed. Dropped
+        connections are retried `download_retries` times. The file is checked against the length
+        announced by the server and only then moved into place, so a truncated download is never
+        served from the music directory.
+        :param url: str URL to download from
+        :param save_id: str ID to save as
+        :param job: dict Download queue job, updated with progress
+        :param extension: str | None File extension, guessed from the URL or Content-Type when None
+        :return: Path Path of the downloaded file
+        """
+        part_path = Path(self.incoming_path) / f"{save_id}.part"
+        retries = self.settings.getSetting("download_retries", 3)
+        for attempt in range(retries + 1):
+            try:
+                meta = await self._fetch_part(url, part_path, job)
+                break
+            except (aiohttp.ClientPayloadError, aiohttp.ClientConnectionError, asyncio.TimeoutError, DownloadIntegrityError) as e:
+                if attempt == retries:
+                    raise
+                logger.warning(f"Download of {save_id} interrupted at {job['downloaded']} bytes, retrying: {e}")
+                await asyncio.sleep(2 ** attempt)
+        dest_path = Path(self.music_path) / f"{save_id}.{extension or self._guess_extension(url, meta['content_type'])}"
+        await self._run_io(os.replace, part_path, dest_path)
+        await self._run_io(functools.partial(self._part_meta_path(part_path).unlink, missing_ok=True))
+        self.music_index.add(dest_path)
+        return dest_path
+
+    async def _fetch_part(self, url: str, part_path: Path, job: dict) -> dict:
+        """
+        Fetch the missing bytes of a .part file and check its final length.
+        The URL, validator (ETag or Last-Modified), total length and Content-Type of the transfer are
+        kept next to it in a .part.json file, so a resumed request can use If-Range.
+        :param url: str URL to download from
+        :param part_path: Path Partial file
+        :param job: dict Download queue job, updated with progress
+        :return: dict Transfer metadata
+        """
+        meta, offset = await self._run_io(self._read_part_state, part_path, url)
+        # Compressed bodies would not match Content-Length or resume at a byte offset
+        headers = {"Accept-Encoding": "identity"}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            if meta.get("validator"):
+                headers["If-Range"] = meta["validator"]
+        async with self._get_http_session().get(url, headers=headers) as response:
+            if response.status == 416 and offset:
+                if offset == meta.get("total"):
+                    logger.debug(f"{part_path.name} was already complete")
+                    job["downloaded"] = job["total"] = offset
+                    return meta
+                await self._run_io(part_path.unlink)
+                raise DownloadIntegrityError(f"range {offset}- not satisfiable, restarting")
+            response.raise_for_status()
+            total = response.content_length
+            if response.status == 206:
+                content_range = re.match(r"bytes (\d+)-\d+/(\d+|\*)", response.headers.get("Content-Range", ""))
+                if content_range is None or int(content_range.group(1)) != offset:
+                    raise DownloadIntegrityError(f"unexpected Content-Range {response.headers.get('Content-Range')!r}")
+                total = int(content_range.group(2)) if content_range.group(2) != "*" else None
+                logger.info(f"Resuming {part_path.name} at {offset} bytes")
+            else:
+                offset = 0
+            etag = response.headers.get("ETag", "")
+            meta = {
+                "url": url,
+                "validator": etag if etag and not etag.startswith("W/") else response.headers.get("Last-Modified"),
+                "total": total,
+                "content_type": response.headers.get("Content-Type", ""),
+            }
+            await self._run_io(self._write_part_meta, part_path, meta)
+            job["downloaded"] = offset
+            job["total"] = total
+            await self._write_response(response, part_path, job, append=offset > 0)
+        size = (await self._run_io(part_path.stat)).st_size
+        if total is not None and size != total:
+            if size > total:
+                # Not a prefix of the announced file, start over
+                await self._run_io(part_path.unlink)
+            raise DownloadIntegrityError(f"got {size} of {total} bytes")
+        return meta
+
+    @staticmethod
+    def _part_meta_path(part_path: Path) -> Path:
+        return part_path.with_name(f"{part_path.name}.json")
+
+    @staticmethod
+    def _read_part_state(part_path: Path, url: str) -> tuple[dict, int]:
+        """
+        Load the transfer metadata of a .part file and the offset to resume it at. Blocking, run it with _run_io.
+        :param part_path: Path Partial file
+        :param url: str URL being downloaded, a .part of another URL is started over
+        :return: tuple[dict, int] Metadata (empty if missing) and resume offset
+        """
         try:
-            await self.check_and_update_ytdlp()
-        except Exception as e:
-            logger.error(f"Error checking for yt-dlp updates: {e}")
+            with open(Plugin._part_meta_path(part_path), "r") as file:
+                meta = json.load(file)
+        except (OSError, ValueError):
+            meta = {}
+        if meta.get("url") != url:
+            return meta, 0
+        try:
+            return meta, part_path.stat().st_size
+        except FileNotFoundError:
+            return meta, 0
 
-    async def _unload(self):
-        logger.info("Plugin unloading...")
-        if self.yt_process is not None and self.yt_process.returncode is None:
-            logger.info("Terminating yt-dlp process...")
-            self.yt_process.terminate()
-            async with self.yt_process_lock:
+    @staticmethod
+    def _write_part_meta(part_path: Path, meta: dict):
+        with open(Plugin._part_meta_path(part_path), "w") as file:
+            json.dump(meta, file)
+
+    @staticmethod
+    def _guess_extension(url: str, content_type: str) -> str:
+        """
+        Pick the file extension of a download from its URL path, or from its Content-Type.
+        :param url: str Download URL
+        :param content_type: str Content-Type of the response
+        :return: str Extension without the dot
+        """
+        ext = os.path.splitext(urlparse(url).path)[1].lstrip('.')
+        if ext:
+            return ext
+        content_type = content_type.lower()
+        if 'mpeg' in content_type or 'mp3' in content_type:
+            return 'mp3'
+        if 'mpegurl' in content_type:
+            return 'm3u8'
+        if 'ogg' in content_type:
+            return 'ogg'
+        if 'wav' in content_type:
+            return 'wav'
+        return 'webm'
+
+    def _prune_incoming(self, max_age: float):
+        """
+        Delete partial downloads and staged copies older than `max_age` seconds. Blocking.
+        :param max_age: float Age in seconds
+        :return: None
+        """
+        cutoff = time.time() - max_age
+        with os.scandir(self.incoming_path) as it:
+            for item in it:
                 try:
-                    await asyncio.wait_for(self.yt_process.communicate(), timeout=5)
-                    logger.info("yt-dlp process terminated successfully")
-                except TimeoutError:
-                    logger.warning("yt-dlp process did not terminate in time, killing it")
-                    self.yt_process.kill()
-        logger.info("Plugin unloaded")
+                    if item.is_file() and item.stat().st_mtime < cutoff:
+                        os.remove(item.path)
+                        logger.debug(f"Removed stale partial download {item.name}")
+                except OSError as e:
+                    logger.debug(f"Could not remove {item.path}: {e}")
 
-    async def set_setting(self, key, value):
-        logger.debug(f"Setting {key} = {value}")
-        self.settings.setSetting(key, value)
+    async def _copy_to_library(self, source_path: Path, dest_path: Path):
+        """
+        Copy a file into the incoming directory from the I/O thread pool, then move it into the
+        music directory.
+        :param source_path: Path File to copy
+        :param dest_path: Path Final path in the music directory
+        :return: None
+        """
+        staged_path = Path(self.incoming_path) / dest_path.name
+        try:
+            await self._run_io(shutil.copy2, source_path, staged_path)
+            await self._run_io(os.replace, staged_path, dest_path)
+        finally:
+            await self._run_io(functools.partial(staged_path.unlink, missing_ok=True))
+        await self._run_io(self.music_index.add, dest_path)
 
-    async def get_setting(self, key, default):
-        value = self.settings.getSetting(key, default)
-        logger.debug(f"Getting {key} = {value}")
-        return value
+    def _get_http_session(self) -> aiohttp.ClientSession:
+        """
+        Get the plugin-lifetime HTTP session, creating it if needed.
+        The connector keeps connections alive between requests and caches DNS lookups.
+        :return: aiohttp.ClientSession
+        """
+        if self.http_session is None or self.http_session.closed:
+            connector = aiohttp.TCPConnector(
+                ssl=self.ssl_context,
+                limit=32,
+                limit_per_host=8,
+                ttl_dns_cache=300,
+                keepalive_timeout=60,
+            )
+            self.http_session = aiohttp.ClientSession(connector=connector, trace_configs=[self._http_trace_config()])
+        return self.http_session
+
+    @staticmethod
+    def _http_trace_config() -> aiohttp.TraceConfig:
+        """
+        Trace hooks recording the duration of HTTP requests per host and the bytes received.
+        :return: aiohttp.TraceConfig
+        """
+
+        async def on_request_start(_, context, params):
+            context.start = time.perf_counter()
+
+        async def on_request_end(_, context, params):
+            metrics.observe(f"http.{params.url.host}", time.perf_counter() - context.start)
+
+        async def on_request_exception(_, context, params):
+            metrics.count(f"http.{params.url.host}.errors")
+
+        async def on_response_chunk_received(_, context, params):
+            metrics.count("http.bytes_received", len(params.chunk))
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_exception.append(on_request_exception)
+        trace_config.on_response_chunk_received.append(on_response_chunk_received)
+        return trace_config
 
     def _get_ytdlp_path(self) -> str:
         """
@@ -89,6 +3033,48 @@ class Plugin:
             ytdlp_path = bin_dir / "yt-dlp"
         return str(ytdlp_path)
 
+    def _get_ytdlp_module_path(self) -> str | None:
+        """
+        Get the path to an importable yt-dlp zipapp for the worker pool.
+        The PyInstaller builds cannot be imported, only the plain "yt-dlp" zipapp release can.
+        :return: str | None Path to the zipapp or None if not available
+        """
+        bin_dir = Path(decky.DECKY_PLUGIN_DIR) / "bin"
+        for candidate in (bin_dir / "yt-dlp.pyz", Path(self._get_ytdlp_path())):
+            if candidate.is_file() and zipfile.is_zipfile(candidate):
+                return str(candidate)
+        return None
+
+    def _get_python_path(self) -> str | None:
+        """
+        Get a system Python interpreter able to run the yt-dlp worker.
+        :return: str | None Path to the interpreter or None if not found
+        """
+        if not getattr(sys, "frozen", False) and sys.executable:
+            return sys.executable
+        for name in ("python3", "python"):
+            if path := shutil.which(name):
+                return path
+        return None
+
+    def _create_ytdlp_pool(self) -> YtDlpWorkerPool:
+        """
+        Create the yt-dlp worker pool. Workers are only started on first use.
+        :return: YtDlpWorkerPool
+        """
+        pool = YtDlpWorkerPool(
+            self._get_python_path(),
+            self._get_ytdlp_module_path(),
+            self._get_env(),
+            self.subprocess_flags,
+            size=self.settings.getSetting("ytdlp_workers", 2),
+        )
+        if pool.available:
+            logger.info(f"yt-dlp worker pool enabled ({pool.python_path}, {pool.module_path})")
+        else:
+            logger.info("yt-dlp worker pool unavailable, using the yt-dlp binary for every call")
+        return pool
+
     def _get_env(self) -> dict:
         """
         Get the environment variables for subprocesses. Linux needs LD_LIBRARY_PATH set.
@@ -135,18 +3121,18 @@ class Plugin:
         """
         logger.info("Checking for latest yt-dlp release on GitHub")
         try:
-            async with aiohttp.ClientSession() as session:
-                url = "https://api.github.com/repos/yt-dlp/yt-dlp/releases/latest"
-                headers = {"Accept": "application/vnd.github.v3+json"}
-                async with session.get(url, headers=headers, ssl=self.ssl_context) as res:
-                    res.raise_for_status()
-                    data = await res.json()
-                    tag_name = data.get("tag_name", "")
-                    logger.info(f"Latest yt-dlp release: {tag_name}")
-                    return {
-                        "version": tag_name,
-                        "assets": data.get("assets", [])
-                    }
+            session = self._get_http_session()
+            url = "https://api.github.com/repos/yt-dlp/yt-dlp/releases/latest"
+            headers = {"Accept": "application/vnd.github.v3+json"}
+            async with session.get(url, headers=headers) as res:
+                res.raise_for_status()
+                data = await res.json()
+                tag_name = data.get("tag_name", "")
+                logger.info(f"Latest yt-dlp release: {tag_name}")
+                return {
+                    "version": tag_name,
+                    "assets": data.get("assets", [])
+                }
         except Exception as e:
             logger.error(f"Error getting latest yt-dlp release: {e}")
             return None
@@ -177,10 +3163,11 @@ class Plugin:
         logger.warning(f"Unknown platform {system}/{machine}, defaulting to yt-dlp_linux")
         return "yt-dlp_linux"
 
-    async def download_ytdlp_binary(self, asset_url: str) -> bool:
+    async def download_ytdlp_binary(self, asset_url: str, dest_path: str | None = None) -> bool:
         """
         Download yt-dlp binary from GitHub and replace the existing one.
         :param asset_url: str URL to download the binary from
+        :param dest_path: str | None Where to install it, defaults to the yt-dlp binary path
         :return: bool Success status
         """
         logger.info(f"Downloading yt-dlp binary from: {asset_url}")
@@ -188,15 +3175,13 @@ class Plugin:
             bin_dir = Path(decky.DECKY_PLUGIN_DIR) / "bin"
             bin_dir.mkdir(exist_ok=True)
             
-            ytdlp_path = Path(self._get_ytdlp_path())
+            ytdlp_path = Path(dest_path or self._get_ytdlp_path())
             temp_path = ytdlp_path.with_suffix(".tmp")
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(asset_url, ssl=self.ssl_context) as res:
-                    res.raise_for_status()
-                    with open(temp_path, "wb") as f:
-                        async for chunk in res.content.iter_chunked(8192):
-                            f.write(chunk)
+            session = self._get_http_session()
+            async with session.get(asset_url) as res:
+                res.raise_for_status()
+                await self._write_response(res, temp_path)
             
             if not self.is_windows:
                 temp_path.chmod(0o755)
@@ -231,6 +3216,7 @@ class Plugin:
             return False
         
         latest_version = latest_release["version"]
+        pyz_path = Path(decky.DECKY_PLUGIN_DIR) / "bin" / "yt-dlp.pyz"
         
         if current_version is None:
             logger.info("No existing yt-dlp binary, downloading latest")
@@ -241,6 +3227,8 @@ class Plugin:
             
             if current == latest:
                 logger.info(f"yt-dlp is up to date ({current_version})")
+                if not pyz_path.exists():
+                    await self._update_ytdlp_module(latest_release, pyz_path)
                 return False
             
             logger.info(f"New yt-dlp version available: {current_version} -> {latest_version}")
@@ -263,6 +3251,7 @@ class Plugin:
             if await self.download_ytdlp_binary(asset_url):
                 new_version = await self.get_ytdlp_version()
                 logger.info(f"yt-dlp updated successfully to version {new_version}")
+                await self._update_ytdlp_module(latest_release, pyz_path)
                 return True
             else:
                 logger.error("Failed to update yt-dlp")
@@ -270,8 +3259,34 @@ class Plugin:
         
         return False
 
-    async def search_yt(self, term: str):
-        """Search YouTube using yt-dlp."""
+    async def _update_ytdlp_module(self, release: dict, pyz_path: Path):
+        """
+        Download the importable yt-dlp zipapp used by the worker pool and restart the workers.
+        Skipped when there is no Python interpreter to run it.
+        :param release: dict Release info from get_latest_ytdlp_release
+        :param pyz_path: Path Where to install the zipapp
+        :return: None
+        """
+        if self._get_python_path() is None:
+            return
+        for asset in release["assets"]:
+            if asset["name"] == "yt-dlp":
+                if await self.download_ytdlp_binary(asset["browser_download_url"], str(pyz_path)):
+                    await self.ytdlp_pool.stop()
+                    self.ytdlp_pool = self._create_ytdlp_pool()
+                return
+        logger.warning("Could not find the yt-dlp zipapp in release")
+
+    async def search_yt(self, term: str, flat: bool = True) -> str | None:
+        """Search YouTube using yt-dlp.
+        Each call opens its own search session, so parallel searches do not cancel each other. When more
+        than `ytdlp_max_searches` sessions are running, the new one waits for a free slot.
+        With flat=True (the default) only the search listing is fetched, so results arrive almost at once
+        without stream URLs. Those are resolved lazily by single_yt_url, and ahead of time for the top results.
+        :param term: str Search term
+        :param flat: bool Skip per-video stream extraction
+        :return: str | None Session handle to pass to next_yt_result, None if yt-dlp is missing
+        """
         logger.info(f"Searching YouTube for: {term}")
         ytdlp_path = self._get_ytdlp_path()
 
@@ -283,24 +3298,47 @@ class Plugin:
                 logger.debug(f"yt-dlp binary found at: {ytdlp_path}")
             else:
                 logger.error(f"yt-dlp binary not found at: {ytdlp_path}")
-                return
+                return None
         except Exception as e:
             logger.error(f"Error checking yt-dlp binary: {e}")
-            return
+            return None
 
-        if self.yt_process is not None and self.yt_process.returncode is None:
-            logger.debug("Terminating existing yt-dlp search process")
-            self.yt_process.terminate()
-            async with self.yt_process_lock:
-                await self.yt_process.communicate()
+        await self._expire_yt_searches()
+        session = YtSearchSession(uuid.uuid4().hex, term)
+        self.yt_searches[session.session_id] = session
+        self.yt_last_search = session.session_id
+        session.start_task = asyncio.create_task(self._start_yt_search(session, flat))
+        return session.session_id
 
+    async def _start_yt_search(self, session: YtSearchSession, flat: bool):
+        """
+        Wait for a free search slot, then start the worker job or yt-dlp process for a session.
+        :param session: YtSearchSession Session to start
+        :param flat: bool Skip per-video stream extraction
+        :return: None
+        """
         try:
-            self.yt_process = await asyncio.create_subprocess_exec(
-                ytdlp_path,
-                f"ytsearch10:{term}",
+            await self.yt_search_slots.acquire()
+            session.has_slot = True
+            if self.ytdlp_pool.available:
+                try:
+                    session.job = await self.ytdlp_pool.submit(
+                        "search",
+                        url=f"ytsearch10:{session.term}",
+                        max_duration=20 * 60,
+                        flat=flat,
+                        opts={"format": "bestaudio"},
+                    )
+                    logger.info(f"yt-dlp worker search started for: {session.term}")
+                    return
+                except YtDlpWorkerError as e:
+                    logger.warning(f"yt-dlp worker search failed, using the binary: {e}")
+
+            session.process = await asyncio.create_subprocess_exec(
+                self._get_ytdlp_path(),
+                f"ytsearch10:{session.term}",
                 "-j",
-                "-f",
-                "bestaudio",
+                *(("--flat-playlist",) if flat else ("-f", "bestaudio")),
                 "--match-filters",
                 f"duration<?{20 * 60}",
                 stdout=asyncio.subprocess.PIPE,
@@ -309,29 +3347,71 @@ class Plugin:
                 env=self._get_env(),
                 **self.subprocess_flags,
             )
-            logger.info(f"yt-dlp search started for: {term}")
+            logger.info(f"yt-dlp search started for: {session.term}")
         except Exception as e:
             logger.error(f"Error starting yt-dlp search: {e}")
-            raise
+        finally:
+            session.started.set()
 
-    async def next_yt_result(self):
-        """Get the next YouTube search result from yt-dlp."""
-        async with self.yt_process_lock:
-            if (
-                    not self.yt_process
-                    or not (output := self.yt_process.stdout)
-                    or not (line := (await output.readline()).strip())
-            ):
-                logger.debug("No more YouTube search results")
+    async def _close_yt_search(self, session: YtSearchSession):
+        """
+        Stop a search session and free its slot.
+        :param session: YtSearchSession Session to close
+        :return: None
+        """
+        if self.yt_searches.pop(session.session_id, None) is None:
+            return
+        await session.stop()
+        if session.has_slot:
+            session.has_slot = False
+            self.yt_search_slots.release()
+
+    async def _expire_yt_searches(self):
+        now = time.monotonic()
+        for session in list(self.yt_searches.values()):
+            if now - session.last_used > self.yt_search_idle_timeout:
+                logger.debug(f"Closing idle YouTube search for: {session.term}")
+                await self._close_yt_search(session)
+
+    async def next_yt_result(self, handle: str | None = None):
+        """Get the next YouTube search result from yt-dlp.
+        :param handle: str | None Session handle returned by search_yt, defaults to the latest search
+        :return: dict | None Search result or None when the search is exhausted
+        """
+        session = self.yt_searches.get(handle or self.yt_last_search or "")
+        if session is None:
+            logger.debug("No YouTube search session")
+            return None
+        async with session.lock:
+            session.last_used = time.monotonic()
+            try:
+                await asyncio.wait_for(session.started.wait(), timeout=self.yt_search_idle_timeout)
+            except (TimeoutError, asyncio.TimeoutError):
+                logger.error(f"No free search slot for {session.term} after {self.yt_search_idle_timeout}s")
+                await self._close_yt_search(session)
                 return None
             try:
-                entry = json.loads(line)
-                result = self.entry_to_info(entry)
-                logger.debug(f"YouTube result: {result['title']} ({result['id']})")
-                return result
-            except json.JSONDecodeError as e:
+                entry = await session.next_entry()
+            except (YtDlpJobError, json.JSONDecodeError) as e:
                 logger.error(f"Error parsing YouTube result: {e}")
+                entry = None
+            if entry is None:
+                logger.debug("No more YouTube search results")
+                await self._close_yt_search(session)
                 return None
+            if session.count == 0:
+                metrics.observe("ytdlp.search_first_result", time.perf_counter() - session.created)
+            result = self._search_result(entry, session)
+            logger.debug(f"YouTube result: {result['title']} ({result['id']})")
+            return result
+
+    async def close_yt_search(self, handle: str):
+        """Close a YouTube search session before it is exhausted.
+        :param handle: str Session handle returned by search_yt
+        :return: None
+        """
+        if (session := self.yt_searches.get(handle)) is not None:
+            await self._close_yt_search(session)
 
     @staticmethod
     def entry_to_info(entry):
@@ -342,25 +3422,53 @@ class Plugin:
             "thumbnail": entry["thumbnail"],
         }
 
+    @staticmethod
+    def flat_entry_to_info(entry):
+        thumbnails = entry.get("thumbnails") or []
+        return {
+            "title": entry["title"],
+            "id": entry["id"],
+            "thumbnail": entry.get("thumbnail")
+            or (thumbnails[-1]["url"] if thumbnails else f"https://i.ytimg.com/vi/{entry['id']}/hqdefault.jpg"),
+            "duration": entry.get("duration"),
+        }
+
+    def _search_result(self, entry: dict, session: YtSearchSession) -> dict:
+        """
+        Convert a search entry for the frontend.
+        Flat entries carry no stream URL: a cached one is attached if available, otherwise the first
+        few results are resolved in the background so they are ready when the frontend asks.
+        :param entry: dict yt-dlp entry
+        :param session: YtSearchSession Session the entry belongs to
+        :return: dict Search result
+        """
+        session.count += 1
+        if entry.get("_type") != "url":
+            result = self.entry_to_info(entry)
+            self.stream_url_cache.put(result["id"], result["url"])
+            return result
+        result = self.flat_entry_to_info(entry)
+        if (url := self.stream_url_cache.get(result["id"])) is not None:
+            result["url"] = url
+        elif session.count <= self.yt_search_prefetch and self.local_match(result["id"]) is None:
+            self._get_yt_resolve(result["id"])
+        return result
+
     def local_match(self, id_local: str) -> str | None:
         """
         Find a locally downloaded audio file matching the given ID.
         :param id_local: str ID to match
         :return: str | None Path to local file if found, else None
         """
-        music_path = Path(self.music_path)
-        local_matches = [
-            str(x) for x in music_path.glob(f"{id_local}.*") if x.is_file()
-        ]
-        if len(local_matches) == 0:
+        local_match = self.music_index.get_path(id_local)
+        if local_match is None:
+            metrics.count("library.local_match.miss")
             logger.debug(f"No local match found for ID: {id_local}")
             return None
+        metrics.count("library.local_match.hit")
 
-        if len(local_matches) > 1:
-            logger.warning(f"Multiple local matches found for ID {id_local}: {local_matches}")
-
-        logger.debug(f"Local match found: {local_matches[0]}")
-        return local_matches[0]
+        logger.debug(f"Local match found: {local_match}")
+        return local_match
 
     async def single_yt_url(self, id_yt: str):
         """
@@ -371,19 +3479,194 @@ class Plugin:
         logger.info(f"Getting audio URL for YouTube ID: {id_yt}")
         local_match = self.local_match(id_yt)
         if local_match is not None:
-            extension = Path(local_match).suffix.lstrip('.')
             logger.debug(f"Using local file: {local_match}")
             try:
-                with open(local_match, "rb") as file:
-                    data_url = f"data:audio/{extension};base64,{base64.b64encode(file.read()).decode()}"
-                    logger.info(f"Returning base64-encoded local file for ID: {id_yt}")
-                    return data_url
+                url = await self._get_local_file_url(local_match)
+                logger.info(f"Returning local file URL for ID: {id_yt}")
+                return url
             except Exception as e:
                 logger.error(f"Error reading local file {local_match}: {e}")
 
-        ytdlp_path = self._get_ytdlp_path()
+        if (url := self.stream_url_cache.get(id_yt)) is not None:
+            logger.info(f"Using cached audio URL for ID: {id_yt}")
+            return self._get_warm_stream_url(id_yt) or url
+
+        return await asyncio.shield(self._get_yt_resolve(id_yt))
+
+    async def resolve_many(self, app_ids: list[str]) -> dict[str, dict]:
+        """
+        Resolve the playable URLs of the themes assigned to many apps in one call.
+        Local files are answered from the index, stream URLs are resolved with at most `resolve_workers`
+        lookups at once. Apps without an assignment, or whose theme could not be resolved, are left out.
+        :param app_ids: list[str] App IDs
+        :return: dict[str, dict] {app_id: {"videoId", "audioUrl", "volume"?}}, empty audioUrl when muted
+        """
+        results = {}
+        remote: dict[str, list[tuple[str, dict]]] = {}
+        for app_id, assignment in (await self._run_io(self.theme_db.get_assignments, app_ids)).items():
+            video_id = assignment.get("videoId")
+            if video_id is None:
+                continue
+            result = {key: value for key, value in assignment.items() if key in ("videoId", "volume")}
+            result["audioUrl"] = ""
+            if video_id == "":
+                results[app_id] = result
+                continue
+            local_match = self.local_match(video_id.replace("local_", "", 1) if video_id.startswith("local_") else video_id)
+            if local_match is not None:
+                try:
+                    result["audioUrl"] = await self._get_local_file_url(local_match)
+                    results[app_id] = result
+                except Exception as e:
+                    logger.error(f"Error reading local file {local_match}: {e}")
+            elif video_id.startswith(("local_", "itunes_")):
+                continue
+            elif (url := self.stream_url_cache.get(video_id)) is not None:
+                result["audioUrl"] = self._get_warm_stream_url(video_id) or url
+                results[app_id] = result
+            else:
+                remote.setdefault(video_id, []).append((app_id, result))
+
+        slots = asyncio.Semaphore(self.settings.getSetting("resolve_workers", 4))
+
+        async def resolve(id_yt: str) -> str | None:
+            async with slots:
+                return await asyncio.shield(self._get_yt_resolve(id_yt))
+
+        urls = await asyncio.gather(*(resolve(id_yt) for id_yt in remote), return_exceptions=True)
+        for waiting, url in zip(remote.values(), urls):
+            if isinstance(url, str) and url:
+                for app_id, result in waiting:
+                    result["audioUrl"] = url
+                    results[app_id] = result
+        logger.info(f"Resolved {len(results)} of {len(app_ids)} apps ({len(remote)} remote lookups)")
+        return results
+
+    async def focus_hint(self, app_id: str, neighbour_ids: list[str] | None = None):
+        """
+        Tell the backend which app has focus and which are visible next to it, closest first.
+        Once focus settles, the themes of those apps are kept warm: stream URLs resolved and the start of
+        each stream buffered, so playback starts without waiting on YouTube. Warming for apps that left
+        the neighbourhood is cancelled.
+        :param app_id: str Focused app ID
+        :param neighbour_ids: list[str] | None Visible neighbouring app IDs, closest first
+        :return: None
+        """
+        self.focus_hint_ids = [str(app_id), *(str(neighbour_id) for neighbour_id in neighbour_ids or [])]
+        if self.focus_hint_handle is not None:
+            self.focus_hint_handle.cancel()
+        # Wait for focus to settle so fast D-pad movement does not start work for every tile passed
+        self.focus_hint_handle = asyncio.get_running_loop().call_later(0.15, self._apply_focus_hint)
+
+    def _apply_focus_hint(self):
+        """
+        Start warming the themes around the last focus hint and cancel the rest.
+        :return: None
+        """
+        self.focus_hint_handle = None
+        pool_size = self.settings.getSetting("warm_pool_size", 6)
+        assignments = self.theme_db.get_assignments(self.focus_hint_ids[:pool_size])
+        wanted = []
+        for app_id in self.focus_hint_ids[:pool_size]:
+            video_id = assignments.get(app_id, {}).get("videoId")
+            if video_id and not video_id.startswith(("local_", "itunes_")) and self.local_match(video_id) is None:
+                wanted.append(video_id)
+        for id_yt, task in list(self.warm_tasks.items()):
+            if id_yt not in wanted:
+                task.cancel()
+        for id_yt in wanted:
+            if id_yt in self.warm_streams:
+                self.warm_streams.move_to_end(id_yt)
+            elif id_yt not in self.warm_tasks:
+                task = asyncio.create_task(self._warm_stream(id_yt))
+                self.warm_tasks[id_yt] = task
+                task.add_done_callback(lambda _, key=id_yt: self.warm_tasks.pop(key, None))
+
+    async def _warm_stream(self, id_yt: str):
+        """
+        Resolve the stream URL of a video and buffer the first `warm_buffer_bytes` of it in memory.
+        :param id_yt: str YouTube video ID
+        :return: None
+        """
+        url = self.stream_url_cache.get(id_yt) or await asyncio.shield(self._get_yt_resolve(id_yt))
+        if not url:
+            return
+        size = self.settings.getSetting("warm_buffer_bytes", 256 * 1024)
+        try:
+            async with self._get_http_session().get(url, headers={"Range": f"bytes=0-{size - 1}"}) as response:
+                if response.status not in (200, 206):
+                    logger.debug(f"Could not buffer stream for {id_yt}: HTTP {response.status}")
+                    return
+                head = bytearray()
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    head += chunk
+                    if len(head) >= size:
+                        break
+                total = response.content_length if response.status == 200 else None
+                if total_match := re.search(r"/(\d+)$", response.headers.get("Content-Range", "")):
+                    total = int(total_match.group(1))
+                content_type = response.headers.get("Content-Type", "audio/webm")
+        except aiohttp.ClientError as e:
+            logger.debug(f"Could not buffer stream for {id_yt}: {e}")
+            return
+        self.warm_streams[id_yt] = {
+            "url": url, "head": bytes(head[:size]), "total": total, "content_type": content_type
+        }
+        while len(self.warm_streams) > self.settings.getSetting("warm_pool_size", 6) * 2:
+            self.warm_streams.popitem(last=False)
+        logger.debug(f"Buffered {len(head)} bytes of {id_yt}")
+
+    def _get_warm_stream_url(self, id_yt: str) -> str | None:
+        """
+        Get the local proxy URL of a video whose stream start is buffered in the warm pool.
+        :param id_yt: str YouTube video ID
+        :return: str | None Proxy URL, or None if the video is not warm or the server is not running
+        """
+        if id_yt not in self.warm_streams or self.music_server is None or self.music_server_port is None:
+            return None
+        return f"http://{self.music_server_host}:{self.music_server_port}/stream/{quote(id_yt)}"
+
+    def _get_yt_resolve(self, id_yt: str) -> asyncio.Task:
+        """
+        Get the stream URL resolution task for a video, starting it if none is in flight.
+        :param id_yt: str YouTube video ID
+        :return: asyncio.Task Task resolving to the audio URL or None
+        """
+        task = self.yt_resolves.get(id_yt)
+        if task is None:
+            start = time.perf_counter()
+            task = asyncio.create_task(self._resolve_yt_url(id_yt))
+            self.yt_resolves[id_yt] = task
+
+            def done(_):
+                self.yt_resolves.pop(id_yt, None)
+                metrics.observe("ytdlp.resolve", time.perf_counter() - start)
+
+            task.add_done_callback(done)
+        return task
+
+    async def _resolve_yt_url(self, id_yt: str) -> str | None:
+        """
+        Resolve the stream URL of a YouTube video with yt-dlp.
+        :param id_yt: str YouTube video ID
+        :return: str | None Audio URL or None if not found
+        """
         logger.debug(f"Fetching audio URL from YouTube for ID: {id_yt}")
+        if self.ytdlp_pool.available:
+            try:
+                job = await self.ytdlp_pool.submit("extract", url=id_yt, opts={"format": "bestaudio"})
+                entry = await job.result()
+                url = entry["url"]
+                self.stream_url_cache.put(id_yt, url)
+                logger.info(f"Got audio URL for ID: {id_yt}")
+                return url
+            except YtDlpWorkerError as e:
+                logger.warning(f"yt-dlp worker could not resolve {id_yt}, using the binary: {e}")
+            except Exception as e:
+                logger.error(f"Error getting audio URL for ID {id_yt}: {e}")
+                return None
 
+        ytdlp_path = self._get_ytdlp_path()
         try:
             result = await asyncio.create_subprocess_exec(
                 ytdlp_path,
@@ -396,24 +3679,391 @@ class Plugin:
                 env=self._get_env(),
                 **self.subprocess_flags,
             )
-            if (
-                    result.stdout is None
-                    or len(output := (await result.stdout.read()).strip()) == 0
-            ):
-                logger.warning(f"No output from yt-dlp for ID: {id_yt}")
+            stdout, _ = await result.communicate()
+            if len(output := stdout.strip()) == 0:
+                logger.warning(f"No output from yt-dlp for ID: {id_yt}")
+                return None
+            entry = json.loads(output)
+            url = entry["url"]
+            self.stream_url_cache.put(id_yt, url)
+            logger.info(f"Got audio URL for ID: {id_yt}")
+            return url
+        except Exception as e:
+            logger.error(f"Error getting audio URL for ID {id_yt}: {e}")
+            return None
+
+    async def download_yt_audio(self, id_yt: str, priority: int = DownloadManager.PRIORITY_FOCUSED):
+        """
+        Download audio from YouTube using yt-dlp, through the download queue.
+        :param id_yt: str YouTube video ID
+        :param priority: int Queue priority, lower runs first
+        :return: None
+        """
+        if self.local_match(id_yt) is not None:
+            logger.info(f"Audio already downloaded for ID: {id_yt}")
+            return
+        await self.download_manager.enqueue(id_yt, lambda job: self._download_yt_audio(id_yt, job), priority)
+
+    def _get_ffmpeg_path(self) -> str | None:
+        """
+        Get the path to an ffmpeg binary, bundled in bin/ or on the PATH.
+        :return: str | None Path to ffmpeg or None if not available
+        """
+        bundled = Path(decky.DECKY_PLUGIN_DIR) / "bin" / ("ffmpeg.exe" if self.is_windows else "ffmpeg")
+        if bundled.is_file():
+            return str(bundled)
+        return shutil.which("ffmpeg")
+
+    def _on_music_added(self, stem: str):
+        """
+        Run the post-download processing stage for a new file in the music directory.
+        :param stem: str ID (file name without extension)
+        :return: None
+        """
+        task = asyncio.create_task(self._process_new_music(stem))
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+    def _on_music_downloaded(self, stem: str):
+        """
+        Record that a new file came from a download, so the quota may evict it, then process it.
+        :param stem: str ID (file name without extension)
+        :return: None
+        """
+        self.play_stats.set_downloaded(stem)
+        self._on_music_added(stem)
+
+    async def _process_new_music(self, stem: str):
+        """
+        Transcode (if enabled), read its tags, analyze, then enforce the music directory size budget.
+        :param stem: str ID (file name without extension)
+        :return: None
+        """
+        if self._get_ffmpeg_path() is not None and self.settings.getSetting("transcode_on_ingest", False):
+            await self._transcode_to_opus(stem)
+        await self._read_track_info(stem)
+        if self._get_ffmpeg_path() is not None and self.settings.getSetting("audio_analysis", True):
+            await self._analyze_audio(stem)
+        await self._enforce_music_budget(keep=stem)
+
+    async def _transcode_to_opus(self, stem: str) -> bool:
+        """
+        Re-encode a file to Opus at the `transcode_bitrate` setting, keeping its ID.
+        The output is written to a temporary file and moved into place, and only kept if it is smaller.
+        :param stem: str ID (file name without extension)
+        :return: bool True if the file was replaced
+        """
+        file_entry = self.music_index.get(stem)
+        if file_entry is None or file_entry["extension"].lower() == "opus":
+            return False
+        source_path = os.path.join(self.music_path, file_entry["filename"])
+        temp_dir = Path(decky.DECKY_PLUGIN_RUNTIME_DIR) / "transcode"
+        await self._run_io(functools.partial(temp_dir.mkdir, exist_ok=True))
+        temp_path = temp_dir / f"{stem}.opus"
+        bitrate = self.settings.getSetting("transcode_bitrate", "96k")
+        async with self.ffmpeg_slots:
+            logger.info(f"Transcoding {file_entry['filename']} to Opus at {bitrate}")
+            try:
+                start = time.perf_counter()
+                process = await asyncio.create_subprocess_exec(
+                    self._get_ffmpeg_path(),
+                    "-hide_banner",
+                    "-nostats",
+                    "-y",
+                    "-i",
+                    source_path,
+                    "-vn",
+                    "-map_metadata",
+                    "0",
+                    "-c:a",
+                    "libopus",
+                    "-b:a",
+                    str(bitrate),
+                    str(temp_path),
+                    stdout=asyncio.subprocess.DEVNULL,
+                    stderr=asyncio.subprocess.PIPE,
+                    env=self._get_env(),
+                    **self.subprocess_flags,
+                )
+                _, stderr = await process.communicate()
+                metrics.observe("ffmpeg.transcode", time.perf_counter() - start)
+            except Exception as e:
+                logger.error(f"Error running ffmpeg on {source_path}: {e}")
+                return False
+        try:
+            if process.returncode != 0:
+                logger.warning(f"Could not transcode {source_path}: {stderr.decode(errors='replace')[-500:]}")
+                return False
+            new_size = (await self._run_io(temp_path.stat)).st_size
+            if new_size >= file_entry["size"]:
+                logger.info(f"Keeping {file_entry['filename']}, Opus version is not smaller")
+                return False
+            dest_path = Path(self.music_path) / f"{stem}.opus"
+            await self._run_io(os.replace, temp_path, dest_path)
+            await self._run_io(os.remove, source_path)
+            self.music_index.add(dest_path)
+            saved = file_entry["size"] - new_size
+            self.settings.setSetting("transcode_saved_bytes", self.settings.getSetting("transcode_saved_bytes", 0) + saved)
+            logger.info(f"Transcoded {file_entry['filename']} -> {dest_path.name}, saved {saved} bytes")
+            return True
+        finally:
+            await self._run_io(functools.partial(temp_path.unlink, missing_ok=True))
+
+    async def _enforce_music_budget(self, keep: str | None = None):
+        """
+        Delete the least recently played, non-pinned downloads while the music directory is over the
+        `music_size_budget` (bytes) or `music_max_files` settings. 0 means unlimited for either.
+        :param keep: str | None ID never to evict, typically the file that was just added
+        :return: None
+        """
+        budget = self.settings.getSetting("music_size_budget", 0) or float("inf")
+        max_files = self.settings.getSetting("music_max_files", 0) or float("inf")
+        if budget == max_files == float("inf"):
+            return
+        entries = await self._run_io(self.music_index.values)
+        total = sum(entry["size"] for entry in entries)
+        count = len(entries)
+        if total <= budget and count <= max_files:
+            return
+        candidates = [
+            entry for entry in entries
+            if Path(entry["filename"]).stem != keep and self._is_evictable(Path(entry["filename"]).stem)
+        ]
+        candidates.sort(key=lambda entry: self.play_stats.last_played(Path(entry["filename"]).stem) or entry["mtime"])
+        for entry in candidates:
+            if total <= budget and count <= max_files:
+                break
+            stem = Path(entry["filename"]).stem
+            try:
+                await self._run_io(os.remove, os.path.join(self.music_path, entry["filename"]))
+            except OSError as e:
+                logger.error(f"Error evicting {entry['filename']}: {e}")
+                continue
+            self.music_index.remove(stem)
+            self._on_music_removed(stem)
+            total -= entry["size"]
+            count -= 1
+            logger.info(f"Evicted {entry['filename']} ({entry['size']} bytes) to stay under the music quota")
+
+    def _is_evictable(self, stem: str) -> bool:
+        """
+        Whether the quota may delete a file: it is not pinned and has a download record, so it can
+        be downloaded again. Files without a record (user imports) are never evicted.
+        :param stem: str ID (file name without extension)
+        :return: bool True if the file may be evicted
+        """
+        if self.play_stats.is_pinned(stem) or self.play_stats.is_imported(stem):
+            return False
+        return self.play_stats.is_downloaded(stem)
+
+    async def _migrate_download_records(self):
+        """
+        Give the files downloaded before download records existed their record, once.
+        A file counts as downloaded when an assignment uses its bare ID as a YouTube or iTunes
+        video ID; imports are assigned as local_ IDs.
+        :return: None
+        """
+        if self.settings.getSetting("download_records_migrated", False):
+            return
+        assignments = await self._run_io(self.theme_db.get_assignments)
+        video_ids = {
+            assignment["videoId"] for assignment in assignments.values()
+            if assignment.get("videoId") and not assignment["videoId"].startswith("local_")
+        }
+        migrated = 0
+        for entry in await self._run_io(self.music_index.values):
+            stem = Path(entry["filename"]).stem
+            if stem in video_ids and not self.play_stats.is_imported(stem) and not self.play_stats.is_downloaded(stem):
+                self.play_stats.set_downloaded(stem)
+                migrated += 1
+        self.settings.setSetting("download_records_migrated", True)
+        logger.info(f"Recorded {migrated} existing downloads")
+
+    async def get_music_usage(self) -> dict:
+        """
+        Get the disk usage of the music directory against its quota.
+        :return: dict {"bytes", "files", "pinned", "budget_bytes", "max_files", "transcode_saved_bytes"}
+        """
+        entries = await self._run_io(self.music_index.values)
+        return {
+            "bytes": sum(entry["size"] for entry in entries),
+            "files": len(entries),
+            "pinned": sum(1 for entry in entries if self.play_stats.is_pinned(Path(entry["filename"]).stem)),
+            "budget_bytes": self.settings.getSetting("music_size_budget", 0),
+            "max_files": self.settings.getSetting("music_max_files", 0),
+            "transcode_saved_bytes": self.settings.getSetting("transcode_saved_bytes", 0),
+        }
+
+    async def set_music_pinned(self, id_music: str, pinned: bool = True):
+        """
+        Protect a theme picked by hand from quota eviction, or remove that protection.
+        :param id_music: str Music ID (YouTube, itunes_ or local_ ID)
+        :param pinned: bool Whether the theme is protected
+        :return: None
+        """
+        stem = id_music.replace("local_", "", 1) if id_music.startswith("local_") else id_music
+        self.play_stats.set_pinned(stem, pinned)
+
+    async def set_music_quota(self, budget_bytes: int, max_files: int):
+        """
+        Change the music directory quota and evict down to it right away.
+        :param budget_bytes: int Maximum total size in bytes, 0 for unlimited
+        :param max_files: int Maximum number of files, 0 for unlimited
+        :return: None
+        """
+        self.settings.setSetting("music_size_budget", max(0, int(budget_bytes)))
+        self.settings.setSetting("music_max_files", max(0, int(max_files)))
+        await self._enforce_music_budget()
+
+    def _on_music_removed(self, stem: str):
+        """
+        Drop the sidecar data of a file removed from the music directory.
+        :param stem: str ID (file name without extension)
+        :return: None
+        """
+        self.audio_analysis.remove(stem)
+        self.track_info.remove(stem)
+        if not self.play_stats.is_pinned(stem):
+            self.play_stats.remove(stem)
+
+    async def _read_track_info(self, stem: str) -> dict | None:
+        """
+        Get the duration and tags of a file, parsing its headers in the I/O thread pool when the
+        track_info sidecar has no record for its current size and mtime.
+        :param stem: str ID (file name without extension)
+        :return: dict | None Metadata from TrackMetadataReader, None if there is no such file
+        """
+        file_entry = self.music_index.get(stem)
+        if file_entry is None:
+            return None
+        if (info := self.track_info.get(stem, file_entry)) is not None:
+            return info
+        try:
+            info = await self._run_io(TrackMetadataReader.read, os.path.join(self.music_path, file_entry["filename"]))
+        except Exception as e:
+            # Truncated or malformed headers fail in the parser with struct, index or decoding errors
+            logger.warning(f"Could not read metadata of {file_entry['filename']}: {e!r}")
+            return None
+        self.track_info.put(stem, file_entry, info)
+        self.music_index.set_tags({stem: info})
+        return info
+
+    async def _scan_track_info(self, batch_size: int = 64):
+        """
+        Index the tags of every file, reading those without a current record `batch_size` at a time,
+        which the I/O thread pool spreads over its workers.
+        :param batch_size: int Files read concurrently
+        :return: None
+        """
+        known = {}
+        missing = []
+        for entry in await self._run_io(self.music_index.values):
+            stem, extension = os.path.splitext(entry["filename"])
+            if (info := self.track_info.get(stem, entry)) is not None:
+                known[stem] = info
+            elif extension.lower() in AUDIO_EXTENSIONS:
+                missing.append(stem)
+        await self._run_io(self.music_index.set_tags, known)
+        if not missing:
+            return
+        logger.info(f"Reading metadata of {len(missing)} files")
+        start = time.perf_counter()
+        for i in range(0, len(missing), batch_size):
+            results = await asyncio.gather(
+                *(self._read_track_info(stem) for stem in missing[i:i + batch_size]), return_exceptions=True
+            )
+            for stem, result in zip(missing[i:i + batch_size], results):
+                if isinstance(result, Exception):
+                    logger.error(f"Error indexing metadata of {stem}: {result!r}")
+        logger.info(f"Read metadata of {len(missing)} files in {time.perf_counter() - start:.1f}s")
+
+    async def get_track_info(self, id_music: str) -> dict | None:
+        """
+        Get the duration and tags of a local file.
+        :param id_music: str ID, with or without the local_ prefix
+        :return: dict | None {"id", "filename", "size", "format", "duration", "title", "artist", "album"}
+        """
+        stem = id_music.replace("local_", "", 1) if id_music.startswith("local_") else id_music
+        info = await self._read_track_info(stem)
+        file_entry = self.music_index.get(stem)
+        if info is None or file_entry is None:
+            return None
+        return {"id": id_music, "filename": file_entry["filename"], "size": file_entry["size"], **info}
+
+    async def _analyze_audio(self, stem: str) -> dict | None:
+        """
+        Measure the integrated loudness and leading silence of a file with ffmpeg and store the result.
+        Shares the `ffmpeg_workers` limit with transcoding.
+        :param stem: str ID (file name without extension)
+        :return: dict | None Analysis {"loudness", "gain_db", "start"} or None on failure
+        """
+        file_entry = self.music_index.get(stem)
+        if file_entry is None:
+            return None
+        if (analysis := self.audio_analysis.get(stem, file_entry)) is not None:
+            return analysis
+        file_path = os.path.join(self.music_path, file_entry["filename"])
+        async with self.ffmpeg_slots:
+            logger.info(f"Analyzing audio: {file_path}")
+            try:
+                start = time.perf_counter()
+                process = await asyncio.create_subprocess_exec(
+                    self._get_ffmpeg_path(),
+                    "-hide_banner",
+                    "-nostats",
+                    "-i",
+                    file_path,
+                    "-af",
+                    "silencedetect=noise=-50dB:d=0.3,ebur128=framelog=quiet",
+                    "-f",
+                    "null",
+                    "-",
+                    stdout=asyncio.subprocess.DEVNULL,
+                    stderr=asyncio.subprocess.PIPE,
+                    env=self._get_env(),
+                    **self.subprocess_flags,
+                )
+                _, stderr = await process.communicate()
+                metrics.observe("ffmpeg.analyze", time.perf_counter() - start)
+            except Exception as e:
+                logger.error(f"Error running ffmpeg on {file_path}: {e}")
                 return None
-            entry = json.loads(output)
-            url = entry["url"]
-            logger.info(f"Got audio URL for ID: {id_yt}")
-            return url
-        except Exception as e:
-            logger.error(f"Error getting audio URL for ID {id_yt}: {e}")
+        output = stderr.decode(errors="replace")
+        loudness_match = re.search(r"I:\s+(-?[\d.]+) LUFS", output)
+        if process.returncode != 0 or loudness_match is None:
+            logger.warning(f"Could not analyze {file_path} (ffmpeg returned {process.returncode})")
             return None
 
-    async def download_yt_audio(self, id_yt: str):
+        loudness = float(loudness_match.group(1))
+        target = self.settings.getSetting("target_loudness", -18.0)
+        start = 0.0
+        silence_start = re.search(r"silence_start: (-?[\d.]+)", output)
+        silence_end = re.search(r"silence_end: ([\d.]+)", output)
+        if silence_start and silence_end and float(silence_start.group(1)) <= 0.05:
+            start = round(float(silence_end.group(1)), 2)
+        analysis = {
+            "loudness": loudness,
+            "gain_db": round(max(-20.0, min(10.0, target - loudness)), 2),
+            "start": start,
+        }
+        self.audio_analysis.put(stem, file_entry, analysis)
+        logger.info(f"Analyzed {file_entry['filename']}: {loudness} LUFS, gain {analysis['gain_db']} dB, starts at {start}s")
+        return analysis
+
+    async def get_audio_analysis(self, id_music: str) -> dict | None:
+        """
+        Get the stored loudness analysis of a downloaded or imported file.
+        :param id_music: str Music ID (YouTube, itunes_ or local_ ID)
+        :return: dict | None {"loudness", "gain_db", "start"} or None if not analyzed
+        """
+        stem = id_music.replace("local_", "", 1) if id_music.startswith("local_") else id_music
+        return self.audio_analysis.get(stem, self.music_index.get(stem))
+
+    async def _download_yt_audio(self, id_yt: str, job: dict):
         """
         Download audio from YouTube using yt-dlp.
         :param id_yt: str YouTube video ID
+        :param job: dict Download queue job, updated with progress
         :return: None
         """
         if self.local_match(id_yt) is not None:
@@ -421,6 +4071,34 @@ class Plugin:
             return
 
         logger.info(f"Downloading audio for YouTube ID: {id_yt}")
+        if self.ytdlp_pool.available:
+            try:
+                worker_job = await self.ytdlp_pool.submit(
+                    "download",
+                    url=id_yt,
+                    opts={
+                        "format": "bestaudio",
+                        "outtmpl": "%(id)s.%(ext)s",
+                        "paths": {"home": self.music_path, "temp": self.incoming_path},
+                    },
+                )
+                worker_job.on_progress = job.update
+                try:
+                    returncode = await worker_job.result()
+                except YtDlpJobError as e:
+                    logger.error(f"yt-dlp worker download failed: {e}")
+                    raise YtDlpDownloadError(str(e)) from e
+                finally:
+                    self.music_index.refresh(id_yt)
+                if returncode != 0:
+                    logger.error(f"yt-dlp worker download failed with return code {returncode}")
+                    raise YtDlpDownloadError(f"yt-dlp worker returned {returncode}")
+                logger.info(f"Successfully downloaded audio for ID: {id_yt}")
+                self._on_music_downloaded(id_yt)
+                return
+            except YtDlpWorkerError as e:
+                logger.warning(f"yt-dlp worker could not download {id_yt}, using the binary: {e}")
+
         ytdlp_path = self._get_ytdlp_path()
 
         try:
@@ -433,6 +4111,12 @@ class Plugin:
                 "%(id)s.%(ext)s",
                 "-P",
                 self.music_path,
+                "-P",
+                f"temp:{self.incoming_path}",
+                "--newline",
+                "--progress-template",
+                f"download:{YTDLP_PROGRESS_PREFIX} %(progress.downloaded_bytes)s "
+                "%(progress.total_bytes,progress.total_bytes_estimate)s",
             ]
             logger.info(f"Running yt-dlp command: {yt_dlp_cmd}")
             logger.info(f"Working directory: {os.getcwd()}")
@@ -443,10 +4127,25 @@ class Plugin:
                 env=self._get_env(),
                 **self.subprocess_flags,
             )
-            stdout, stderr = await process.communicate()
+            output = []
+
+            async def read_stdout():
+                async for line in process.stdout:
+                    text = line.decode(errors="replace").rstrip()
+                    progress = YTDLP_PROGRESS_RE.fullmatch(text)
+                    if progress is None:
+                        output.append(text)
+                        continue
+                    job["downloaded"] = int(float(progress.group(1)))
+                    if progress.group(2) != "NA":
+                        job["total"] = int(float(progress.group(2)))
+
+            _, stderr = await asyncio.gather(read_stdout(), process.stderr.read())
+            await process.wait()
+            stdout = "\n".join(output)
 
             if stdout:
-                logger.info(f"yt-dlp stdout: {stdout.decode(errors='replace')}")
+                logger.info(f"yt-dlp stdout: {stdout}")
             else:
                 logger.info("yt-dlp stdout: <empty>")
             if stderr:
@@ -454,213 +4153,454 @@ class Plugin:
             else:
                 logger.info("yt-dlp stderr: <empty>")
 
+            self.music_index.refresh(id_yt)
             if process.returncode == 0:
                 logger.info(f"Successfully downloaded audio for ID: {id_yt}")
+                self._on_music_downloaded(id_yt)
             else:
                 logger.error(f"yt-dlp failed with return code {process.returncode}")
                 if stderr:
                     logger.error(f"yt-dlp stderr: {stderr.decode()}")
+                raise YtDlpDownloadError(f"yt-dlp exited with return code {process.returncode}")
         except Exception as e:
             logger.error(f"Error downloading audio for ID {id_yt}: {e}")
             raise
 
-    async def download_url(self, url: str, id_to_save_as: str):
+    async def download_url(self, url: str, id_to_save_as: str, priority: int = DownloadManager.PRIORITY_FOCUSED):
         """
-        Download audio from a direct URL or iTunes preview.
-        We do not enforce WebM format here
+        Download audio from a direct URL or iTunes preview, through the download queue.
         :param url: str URL to download from
         :param id_to_save_as: str ID to save as
+        :param priority: int Queue priority, lower runs first
         :return: None
         """
-        logger.info(f"Downloading audio for ID: {id_to_save_as}")
         if id_to_save_as.startswith("itunes_"):
             logger.info(f"ID {id_to_save_as} detected as iTunes, using download_itunes for more accurate handling")
-            await self.download_itunes(id_to_save_as)
+            await self.download_itunes(id_to_save_as, priority)
             return
+        await self.download_manager.enqueue(
+            id_to_save_as, lambda job: self._download_url(url, id_to_save_as, job), priority
+        )
+
+    async def _download_url(self, url: str, id_to_save_as: str, job: dict):
+        """
+        Download audio from a direct URL.
+        We do not enforce WebM format here
+        :param url: str URL to download from
+        :param id_to_save_as: str ID to save as
+        :param job: dict Download queue job, updated with progress
+        :return: None
+        """
+        logger.info(f"Downloading audio for ID: {id_to_save_as}")
         try:
-            async with aiohttp.ClientSession() as session:
-                res = await session.get(url, ssl=self.ssl_context)
-                res.raise_for_status()
-                try:
-                    from urllib.parse import urlparse
-                    parsed = urlparse(url)
-                    ext = os.path.splitext(parsed.path)[1].lstrip('.')
-                except Exception:
-                    ext = ''
-
-                if not ext:
-                    ctype = res.headers.get('content-type', '')
-                    if 'mpeg' in ctype or 'mp3' in ctype:
-                        ext = 'mp3'
-                    elif 'mpegurl' in ctype:
-                        ext = 'm3u8'
-                    elif 'ogg' in ctype:
-                        ext = 'ogg'
-                    elif 'wav' in ctype:
-                        ext = 'wav'
-                    elif 'mpeg' in ctype:
-                        ext = 'mp3'
-                    else:
-                        ext = 'webm'
-
-                file_path = Path(self.music_path) / f"{id_to_save_as}.{ext}"
-                with open(file_path, "wb") as file:
-                    async for chunk in res.content.iter_chunked(1024):
-                        file.write(chunk)
+            await self._download_to_library(url, id_to_save_as, job)
             logger.info(f"Successfully downloaded audio from URL for ID: {id_to_save_as}")
+            self._on_music_downloaded(id_to_save_as)
         except Exception as e:
             logger.error(f"Error downloading from URL for ID {id_to_save_as}: {e}")
             raise
 
-    async def download_itunes(self, track_id: str):
+    async def download_itunes(self, track_id: str, priority: int = DownloadManager.PRIORITY_FOCUSED):
         """
-        Download audio preview from iTunes.
+        Download audio preview from iTunes, through the download queue.
         :param track_id: str iTunes track ID
+        :param priority: int Queue priority, lower runs first
         :return: None
         """
-        logger.info(f"Downloading iTunes audio for ID: {track_id}")
         if track_id.startswith("itunes_"):
             track_id = track_id.split("_", 1)[1]
+        await self.download_manager.enqueue(
+            f"itunes_{track_id}", lambda job: self._download_itunes(track_id, job), priority
+        )
 
+    async def _lookup_itunes_preview(self, track_id: str) -> str | None:
+        """
+        Look up the preview URL of an iTunes track.
+        :param track_id: str iTunes track ID (without the itunes_ prefix)
+        :return: str | None Preview URL or None if not available
+        """
         lookup_url = f"https://itunes.apple.com/lookup?id={track_id}&entity=song"
-        try:
-            async with aiohttp.ClientSession() as session:
-                res = await session.get(lookup_url, ssl=self.ssl_context)
-                res.raise_for_status()
-                try:
-                    text = await res.text()
-                    data = json.loads(text)
-                except Exception as e:
-                    logger.error(f"Error decoding iTunes lookup response as JSON: {e}")
-                    return
+        session = self._get_http_session()
+        async with session.get(lookup_url) as res:
+            res.raise_for_status()
+            try:
+                text = await res.text()
+                data = json.loads(text)
+            except Exception as e:
+                logger.error(f"Error decoding iTunes lookup response as JSON: {e}")
+                return None
 
-                if not data or 'results' not in data or len(data['results']) == 0:
-                    logger.warning(f"No iTunes lookup results for track id: {track_id}")
-                    return
+        if not data or 'results' not in data or len(data['results']) == 0:
+            logger.warning(f"No iTunes lookup results for track id: {track_id}")
+            return None
+
+        item = data['results'][0]
+        preview_url = item.get('previewUrl')
+        if not preview_url:
+            logger.warning(f"No previewUrl available for iTunes track {track_id}")
+            return None
+        self.itunes_track_cache.put(track_id, preview_url)
+        return preview_url
 
-                item = data['results'][0]
-                preview_url = item.get('previewUrl')
-                if not preview_url:
-                    logger.warning(f"No previewUrl available for iTunes track {track_id}")
+    async def _download_itunes(self, track_id: str, job: dict):
+        """
+        Download audio preview from iTunes.
+        The lookup is skipped when a previous search already returned the preview URL.
+        :param track_id: str iTunes track ID (without the itunes_ prefix)
+        :param job: dict Download queue job, updated with progress
+        :return: None
+        """
+        logger.info(f"Downloading iTunes audio for ID: {track_id}")
+
+        try:
+            preview_url = self.itunes_track_cache.get(track_id)
+            if preview_url is None:
+                preview_url = await self._lookup_itunes_preview(track_id)
+                if preview_url is None:
                     return
+            else:
+                logger.debug(f"Using cached preview URL for iTunes track {track_id}")
 
-                save_id = f"itunes_{track_id}"
-                ext = os.path.splitext(preview_url)[1].lower()
-                if ext != '.m4a':
-                    logger.warning(f"Preview URL does not end with .m4a, got: {ext}. Will still save as .m4a.")
-                dest_path = Path(self.music_path) / f"{save_id}.m4a"
-                try:
-                    async with session.get(preview_url, ssl=self.ssl_context) as audio_res:
-                        audio_res.raise_for_status()
-                        with open(dest_path, "wb") as f:
-                            async for chunk in audio_res.content.iter_chunked(1024):
-                                f.write(chunk)
-                    logger.info(f"Successfully downloaded iTunes preview to {dest_path}")
-                except Exception as e:
-                    logger.error(f"Error downloading iTunes preview audio: {e}")
-                    if dest_path.exists():
-                        try:
-                            dest_path.unlink()
-                        except Exception:
-                            pass
+            save_id = f"itunes_{track_id}"
+            ext = os.path.splitext(preview_url)[1].lower()
+            if ext != '.m4a':
+                logger.warning(f"Preview URL does not end with .m4a, got: {ext}. Will still save as .m4a.")
+            try:
+                dest_path = await self._download_to_library(preview_url, save_id, job, "m4a")
+                logger.info(f"Successfully downloaded iTunes preview to {dest_path}")
+                self._on_music_downloaded(save_id)
+            except Exception as e:
+                logger.error(f"Error downloading iTunes preview audio: {e}")
         except Exception as e:
             logger.error(f"Error downloading iTunes audio for {track_id}: {e}")
             raise
 
+    async def get_download_status(self) -> dict:
+        """
+        Get the state of the download queue.
+        :return: dict Queued and running downloads with progress, and completed/failed counters
+        """
+        return self.download_manager.status()
+
+    async def get_download_progress(self, id_to_check: str) -> dict | None:
+        """
+        Get the progress of a single queued or running download.
+        :param id_to_check: str ID the download is saved as
+        :return: dict | None Job status or None if not in the queue
+        """
+        for job in self.download_manager.status()["jobs"]:
+            if job["id"] == id_to_check:
+                return job
+        return None
+
+    async def _search_yt_ids(self, term: str, count: int = 5) -> list[str]:
+        """
+        Get the IDs of the top YouTube results for a term without resolving their streams.
+        :param term: str Search term
+        :param count: int Number of results
+        :return: list Video IDs in result order
+        """
+        if self.ytdlp_pool.available:
+            try:
+                job = await self.ytdlp_pool.submit(
+                    "search", url=f"ytsearch{count}:{term}", max_duration=20 * 60, flat=True
+                )
+                ids = []
+                while (entry := await job.next()) is not None:
+                    ids.append(entry["id"])
+                return ids
+            except YtDlpWorkerError as e:
+                logger.warning(f"yt-dlp worker search failed, using the binary: {e}")
+
+        process = await asyncio.create_subprocess_exec(
+            self._get_ytdlp_path(),
+            f"ytsearch{count}:{term}",
+            "-j",
+            "--flat-playlist",
+            "--match-filters",
+            f"duration<?{20 * 60}",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=10 * 1024 ** 2,
+            env=self._get_env(),
+            **self.subprocess_flags,
+        )
+        stdout, _ = await process.communicate()
+        ids = []
+        for line in stdout.splitlines():
+            try:
+                ids.append(json.loads(line)["id"])
+            except (json.JSONDecodeError, KeyError):
+                continue
+        return ids
+
+    def _load_prefetch_state(self) -> dict:
+        try:
+            with open(self.prefetch_state_path, "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            pass
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Error loading prefetch state: {e}")
+        return {"pending": [], "results": {}, "failed": []}
+
+    def _save_prefetch_state(self):
+        temp_path = f"{self.prefetch_state_path}.tmp"
+        try:
+            with open(temp_path, "w") as file:
+                json.dump(self.prefetch_state, file)
+            os.replace(temp_path, self.prefetch_state_path)
+        except OSError as e:
+            logger.error(f"Error saving prefetch state: {e}")
+
+    async def _prefetch_app(self, app: dict, search_lock: asyncio.Lock) -> str | None:
+        """
+        Run the search -> pick -> download pipeline for one game, following the frontend resolver:
+        search "<name> Theme Music" and keep the first result that downloads.
+        :param app: dict {"appId", "name"}
+        :param search_lock: asyncio.Lock Serialises searches so foreground searches keep a free worker
+        :return: str | None Video ID or None if nothing could be downloaded
+        """
+        async with search_lock:
+            ids = await self._search_yt_ids(f"{app['name']} Theme Music", 3)
+        for video_id in ids:
+            self.prefetch_downloads.add(video_id)
+            try:
+                await self.download_yt_audio(video_id, DownloadManager.PRIORITY_BACKGROUND)
+            except Exception as e:
+                logger.warning(f"Prefetch download failed for {app['name']} ({video_id}): {e}")
+                continue
+            finally:
+                self.prefetch_downloads.discard(video_id)
+            if self.local_match(video_id) is not None:
+                return video_id
+        return None
+
+    async def _run_prefetch(self):
+        """
+        Work through the pending prefetch list in batches, saving progress after each batch so the
+        job resumes where it stopped after a plugin restart.
+        :return: None
+        """
+        batch_size = self.settings.getSetting("prefetch_batch_size", 4)
+        search_lock = asyncio.Lock()
+        state = self.prefetch_state
+        logger.info(f"Prefetching theme music for {len(state['pending'])} games")
+        while state["pending"]:
+            batch = state["pending"][:batch_size]
+            video_ids = await asyncio.gather(
+                *(self._prefetch_app(app, search_lock) for app in batch), return_exceptions=True
+            )
+            for app, video_id in zip(batch, video_ids):
+                app_id = str(app["appId"])
+                if isinstance(video_id, str):
+                    state["results"][app_id] = {"videoId": video_id}
+                else:
+                    if isinstance(video_id, Exception):
+                        logger.error(f"Error prefetching {app['name']}: {video_id}")
+                    state["failed"].append(app_id)
+            del state["pending"][:len(batch)]
+            self._save_prefetch_state()
+        logger.info(f"Prefetch finished: {len(state['results'])} found, {len(state['failed'])} failed")
+
+    def _start_prefetch(self):
+        if self.prefetch_task is None or self.prefetch_task.done():
+            self.prefetch_task = asyncio.create_task(self._run_prefetch())
+
+    async def prefetch_library(self, apps: list[dict]) -> dict:
+        """
+        Queue games for background prefetch of their theme music.
+        Games that already have a result or are already queued are skipped.
+        :param apps: list List of {"appId", "name"}
+        :return: dict Prefetch status
+        """
+        state = self.prefetch_state
+        known = {str(app["appId"]) for app in state["pending"]} | set(state["results"])
+        added = 0
+        for app in apps:
+            app_id = str(app["appId"])
+            if app_id in known or not app.get("name"):
+                continue
+            known.add(app_id)
+            state["pending"].append({"appId": app_id, "name": app["name"]})
+            if app_id in state["failed"]:
+                state["failed"].remove(app_id)
+            added += 1
+        logger.info(f"Queued {added} games for prefetch")
+        self._save_prefetch_state()
+        self._start_prefetch()
+        return await self.get_prefetch_status()
+
+    async def get_prefetch_status(self) -> dict:
+        """
+        Get the state of the prefetch job.
+        :return: dict Running flag and pending/done/failed counts
+        """
+        return {
+            "running": self.prefetch_task is not None and not self.prefetch_task.done(),
+            "pending": len(self.prefetch_state["pending"]),
+            "done": len(self.prefetch_state["results"]),
+            "failed": len(self.prefetch_state["failed"]),
+        }
+
+    async def get_prefetch_results(self) -> dict:
+        """
+        Get the themes found by the prefetch job that the frontend has not picked up yet.
+        :return: dict Mapping of app ID to {"videoId"}
+        """
+        return self.prefetch_state["results"]
+
+    async def get_prefetch_result(self, app_id: str) -> dict | None:
+        """
+        Get the prefetched theme for a single game.
+        :param app_id: str App ID
+        :return: dict | None {"videoId"} or None if not prefetched
+        """
+        return self.prefetch_state["results"].get(str(app_id))
+
+    async def clear_prefetch_results(self, app_ids: list[str]):
+        """
+        Forget prefetch results once the frontend has stored them in its cache.
+        :param app_ids: list App IDs to forget
+        :return: None
+        """
+        for app_id in app_ids:
+            self.prefetch_state["results"].pop(str(app_id), None)
+        self._save_prefetch_state()
+
+    async def cancel_prefetch(self):
+        """
+        Stop the prefetch job, drop its downloads that have not started and the games still pending.
+        :return: None
+        """
+        if self.prefetch_task is not None:
+            self.prefetch_task.cancel()
+            self.prefetch_task = None
+        for video_id in self.prefetch_downloads:
+            self.download_manager.cancel(video_id, DownloadManager.PRIORITY_BACKGROUND)
+        self.prefetch_downloads.clear()
+        self.prefetch_state["pending"] = []
+        self._save_prefetch_state()
+        logger.info("Prefetch cancelled")
+
     async def search_itunes(self, term: str, limit: int = 10):
         """
         Search iTunes for music matching the search term.
+        Results are cached for a day and identical searches in flight share one request.
         :param term: str Search term
         :param limit: int Maximum number of results to return
         :return: list List of search results
         """
-        logger.info(f"Searching iTunes for: {term}")
-        try:
-            async with aiohttp.ClientSession() as session:
-                params = {
-                    "term": term,
-                    "media": "music",
-                    "entity": "song",
-                    "limit": limit,
-                    "attribute": "songTerm"
-                }
-                url = "https://itunes.apple.com/search"
-                res = await session.get(url, params=params, ssl=self.ssl_context)
-                res.raise_for_status()
-                try:
-                    text = await res.text()
-                    data = json.loads(text)
-                except Exception as e:
-                    logger.error(f"Error decoding iTunes response as JSON: {e}")
-                    return []
-
-                results = []
-                if "results" in data:
-                    for item in data["results"]:
-                        result = {
-                            "id": f"itunes_{item.get('trackId', '')}",
-                            "title": f"{item.get('trackName', '')} - {item.get('artistName', '')}",
-                            "url": item.get("previewUrl", ""),
-                            "thumbnail": item.get("artworkUrl100", "").replace("100x100", "600x600"),
-                            "artist": item.get("artistName", ""),
-                            "album": item.get("collectionName", ""),
-                            "duration": item.get("trackTimeMillis", 0) // 1000
-                        }
-                        results.append(result)
-                    logger.info(f"Found {len(results)} iTunes results for: {term}")
-                else:
-                    logger.warning(f"No iTunes results found for: {term}")
+        key = f"{' '.join(term.lower().split())}|{limit}"
+        if (results := self.itunes_search_cache.get(key)) is not None:
+            logger.info(f"Using cached iTunes results for: {term}")
+            return results
 
-                return results
+        task = self.itunes_searches.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch_itunes_search(term, limit))
+            self.itunes_searches[key] = task
+            task.add_done_callback(lambda _: self.itunes_searches.pop(key, None))
+        else:
+            logger.info(f"Joining iTunes search already in flight for: {term}")
+        try:
+            results = await asyncio.shield(task)
         except Exception as e:
             logger.error(f"Error searching iTunes: {e}")
             return []
+        self.itunes_search_cache.put(key, results)
+        return results
+
+    async def _fetch_itunes_search(self, term: str, limit: int) -> list:
+        """
+        Run an iTunes search request.
+        :param term: str Search term
+        :param limit: int Maximum number of results to return
+        :return: list List of search results
+        """
+        logger.info(f"Searching iTunes for: {term}")
+        session = self._get_http_session()
+        params = {
+            "term": term,
+            "media": "music",
+            "entity": "song",
+            "limit": limit,
+            "attribute": "songTerm"
+        }
+        url = "https://itunes.apple.com/search"
+        async with session.get(url, params=params) as res:
+            res.raise_for_status()
+            text = await res.text()
+            data = json.loads(text)
+
+        results = []
+        if "results" in data:
+            for item in data["results"]:
+                result = {
+                    "id": f"itunes_{item.get('trackId', '')}",
+                    "title": f"{item.get('trackName', '')} - {item.get('artistName', '')}",
+                    "url": item.get("previewUrl", ""),
+                    "thumbnail": item.get("artworkUrl100", "").replace("100x100", "600x600"),
+                    "artist": item.get("artistName", ""),
+                    "album": item.get("collectionName", ""),
+                    "duration": item.get("trackTimeMillis", 0) // 1000
+                }
+                results.append(result)
+                if item.get("trackId") and item.get("previewUrl"):
+                    self.itunes_track_cache.put(str(item["trackId"]), item["previewUrl"])
+            logger.info(f"Found {len(results)} iTunes results for: {term}")
+        else:
+            logger.warning(f"No iTunes results found for: {term}")
+
+        return results
 
     async def search_local_music(self, term: str = "", limit: int = 100):
         """
-        Search local music files. Returns list of local music files matching the term.
+        Search local music files, best match first. Words match exactly, by prefix or despite typos,
+        and an empty term lists every file.
         :param term: str Search term
         :param limit: int Maximum number of results to return
         :return: list List of local music files
         """
         logger.info(f"Searching local music for: {term}")
         try:
-            music_path = Path(self.music_path)
-            if not music_path.exists():
-                logger.warning("Music path does not exist")
-                return []
-
-            audio_extensions = {'.mp3', '.m4a', '.webm', '.ogg', '.wav', '.flac', '.aac', '.opus'}
-
+            if term.strip():
+                matches = await self._run_io(self.music_index.find, term, limit)
+            else:
+                entries = await self._run_io(self.music_index.values)
+                matches = [
+                    (entry, 0.0) for entry in entries
+                    if os.path.splitext(entry["filename"])[1].lower() in AUDIO_EXTENSIONS
+                ][:limit]
             results = []
-            for file in music_path.iterdir():
-                if file.is_file() and file.suffix.lower() in audio_extensions:
-                    if term and term.lower() not in file.stem.lower():
-                        continue
-                    logger.debug(f"Found local file: {file.name} (size: {file.stat().st_size} bytes)")
-                    result = {
-                        "id": f"local_{file.stem}",
-                        "title": file.stem.replace('_', ' ').replace('-', ' '),
-                        "url": "",
-                        "thumbnail": "",
-                        "filename": file.name,
-                        "extension": file.suffix.lstrip('.'),
-                        "size": file.stat().st_size
-                    }
-                    results.append(result)
-
-                    if len(results) >= limit:
-                        break
+            for entry, score in matches:
+                stem = os.path.splitext(entry["filename"])[0]
+                info = self.track_info.get(stem, entry) or {}
+                results.append({
+                    "id": f"local_{stem}",
+                    "title": info.get("title") or stem.replace('_', ' ').replace('-', ' '),
+                    "artist": info.get("artist"),
+                    "album": info.get("album"),
+                    "duration": info.get("duration"),
+                    "url": "",
+                    "thumbnail": "",
+                    "filename": entry["filename"],
+                    "extension": entry["extension"],
+                    "size": entry["size"],
+                    "score": score,
+                })
             logger.info(f"Found {len(results)} local music files")
             return results
         except Exception as e:
             logger.error(f"Error searching local music: {e}")
             return []
 
-    async def get_local_music_url(self, local_music_id: str):
-        """Get the audio URL for a local music file (as base64 data URL).
+    async def get_local_music_url(self, local_music_id: str, inline: bool = True):
+        """Get the audio URL for a local music file (served by the local music server).
         :param local_music_id: str Local music ID to look for
-        :return: str | None Base64 data URL or None if not found
+        :param inline: bool Fall back to a base64 data URL when the music server is down, otherwise return None
+            so the caller can stream the file with open_track and read_track_chunk
+        :return: str | None Audio URL or None if not found
         """
         logger.info(f"Getting local music URL for ID: {local_music_id}")
 
@@ -673,30 +4613,116 @@ class Plugin:
             logger.warning(f"No local music file found for ID: {local_music_id}")
             return None
 
+        if not inline and self.music_server is None:
+            logger.debug(f"Local music server is not running, {local_music_id} has to be streamed in chunks")
+            return None
+
         try:
-            extension = Path(local_match).suffix.lstrip('.').lower()
-            logger.info(f"Reading local file: {local_match}")
-            with open(local_match, "rb") as file:
-                data = file.read()
-                logger.debug(f"Read {len(data)} bytes from {local_match}")
-                mime_map = {
-                    "mp3": "audio/mpeg",
-                    "m4a": "audio/mp4",
-                    "webm": "audio/webm",
-                    "ogg": "audio/ogg",
-                    "wav": "audio/wav",
-                    "flac": "audio/flac",
-                    "aac": "audio/aac",
-                    "opus": "audio/opus"
-                }
-                mime_type = mime_map.get(extension, f"audio/{extension}")
-                data_url = f"data:{mime_type};base64,{base64.b64encode(data).decode()}"
-                logger.info(f"Returning base64-encoded local file for ID: {local_music_id} with MIME type {mime_type}")
-                return data_url
+            url = await self._get_local_file_url(local_match)
+            logger.info(f"Returning local file URL for ID: {local_music_id}")
+            return url
         except Exception as e:
             logger.error(f"Error reading local music file {local_match}: {e}")
             return None
 
+    async def record_play(self, id_music: str) -> bool:
+        """
+        Record that the theme player started playing a file. Resolving or preloading a URL is not a
+        play, so the frontend reports it once playback has actually started.
+        :param id_music: str ID, with or without the local_ prefix
+        :return: bool True if a local file was found for the ID
+        """
+        stem = id_music.replace("local_", "", 1) if id_music.startswith("local_") else id_music
+        if self.local_match(stem) is None:
+            return False
+        self.play_stats.record_play(stem)
+        return True
+
+    async def open_track(self, id_music: str) -> dict | None:
+        """
+        Open a local file for chunked reads with read_track_chunk, so playback can start
+        after the first chunk instead of after the whole file is encoded.
+        Handles left unused for `open_track_idle_timeout` seconds are closed.
+        :param id_music: str ID, with or without the local_ prefix
+        :return: dict | None {"handle", "size", "mimeType", "chunkSize", "duration"} or None if not found
+        """
+        self._expire_open_tracks()
+        stem = id_music.replace("local_", "", 1) if id_music.startswith("local_") else id_music
+        local_match = self.local_match(stem)
+        if local_match is None:
+            logger.warning(f"No local music file found for ID: {id_music}")
+            return None
+        try:
+            track = await self._run_io(OpenTrack, uuid.uuid4().hex, Path(local_match))
+        except OSError as e:
+            logger.error(f"Error opening local music file {local_match}: {e}")
+            return None
+        self.open_tracks[track.handle] = track
+        info = self.track_info.get(stem, self.music_index.get(stem))
+        logger.debug(f"Opened {track.path.name} ({track.size} bytes) as {track.handle}")
+        return {
+            "handle": track.handle,
+            "size": track.size,
+            "mimeType": track.mime_type,
+            "chunkSize": self._get_track_chunk_size(),
+            "duration": info["duration"] if info else None,
+        }
+
+    async def read_track_chunk(self, handle: str, offset: int, size: int | None = None) -> dict | None:
+        """
+        Read a slice of a file opened with open_track.
+        :param handle: str Handle returned by open_track
+        :param offset: int Byte offset to start at
+        :param size: int | None Number of bytes, defaults to and is capped by the track chunk size
+        :return: dict | None {"data" (base64), "offset", "size", "eof"} or None if the handle is unknown or closed
+        """
+        track = self.open_tracks.get(handle)
+        if track is None:
+            logger.warning(f"Unknown track handle: {handle}")
+            return None
+        track.last_used = time.monotonic()
+        offset = min(max(int(offset), 0), track.size)
+        size = min(max(int(size or self._get_track_chunk_size()), 1), self.track_chunk_max_size)
+        with metrics.timer("local.chunk_read"):
+            data = await self._run_io(track.read, offset, size)
+        if data is None:
+            logger.warning(f"Track handle closed during a read: {handle}")
+            return None
+        length = min(size, track.size - offset)
+        metrics.count("local.chunk_bytes", length)
+        return {"data": data, "offset": offset, "size": length, "eof": offset + length >= track.size}
+
+    async def close_track(self, handle: str) -> bool:
+        """
+        Close a file opened with open_track.
+        :param handle: str Handle returned by open_track
+        :return: bool True if the handle was open
+        """
+        self._expire_open_tracks()
+        track = self.open_tracks.get(handle)
+        if track is None:
+            return False
+        self._close_open_track(track)
+        return True
+
+    def _get_track_chunk_size(self) -> int:
+        size = self.settings.getSetting("track_chunk_size", self.track_chunk_size)
+        return min(max(int(size), 16 * 1024), self.track_chunk_max_size)
+
+    def _close_open_track(self, track: OpenTrack):
+        self.open_tracks.pop(track.handle, None)
+        try:
+            track.close()
+        except (OSError, BufferError) as e:
+            logger.error(f"Error closing {track.path.name}: {e}")
+
+    def _expire_open_tracks(self):
+        now = time.monotonic()
+        for track in list(self.open_tracks.values()):
+            if now - track.last_used > self.open_track_idle_timeout:
+                logger.debug(f"Closing idle track handle for: {track.path.name}")
+                self._close_open_track(track)
+
     async def save_local_music(self, file_path: str, custom_name: str = ""):
         """
         Import/save a music file from anywhere on the filesystem to the music directory.
@@ -705,16 +4731,15 @@ class Plugin:
         logger.info(f"Saving local music file: {file_path}")
         try:
             source_path = Path(file_path)
-            if not source_path.exists():
+            if not await self._run_io(source_path.exists):
                 logger.error(f"Source file does not exist: {file_path}")
                 return None
 
-            if not source_path.is_file():
+            if not await self._run_io(source_path.is_file):
                 logger.error(f"Source path is not a file: {file_path}")
                 return None
 
-            audio_extensions = {'.mp3', '.m4a', '.webm', '.ogg', '.wav', '.flac', '.aac', '.opus'}
-            if source_path.suffix.lower() not in audio_extensions:
+            if source_path.suffix.lower() not in AUDIO_EXTENSIONS:
                 logger.error(f"Unsupported audio format: {source_path.suffix}")
                 return None
 
@@ -727,23 +4752,65 @@ class Plugin:
 
             dest_path = Path(self.music_path) / dest_filename
 
-            if dest_path.exists():
+            if await self._run_io(dest_path.exists):
                 logger.warning(f"File already exists: {dest_filename}")
                 return f"local_{dest_path.stem}"
 
-            import shutil
-            shutil.copy2(source_path, dest_path)
-            logger.info(f"Successfully saved music file: {dest_filename} (size: {dest_path.stat().st_size} bytes)")
+            await self._copy_to_library(source_path, dest_path)
+            size = (await self._run_io(dest_path.stat)).st_size
+            logger.info(f"Successfully saved music file: {dest_filename} (size: {size} bytes)")
+            self.play_stats.set_imported(dest_path.stem)
+            self._on_music_added(dest_path.stem)
 
             return f"local_{dest_path.stem}"
         except Exception as e:
             logger.error(f"Error saving local music file: {e}")
             return None
 
-    async def list_directory(self, directory_path: str):
-        """List contents of a directory for file browser.
+    @staticmethod
+    def _read_directory(dir_path: Path, sort: str = "name") -> list[dict]:
+        """
+        List and sort the entries of a directory, directories first. Blocking, run it with _run_io.
+        Uses os.scandir, whose entries know their type from the directory read itself, so only
+        symlinks and the "modified" sort cost a stat per entry.
+        :param dir_path: Path Directory to list
+        :param sort: str "name" or "modified" (newest first)
+        :return: list[dict] [{"name", "path", "is_directory", "is_audio"}]
+        """
+        entries = []
+        with os.scandir(dir_path) as iterator:
+            for item in iterator:
+                try:
+                    is_directory = item.is_dir()
+                    entry = {
+                        "name": item.name,
+                        "path": item.path,
+                        "is_directory": is_directory,
+                        "is_audio": not is_directory and os.path.splitext(item.name)[1].lower() in AUDIO_EXTENSIONS
+                    }
+                    if sort == "modified":
+                        entry["modified"] = item.stat().st_mtime
+                except OSError as e:
+                    logger.debug(f"Skipping inaccessible item {item.path}: {e}")
+                    continue
+                entries.append(entry)
+        if sort == "modified":
+            entries.sort(key=lambda entry: (not entry["is_directory"], -entry["modified"]))
+        else:
+            entries.sort(key=lambda entry: (not entry["is_directory"], entry["name"].casefold()))
+        return entries
+
+    async def list_directory(self, directory_path: str, cursor: str | None = None, limit: int | None = None,
+                             audio_only: bool = False, sort: str = "name"):
+        """List contents of a directory for file browser, directories first, one page at a time.
+        Listings are cached until the directory is modified, so paging through a large folder lists it once.
         :param directory_path: str Path to directory
-        :return: dict Dictionary with 'entries' key containing list of entries
+        :param cursor: str | None Cursor returned with the previous page, None for the first page
+        :param limit: int | None Entries per page, defaults to `directory_page_size`
+        :param audio_only: bool Only return directories and audio files
+        :param sort: str "name" or "modified" (newest first)
+        :return: dict Dictionary with 'entries' key containing list of entries, 'next_cursor' (None on the
+            last page) and 'total'
         """
         logger.info(f"Listing directory: {directory_path}")
         try:
@@ -763,29 +4830,39 @@ class Plugin:
                 if not any(str(dir_path).startswith(prefix) for prefix in allowed_prefixes):
                     logger.warning(f"Directory access denied: {directory_path}")
                     return {"error": "Access denied", "entries": []}
-            if not dir_path.exists():
+            if sort not in ("name", "modified"):
+                return {"error": f"Unknown sort order: {sort}", "entries": []}
+            try:
+                offset = max(int(cursor), 0) if cursor else 0
+            except ValueError:
+                return {"error": "Invalid cursor", "entries": []}
+            try:
+                dir_stat = await self._run_io(os.stat, dir_path)
+            except FileNotFoundError:
                 logger.warning(f"Directory does not exist: {directory_path}")
                 return {"error": "Directory does not exist", "entries": []}
-            if not dir_path.is_dir():
+            if not stat.S_ISDIR(dir_stat.st_mode):
                 logger.warning(f"Path is not a directory: {directory_path}")
                 return {"error": "Not a directory", "entries": []}
-            entries = []
-            try:
-                for item in dir_path.iterdir():
-                    try:
-                        entries.append({
-                            "name": item.name,
-                            "path": str(item),
-                            "is_directory": item.is_dir()
-                        })
-                    except (PermissionError, OSError) as e:
-                        logger.debug(f"Skipping inaccessible item {item}: {e}")
-                        continue
-            except PermissionError:
-                logger.warning(f"Permission denied reading directory: {directory_path}")
-                return {"error": "Permission denied", "entries": []}
-            logger.info(f"Found {len(entries)} entries in {directory_path}")
-            return {"entries": entries}
+            entries = self.directory_cache.get(str(dir_path), sort, dir_stat.st_mtime_ns)
+            if entries is None:
+                try:
+                    with metrics.timer("browser.scan"):
+                        entries = await self._run_io(self._read_directory, dir_path, sort)
+                except PermissionError:
+                    logger.warning(f"Permission denied reading directory: {directory_path}")
+                    return {"error": "Permission denied", "entries": []}
+                self.directory_cache.put(str(dir_path), sort, dir_stat.st_mtime_ns, entries)
+                logger.info(f"Found {len(entries)} entries in {directory_path}")
+            if audio_only:
+                entries = [entry for entry in entries if entry["is_directory"] or entry["is_audio"]]
+            limit = max(int(limit or self.directory_page_size), 1)
+            end = offset + limit
+            return {
+                "entries": entries[offset:end],
+                "next_cursor": str(end) if end < len(entries) else None,
+                "total": len(entries)
+            }
         except Exception as e:
             logger.error(f"Error listing directory {directory_path}: {e}")
             return {"error": str(e), "entries": []}
@@ -807,86 +4884,192 @@ class Plugin:
                 return False
 
             file_path = Path(local_match)
-            logger.info(f"Deleting file: {file_path} (size: {file_path.stat().st_size} bytes)")
-            file_path.unlink()
+            logger.info(f"Deleting file: {file_path}")
+            await self._run_io(file_path.unlink)
+            self.music_index.remove(file_path.stem)
+            self._on_music_removed(file_path.stem)
             logger.info(f"Successfully deleted local music file: {file_path.name}")
             return True
         except Exception as e:
             logger.error(f"Error deleting local music file {local_music_id}: {e}")
             return False
 
-    async def clear_downloads(self):
-        """Clear all downloaded music files."""
-        logger.info("Clearing downloads...")
+    @staticmethod
+    def _delete_files(directory: Path, pattern: str = "*") -> int:
+        """
+        Delete the files of a directory matching a pattern. Blocking, run it with _run_io.
+        :param directory: Path Directory to empty
+        :param pattern: str Glob pattern of the files to delete
+        :return: int Number of files deleted
+        """
         count = 0
-        music_path = Path(self.music_path)
-        for file in music_path.glob("*"):
+        for file in directory.glob(pattern):
             if file.is_file():
                 try:
                     file.unlink()
                     count += 1
                 except Exception as e:
                     logger.error(f"Error deleting file {file}: {e}")
+        return count
+
+    async def clear_downloads(self):
+        """Clear all downloaded music files."""
+        logger.info("Clearing downloads...")
+        count = await self._run_io(self._delete_files, Path(self.music_path))
+        await self._run_io(self.music_index.reload)
+        self.audio_analysis.clear()
+        self.track_info.clear()
         logger.info(f"Cleared {count} downloaded files")
 
-    async def export_cache(self, cache: dict):
-        """Export cache to a backup file.
+    async def get_assignments(self, app_ids: list[str] | None = None) -> dict[str, dict]:
+        """
+        Get the theme assignments of some or all apps.
+        :param app_ids: list[str] | None App IDs to look up, None for all
+        :return: dict[str, dict] {app_id: {"videoId", "volume"}}
+        """
+        return await self._run_io(self.theme_db.get_assignments, app_ids)
+
+    async def set_assignments(self, assignments: dict[str, dict], overwrite: bool = True):
+        """
+        Merge theme assignments in one transaction. Fields given as null are cleared.
+        :param assignments: dict[str, dict] {app_id: {"videoId", "volume"}}
+        :param overwrite: bool False to leave apps that already have an assignment untouched
         :return: None
-        :param cache: dict Cache data to export
         """
-        os.makedirs(self.cache_path, exist_ok=True)
-        filename = f"backup-{datetime.datetime.now().strftime('%Y-%m-%d %H-%M')}.json"
-        file_path = Path(self.cache_path) / filename
-        logger.info(f"Exporting cache to: {file_path}")
+        await self._run_io(self.theme_db.set_assignments, assignments, overwrite)
+
+    async def delete_assignments(self, app_ids: list[str] | None = None):
+        """
+        Delete the theme assignments of some or all apps.
+        :param app_ids: list[str] | None App IDs to delete, None for all
+        :return: None
+        """
+        await self._run_io(self.theme_db.delete_assignments, app_ids)
+
+    async def export_cache(self) -> str:
+        """
+        Snapshot the theme assignments and play stats to the cache directory, then apply the backup
+        retention settings.
+        :return: str Name of the backup holding the current state
+        """
+        self.play_stats.save()
+        state = {"assignments": await self._run_io(self.theme_db.get_assignments), "play_stats": self.play_stats.entries}
+        logger.info(f"Exporting cache to: {self.cache_path}")
         try:
-            with open(file_path, "w") as file:
-                json.dump(cache, file, indent=2)
-            logger.info(f"Successfully exported cache to: {filename}")
+            name = await self._run_io(self.cache_backups.snapshot, state, self.settings.getSetting("backup_full_every", 10))
+            logger.info(f"Successfully exported cache to: {name}")
+            await self._run_io(
+                self.cache_backups.prune,
+                self.settings.getSetting("backup_keep_last", 10),
+                self.settings.getSetting("backup_keep_daily", 7),
+                self.settings.getSetting("backup_keep_weekly", 4),
+            )
+            return name
         except Exception as e:
             logger.error(f"Error exporting cache: {e}")
             raise
 
-    async def list_cache_backups(self):
-        """List all available cache backups."""
+    def _legacy_cache_backups(self) -> list[Path]:
         cache_path = Path(self.cache_path)
-        backups = [
-            file.stem for file in cache_path.glob("*.json") if file.is_file()
-        ]
+        if not cache_path.is_dir():
+            return []
+        return [file for file in cache_path.iterdir() if file.is_file() and file.suffix in (".db", ".json")]
+
+    @staticmethod
+    def _read_json(path: Path):
+        with open(path, "r") as file:
+            return json.load(file)
+
+    async def list_cache_backups(self):
+        """List all available cache backups, newest snapshot first, followed by legacy exports."""
+        snapshots, legacy = await asyncio.gather(
+            self._run_io(self.cache_backups.list), self._run_io(self._legacy_cache_backups)
+        )
+        backups = [snapshot["name"] for snapshot in reversed(snapshots)] + [file.stem for file in legacy]
         logger.info(f"Found {len(backups)} cache backups")
         return backups
 
-    async def import_cache(self, name: str):
-        """Import cache from a backup file.
-        :param name: str Name of the backup file (without .json)
-        :return: dict Imported cache
+    async def get_cache_backups(self) -> list[dict]:
+        """
+        Get details of the cache backup snapshots, newest first.
+        :return: list[dict] [{"name", "kind", "size", "created"}]
+        """
+        return await self._run_io(self._describe_cache_backups)
+
+    def _describe_cache_backups(self) -> list[dict]:
+        return [
+            {
+                "name": snapshot["name"],
+                "kind": snapshot["kind"],
+                "size": snapshot["path"].stat().st_size,
+                "created": snapshot["created"].timestamp(),
+            }
+            for snapshot in reversed(self.cache_backups.list())
+        ]
+
+    async def import_cache(self, name: str) -> int:
+        """Import cache from a backup, replacing the current assignments.
+        :param name: str Name of the backup (as returned by list_cache_backups)
+        :return: int Number of imported assignments
         """
-        file_path = Path(self.cache_path) / f"{name}.json"
-        logger.info(f"Importing cache from: {file_path}")
+        logger.info(f"Importing cache from: {name}")
         try:
-            with open(file_path, "r") as file:
-                cache = json.load(file)
-            logger.info(f"Successfully imported cache from: {name}")
-            return cache
+            if await self._run_io(self.cache_backups.find, name) is not None:
+                state = await self._run_io(self.cache_backups.state, name)
+                await self._run_io(self.theme_db.replace_assignments, state.get("assignments", {}))
+                self.play_stats.replace(state.get("play_stats", {}))
+                self.play_stats.save()
+            elif await self._run_io((db_path := Path(self.cache_path) / f"{name}.db").is_file):
+                self.audio_analysis.save()
+                self.track_info.save()
+                self.play_stats.save()
+                await self._run_io(self.theme_db.restore, str(db_path))
+                self.audio_analysis.load()
+                self.track_info.load()
+                self.play_stats.load()
+            else:
+                assignments = await self._run_io(self._read_json, Path(self.cache_path) / f"{name}.json")
+                await self._run_io(self.theme_db.replace_assignments, assignments)
+            count = len(await self._run_io(self.theme_db.get_assignments))
+            logger.info(f"Successfully imported {count} assignments from: {name}")
+            return count
         except Exception as e:
             logger.error(f"Error importing cache from {name}: {e}")
             raise
 
+    async def delete_cache_backup(self, name: str):
+        """
+        Delete one cache backup. Later snapshots that depend on it are kept restorable.
+        :param name: str Name of the backup
+        :return: None
+        """
+        if await self._run_io(self.cache_backups.find, name) is not None:
+            await self._run_io(self.cache_backups.delete, {name})
+        else:
+            for file in await self._run_io(self._legacy_cache_backups):
+                if file.stem == name:
+                    await self._run_io(file.unlink)
+        logger.info(f"Deleted cache backup: {name}")
+
+    def _delete_cache_backups(self) -> int:
+        count = 0
+        files = [snapshot["path"] for snapshot in self.cache_backups.list()] + self._legacy_cache_backups()
+        for file in files:
+            try:
+                file.unlink()
+                count += 1
+            except OSError as e:
+                logger.error(f"Error deleting cache file {file}: {e}")
+        return count
+
     async def clear_cache(self) -> int:
         """
-        Clear all JSON cache backup files. Returns the number of files deleted.
+        Clear all cache backup files. Returns the number of files deleted.
         :return: int Number of cache files deleted
         """
         logger.info("Clearing cache backups...")
-        count = 0
-        cache_path = Path(self.cache_path)
-        for file in cache_path.glob("*.json"):
-            if file.is_file():
-                try:
-                    file.unlink()
-                    count += 1
-                except OSError as e:
-                    logger.error(f"Error deleting cache file {file}: {e}")
-        logger.info(f"Cleared {count} cache backup files from {cache_path}")
+        count = await self._run_io(self._delete_cache_backups)
+        logger.info(f"Cleared {count} cache backup files from {self.cache_path}")
         return count
 
     async def import_local_music(self, source_path: str, dest_name: str) -> bool:
@@ -896,7 +5079,6 @@ class Plugin:
         :param dest_name: str Desired name (without extension)
         :return: bool Success status
         """
-        import shutil
         try:
             src = Path(source_path)
             if not src.is_file():
@@ -904,8 +5086,10 @@ class Plugin:
                 return False
             ext = src.suffix
             dest = Path(self.music_path) / f"{dest_name}{ext}"
-            shutil.copy2(src, dest)
+            await self._copy_to_library(src, dest)
             logger.info(f"Imported local music file: {src} -> {dest}")
+            self.play_stats.set_imported(dest.stem)
+            self._on_music_added(dest.stem)
             return True
         except Exception as e:
             logger.error(f"Error importing local music file: {e}")
@@ -31,16 +31,28 @@ class YtDlpAudioResolver extends AudioResolver {
   async *getSearchResults(
     searchTerm: string
   ): AsyncIterable<YouTubeVideoPreview> {
+    let handle: string | null = null;
     try {
-      await call<[string]>('search_yt', searchTerm);
-      let result = await call<[], YouTubeVideoPreview | null>('next_yt_result');
+      handle = await call<[string], string | null>('search_yt', searchTerm);
+      if (!handle) return;
+      let result = await call<[string], YouTubeVideoPreview | null>(
+        'next_yt_result',
+        handle
+      );
       while (result) {
         yield result;
-        result = await call<[], YouTubeVideoPreview | null>('next_yt_result');
+        result = await call<[string], YouTubeVideoPreview | null>(
+          'next_yt_result',
+          handle
+        );
       }
       return;
     } catch (err) {
       console.error('YtDlp search error:', err);
+    } finally {
+      if (handle) {
+        call<[string]>('close_yt_search', handle).catch(() => undefined);
+      }
     }
     return;
   }
@@ -151,9 +163,12 @@ class LocalMusicAudioResolver extends AudioResolver {
         for (const result of results) {
           yield {
             id: result.id,
-            title: result.title,
+            title: result.artist
+              ? `${result.artist} - ${result.title}`
+              : result.title,
             thumbnail: result.thumbnail || '',
-            url: result.url || ''
+            url: result.url || '',
+            duration: result.duration ?? undefined
           };
         }
       }
@@ -165,11 +180,12 @@ class LocalMusicAudioResolver extends AudioResolver {
 
   async getAudioUrlFromVideo(video: YouTubeVideo): Promise<string | undefined> {
     try {
-      const url = await call<[string], string | null>(
+      const url = await call<[string, boolean], string | null>(
         'get_local_music_url',
-        video.id
+        video.id,
+        false
       );
-      return url || undefined;
+      return url || (await streamLocalTrack(video.id));
     } catch (e) {
       console.error('Local music URL error:', e);
       return undefined;
@@ -182,6 +198,174 @@ class LocalMusicAudioResolver extends AudioResolver {
   }
 }
 
+type OpenTrackInfo = {
+  handle: string;
+  size: number;
+  mimeType: string;
+  chunkSize: number;
+  duration: number | null;
+};
+
+type TrackChunk = {
+  data: string;
+  offset: number;
+  size: number;
+  eof: boolean;
+};
+
+// Non-fragmented MP4 and the other containers cannot be fed to a MediaSource
+const MEDIA_SOURCE_TYPES = ['audio/mpeg', 'audio/webm'];
+
+function decodeChunk(data: string): Uint8Array {
+  const binary = atob(data);
+  const bytes = new Uint8Array(binary.length);
+  for (let i = 0; i < binary.length; i++) {
+    bytes[i] = binary.charCodeAt(i);
+  }
+  return bytes;
+}
+
+async function readTrackChunks(
+  track: OpenTrackInfo,
+  onChunk: (bytes: Uint8Array) => Promise<void>
+): Promise<void> {
+  let offset = 0;
+  let next = call<[string, number, number], TrackChunk | null>(
+    'read_track_chunk',
+    track.handle,
+    offset,
+    track.chunkSize
+  );
+  try {
+    for (;;) {
+      const chunk = await next;
+      if (!chunk) throw new Error('Track handle expired');
+      offset = chunk.offset + chunk.size;
+      // Request the next chunk while this one is decoded and appended
+      if (!chunk.eof) {
+        next = call<[string, number, number], TrackChunk | null>(
+          'read_track_chunk',
+          track.handle,
+          offset,
+          track.chunkSize
+        );
+      }
+      await onChunk(decodeChunk(chunk.data));
+      if (chunk.eof) return;
+    }
+  } finally {
+    call<[string]>('close_track', track.handle).catch(() => undefined);
+  }
+}
+
+function appendBuffer(
+  buffer: SourceBuffer,
+  bytes: Uint8Array
+): Promise<void> {
+  return new Promise((resolve, reject) => {
+    const done = () => {
+      buffer.removeEventListener('updateend', done);
+      buffer.removeEventListener('error', fail);
+      resolve();
+    };
+    const fail = () => {
+      buffer.removeEventListener('updateend', done);
+      buffer.removeEventListener('error', fail);
+      reject(new Error('SourceBuffer append failed'));
+    };
+    buffer.addEventListener('updateend', done);
+    buffer.addEventListener('error', fail);
+    buffer.appendBuffer(bytes);
+  });
+}
+
+/**
+ * Stream a local file over the RPC bridge in chunks.
+ * MP3 and WebM are fed to a MediaSource, so playback starts once the first
+ * chunk is appended. Other formats are gathered into a Blob URL.
+ */
+export async function streamLocalTrack(
+  videoId: string
+): Promise<string | undefined> {
+  const track = await call<[string], OpenTrackInfo | null>(
+    'open_track',
+    videoId
+  );
+  if (!track) return undefined;
+
+  if (
+    typeof MediaSource === 'undefined' ||
+    !MEDIA_SOURCE_TYPES.includes(track.mimeType) ||
+    !MediaSource.isTypeSupported(track.mimeType)
+  ) {
+    const parts: Uint8Array[] = [];
+    await readTrackChunks(track, async (bytes) => {
+      parts.push(bytes);
+    });
+    return URL.createObjectURL(new Blob(parts, { type: track.mimeType }));
+  }
+
+  const mediaSource = new MediaSource();
+  const url = URL.createObjectURL(mediaSource);
+  mediaSource.addEventListener(
+    'sourceopen',
+    () => {
+      URL.revokeObjectURL(url);
+      const buffer = mediaSource.addSourceBuffer(track.mimeType);
+      readTrackChunks(track, (bytes) => appendBuffer(buffer, bytes))
+        .then(() => {
+          if (mediaSource.readyState === 'open') mediaSource.endOfStream();
+        })
+        .catch((e) => {
+          console.error('Local track stream error:', e);
+          if (mediaSource.readyState === 'open') {
+            mediaSource.endOfStream('network');
+          }
+        });
+    },
+    { once: true }
+  );
+  return url;
+}
+
+export type AudioAnalysis = {
+  loudness: number;
+  gain_db: number;
+  start: number;
+};
+
+export async function getAudioGain(videoId: string): Promise<number> {
+  try {
+    const analysis = await call<[string], AudioAnalysis | null>(
+      'get_audio_analysis',
+      videoId
+    );
+    return analysis ? Math.pow(10, analysis.gain_db / 20) : 1;
+  } catch (e) {
+    console.error('Audio analysis error:', e);
+    return 1;
+  }
+}
+
+export async function recordPlay(videoId: string): Promise<void> {
+  try {
+    await call<[string], boolean>('record_play', videoId);
+  } catch (e) {
+    console.error('Record play error:', e);
+  }
+}
+
+export async function setAudioPinned(
+  videoId: string,
+  pinned: boolean
+): Promise<void> {
+  try {
+    await call<[string, boolean]>('set_music_pinned', videoId, pinned);
+  } catch (e) {
+    console.error('Pin audio error:', e);
+  }
+}
+
 export type AudioProvider = 'ytdlp' | 'itunes' | 'local';
 
 export function getProviderFromId(videoId: string): AudioProvider {
@@ -14,41 +14,109 @@ type GameThemeMusicCache = {
 
 type GameThemeMusicCacheMapping = { [key: string]: GameThemeMusicCache };
 
-export async function updateCache(appId: number, newData: GameThemeMusicCache) {
-  const oldCache = (await localforage.getItem(
-    appId.toString()
-  )) as GameThemeMusicCache | null;
+export type ResolvedTheme = {
+  videoId: string;
+  audioUrl: string;
+  volume?: number;
+};
+
+// Stream URLs expire after a few hours, keep resolved themes well below that
+const RESOLVED_THEME_TTL = 10 * 60 * 1000;
+const resolvedThemes = new Map<
+  string,
+  { theme: ResolvedTheme | null; expires: number }
+>();
+const pendingResolves = new Map<string, Promise<void>>();
 
-  return await localforage.setItem(appId.toString(), {
-    ...(oldCache || {}),
-    ...newData
+export async function updateCache(appId: number, newData: GameThemeMusicCache) {
+  // Send unset fields as null so the backend clears them
+  const fields = Object.fromEntries(
+    Object.entries(newData).map(([key, value]) => [key, value ?? null])
+  );
+  resolvedThemes.delete(appId.toString());
+  await call<[GameThemeMusicCacheMapping]>('set_assignments', {
+    [appId.toString()]: fields
   });
 }
 
+export async function resolveMany(appIds: number[]): Promise<void> {
+  const now = Date.now();
+  const keys = appIds
+    .map((appId) => appId.toString())
+    .filter(
+      (key) =>
+        !pendingResolves.has(key) &&
+        (resolvedThemes.get(key)?.expires ?? 0) <= now
+    );
+  if (!keys.length) return;
+  const request = call<[string[]], { [key: string]: ResolvedTheme }>(
+    'resolve_many',
+    keys
+  )
+    .then((results) => {
+      const expires = Date.now() + RESOLVED_THEME_TTL;
+      for (const key of keys) {
+        resolvedThemes.set(key, { theme: results[key] ?? null, expires });
+      }
+    })
+    .catch((e) => console.error('Resolve themes error:', e))
+    .finally(() => {
+      for (const key of keys) pendingResolves.delete(key);
+    });
+  for (const key of keys) pendingResolves.set(key, request);
+  await request;
+}
+
+export async function sendFocusHint(appId: number, neighbours: number[]) {
+  await call<[string, string[]]>(
+    'focus_hint',
+    appId.toString(),
+    neighbours.map((id) => id.toString())
+  );
+}
+
+export async function getResolvedTheme(
+  appId: number
+): Promise<ResolvedTheme | null> {
+  const key = appId.toString();
+  await (pendingResolves.get(key) ?? resolveMany([appId]));
+  return resolvedThemes.get(key)?.theme ?? null;
+}
+
 export async function getFullCache(): Promise<GameThemeMusicCacheMapping> {
-  const fullCache: GameThemeMusicCacheMapping = {};
+  return await call<[], GameThemeMusicCacheMapping>('get_assignments');
+}
+
+export async function getCaches(
+  appIds: number[]
+): Promise<GameThemeMusicCacheMapping> {
+  return await call<[string[]], GameThemeMusicCacheMapping>(
+    'get_assignments',
+    appIds.map((appId) => appId.toString())
+  );
+}
+
+export async function migrateLocalCache() {
+  const oldCache: GameThemeMusicCacheMapping = {};
   await localforage.iterate((value: GameThemeMusicCache, key) => {
-    fullCache[key] = value;
+    oldCache[key] = value;
   });
-  return fullCache;
+  if (!Object.keys(oldCache).length) return;
+  await call<[GameThemeMusicCacheMapping, boolean]>(
+    'set_assignments',
+    oldCache,
+    false
+  );
+  await localforage.clear();
 }
 
 export async function exportCache() {
-  await call<[GameThemeMusicCacheMapping]>(
-    'export_cache',
-    await getFullCache()
-  );
+  await call<[]>('export_cache');
 }
 
 export async function importCache(name: string) {
-  const newCache = await call<[string], GameThemeMusicCacheMapping>(
-    'import_cache',
-    name
-  );
-  await localforage.clear();
-  for (const [key, value] of Object.entries(newCache)) {
-    await localforage.setItem(key, value);
-  }
+  resolvedThemes.clear();
+  await call<[string], number>('import_cache', name);
 }
 
 export async function listCacheBackups(): Promise<string[]> {
@@ -56,10 +124,11 @@ export async function listCacheBackups(): Promise<string[]> {
 }
 
 export async function clearCache(appId?: number) {
+  resolvedThemes.clear();
   if (appId?.toString().length) {
-    await localforage.removeItem(appId.toString());
+    await call<[string[]]>('delete_assignments', [appId.toString()]);
   } else {
-    await localforage.clear();
+    await call<[]>('delete_assignments');
     await call<[]>('clear_cache');
   }
 }
@@ -67,7 +136,56 @@ export async function clearCache(appId?: number) {
 export async function getCache(
   appId: number
 ): Promise<GameThemeMusicCache | null> {
-  return await localforage.getItem<GameThemeMusicCache>(appId.toString());
+  return (await getCaches([appId]))[appId.toString()] ?? null;
+}
+
+type PrefetchStatus = {
+  running: boolean;
+  pending: number;
+  done: number;
+  failed: number;
+};
+
+export async function prefetchLibrary(): Promise<PrefetchStatus> {
+  const folders = await SteamClient.InstallFolder.GetInstallFolders();
+  const installed = folders.flatMap((folder) => folder.vecApps);
+  const cached = await getCaches(installed.map((app) => app.nAppID));
+  const apps = installed
+    .filter((app) => !cached[app.nAppID.toString()])
+    .map((app) => ({
+      appId: app.nAppID,
+      name: app.strAppName.replace(/([™®©])/g, '')
+    }));
+  return await call<[{ appId: number; name: string }[]], PrefetchStatus>(
+    'prefetch_library',
+    apps
+  );
+}
+
+export async function getPrefetchedCache(
+  appId: number
+): Promise<GameThemeMusicCache | null> {
+  const result = await call<[string], GameThemeMusicCache | null>(
+    'get_prefetch_result',
+    appId.toString()
+  );
+  if (result?.videoId?.length) {
+    await updateCache(appId, result);
+    await call<[string[]]>('clear_prefetch_results', [appId.toString()]);
+  }
+  return result;
+}
+
+export async function applyPrefetchResults() {
+  const results = await call<[], GameThemeMusicCacheMapping>(
+    'get_prefetch_results'
+  );
+  await call<[GameThemeMusicCacheMapping, boolean]>(
+    'set_assignments',
+    results,
+    false
+  );
+  await call<[string[]]>('clear_prefetch_results', Object.keys(results));
 }
 
 export async function clearDownloads() {
@@ -12,11 +12,11 @@ import {
 import { useEffect, useState } from 'react';
 import { useSettings } from '../../hooks/useSettings';
 import AudioPlayer from './audioPlayer';
-import { getCache, updateCache } from '../../cache/musicCache';
+import { getCache, getFullCache, updateCache } from '../../cache/musicCache';
 import useTranslations from '../../hooks/useTranslations';
 import { YouTubeVideoPreview } from '../../../types/YouTube';
 import NoMusic from './noMusic';
-import { getResolver } from '../../actions/audio';
+import { getResolver, setAudioPinned } from '../../actions/audio';
 import LocalMusicImport from './localMusicImport';
 
 export default function ChangePage({
@@ -78,8 +78,16 @@ export default function ChangePage({
         return;
       }
     }
+    const previous = selected;
     setSelected(audio.videoId);
     await updateCache(parseInt(appid), { videoId: audio.videoId });
+    await setAudioPinned(audio.videoId, true);
+    if (previous && previous !== audio.videoId) {
+      const stillUsed = Object.values(await getFullCache()).some(
+        (entry) => entry.videoId === previous
+      );
+      if (!stillUsed) await setAudioPinned(previous, false);
+    }
   }
 
   return (
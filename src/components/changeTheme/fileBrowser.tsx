@@ -6,7 +6,13 @@ import {
   PanelSectionRow
 } from '@decky/ui';
 import { useState, useEffect } from 'react';
-import { FaFolder, FaMusic, FaLevelUpAlt, FaHome } from 'react-icons/fa';
+import {
+  FaFolder,
+  FaMusic,
+  FaLevelUpAlt,
+  FaHome,
+  FaFilter
+} from 'react-icons/fa';
 
 interface FileEntry {
   name: string;
@@ -15,6 +21,20 @@ interface FileEntry {
   isAudio: boolean;
 }
 
+interface DirectoryPage {
+  entries?: {
+    name: string;
+    path: string;
+    is_directory: boolean;
+    is_audio: boolean;
+  }[];
+  next_cursor?: string | null;
+  total?: number;
+  error?: string;
+}
+
+const PAGE_SIZE = 100;
+
 export default function FileBrowser({
   onFileSelected
 }: {
@@ -24,52 +44,41 @@ export default function FileBrowser({
   const defaultPath = isWindows ? 'C:\\' : '/home/deck';
   const [currentPath, setCurrentPath] = useState(defaultPath);
   const [entries, setEntries] = useState<FileEntry[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [total, setTotal] = useState(0);
+  const [audioOnly, setAudioOnly] = useState(true);
   const [loading, setLoading] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState('');
 
-  const audioExtensions = [
-    '.mp3',
-    '.m4a',
-    '.webm',
-    '.ogg',
-    '.wav',
-    '.flac',
-    '.aac',
-    '.opus'
-  ];
-
   useEffect(() => {
     loadDirectory(currentPath).then(() => {
       return;
     });
-  }, [currentPath]);
+  }, [currentPath, audioOnly]);
+
+  async function fetchPage(path: string, cursor: string | null) {
+    const result = await call<
+      [string, string | null, number, boolean],
+      DirectoryPage
+    >('list_directory', path, cursor, PAGE_SIZE, audioOnly);
+    if (result?.error) setError(result.error);
+    const page: FileEntry[] = (result?.entries ?? []).map((entry) => ({
+      name: entry.name,
+      path: entry.path,
+      isDirectory: entry.is_directory,
+      isAudio: entry.is_audio
+    }));
+    setNextCursor(result?.next_cursor ?? null);
+    setTotal(result?.total ?? page.length);
+    return page;
+  }
 
   async function loadDirectory(path: string) {
     setLoading(true);
     setError('');
     try {
-      const result = await call<[string], any>('list_directory', path);
-
-      if (result && result.entries) {
-        const fileEntries: FileEntry[] = result.entries.map((entry: any) => ({
-          name: entry.name,
-          path: entry.path,
-          isDirectory: entry.is_directory,
-          isAudio:
-            !entry.is_directory &&
-            audioExtensions.some((ext) =>
-              entry.name.toLowerCase().endsWith(ext)
-            )
-        }));
-
-        fileEntries.sort((a, b) => {
-          if (a.isDirectory && !b.isDirectory) return -1;
-          if (!a.isDirectory && b.isDirectory) return 1;
-          return a.name.localeCompare(b.name);
-        });
-
-        setEntries(fileEntries);
-      }
+      setEntries(await fetchPage(path, null));
     } catch (e) {
       console.error('Failed to load directory:', e);
       setError(`Failed to load directory: ${String(e)}`);
@@ -78,6 +87,20 @@ export default function FileBrowser({
     }
   }
 
+  async function loadMore() {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchPage(currentPath, nextCursor);
+      setEntries((previous) => [...previous, ...page]);
+    } catch (e) {
+      console.error('Failed to load directory:', e);
+      setError(`Failed to load directory: ${String(e)}`);
+    } finally {
+      setLoadingMore(false);
+    }
+  }
+
   function goToParent() {
     if (isWindows) {
       const normalized = currentPath.replace(/\\+$/, '');
@@ -132,6 +155,18 @@ export default function FileBrowser({
           >
             <FaLevelUpAlt />
           </DialogButton>
+          <DialogButton
+            style={{
+              minWidth: '40px',
+              padding: '8px',
+              flex: '0 0 auto',
+              opacity: audioOnly ? 1 : 0.5
+            }}
+            onClick={() => setAudioOnly((v) => !v)}
+            disabled={loading}
+          >
+            <FaFilter />
+          </DialogButton>
           <div
             style={{
               flex: '1 1 120px',
@@ -231,6 +266,17 @@ export default function FileBrowser({
               </DialogButton>
             ))
           )}
+          {!loading && nextCursor && (
+            <DialogButton
+              style={{ width: '100%', padding: '10px' }}
+              onClick={loadMore}
+              disabled={loadingMore}
+            >
+              {loadingMore
+                ? 'Loading...'
+                : `Load more (${entries.length} of ${total})`}
+            </DialogButton>
+          )}
         </Focusable>
       </PanelSectionRow>
 
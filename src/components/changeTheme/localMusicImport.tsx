@@ -10,6 +10,8 @@ import {
 } from '@decky/ui';
 import { useState } from 'react';
 import FileBrowser from './fileBrowser';
+import { streamLocalTrack } from '../../actions/audio';
+import GlobalAudioPlayer from '../../lib/globalAudioPlayer';
 
 const SuccessModalContent = ({
   message,
@@ -56,16 +58,20 @@ export default function LocalMusicImport({
       return;
     }
     if (selectNewAudio) {
-      const res = await call<[string], string | null>(
-        'get_local_music_url',
-        id
-      );
+      const res =
+        (await call<[string, boolean], string | null>(
+          'get_local_music_url',
+          id,
+          false
+        )) || (await streamLocalTrack(id));
       if (res) {
         await selectNewAudio({
           title: fileName.replace(/\.[^/.]+$/, ''),
           videoId: id,
           audioUrl: res
         });
+        // Local imports play from disk, the preview stream is not kept
+        GlobalAudioPlayer.getInstance().releaseSource(res);
         showSuccessModal('Music imported successfully!');
       }
     }
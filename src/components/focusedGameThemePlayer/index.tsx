@@ -1,6 +1,7 @@
 import { ReactElement, useEffect, useState } from 'react';
 import ThemePlayer from '../themePlayer';
 import { useSettings } from '../../hooks/useSettings';
+import { resolveMany, sendFocusHint } from '../../cache/musicCache';
 
 function isDomElement(obj: any): obj is HTMLElement {
   return (
@@ -71,6 +72,42 @@ function getAppIdFromElement(el: HTMLElement | null): number | null {
   return null;
 }
 
+// App IDs of the tiles next to the focused one, closest first, found by
+// walking up to the first ancestor that has several children (the row or grid)
+function getRowAppIds(el: HTMLElement | null): number[] {
+  let current = el;
+  for (let depth = 0; current && depth < 8; depth++) {
+    const parent: HTMLElement | null = current.parentElement;
+    if (parent && parent.children.length > 1) {
+      const tiles = Array.from(parent.children);
+      const focused = tiles.indexOf(current);
+      const ids = new Set<number>();
+      tiles
+        .map((tile, index) => ({ tile, distance: Math.abs(index - focused) }))
+        .sort((a, b) => a.distance - b.distance)
+        .slice(0, 30)
+        .forEach(({ tile }) => {
+          const id = getAppIdFromElement(tile as HTMLElement);
+          if (id !== null) ids.add(id);
+        });
+      if (ids.size > 1) return Array.from(ids);
+    }
+    current = parent;
+  }
+  return [];
+}
+
+// The hint buffers the closest streams, the batch resolve fetches the themes
+// of the whole row in one call so moving along it needs no more lookups
+function warmNeighbours(appId: number, el: HTMLElement | null) {
+  const rowAppIds = getRowAppIds(el);
+  const neighbours = rowAppIds.filter((id) => id !== appId);
+  sendFocusHint(appId, neighbours).catch(() => undefined);
+  if (rowAppIds.length) {
+    resolveMany(rowAppIds).catch(() => undefined);
+  }
+}
+
 function getElementFromNavNode(node: any): HTMLElement | null {
   if (!node || typeof node !== 'object') return null;
   if (isDomElement(node)) return node;
@@ -115,6 +152,7 @@ export default function FocusedGameThemePlayer(): ReactElement {
       if (id !== null && id !== lastAppId) {
         lastAppId = id;
         setFocusedAppId(id);
+        warmNeighbours(id, el);
       } else if (id === null && lastAppId !== null) {
         lastAppId = null;
         setFocusedAppId(null);
@@ -149,6 +187,7 @@ export default function FocusedGameThemePlayer(): ReactElement {
       if (node) {
         appId = getAppIdFromNavNode(node);
       }
+      const focusedEl = appId !== null ? getElementFromNavNode(node) : null;
 
       if (appId === null) {
         try {
@@ -182,6 +221,7 @@ export default function FocusedGameThemePlayer(): ReactElement {
       if (appId !== lastAppId) {
         lastAppId = appId;
         setFocusedAppId(appId);
+        if (appId !== null) warmNeighbours(appId, focusedEl);
       }
     };
 
@@ -28,7 +28,8 @@ import {
   exportCache,
   getFullCache,
   importCache,
-  listCacheBackups
+  listCacheBackups,
+  prefetchLibrary
 } from '../../cache/musicCache';
 import { toaster } from '@decky/api';
 import { getResolver } from '../../actions/audio';
@@ -204,6 +205,27 @@ export default function Index() {
             {t('restoreDownloads')}
           </ButtonItem>
         </PanelSectionRow>
+        <PanelSectionRow>
+          <ButtonItem
+            label={t('prefetchLibraryLabel')}
+            description={t('prefetchLibraryDescription')}
+            bottomSeparator="none"
+            layout="below"
+            onClick={async () => {
+              const status = await prefetchLibrary();
+              toaster.toast({
+                title: t('prefetchLibraryStarted'),
+                body: t('prefetchLibraryStartedDetails', {
+                  num: status.pending.toString()
+                }),
+                icon: <FaDownload />,
+                duration: 1500
+              });
+            }}
+          >
+            {t('prefetchLibrary')}
+          </ButtonItem>
+        </PanelSectionRow>
       </PanelSection>
       <PanelSection title={t('overrides')}>
         <PanelSectionRow>
@@ -6,6 +6,8 @@ import { useSettings } from '../../hooks/useSettings';
 import { getCache } from '../../cache/musicCache';
 import useAudioPlayer from '../../hooks/useAudioPlayer';
 import { useAudioLoaderCompatState } from '../../state/AudioLoaderCompatState';
+import { getAudioGain, recordPlay } from '../../actions/audio';
+import GlobalAudioPlayer from '../../lib/globalAudioPlayer';
 
 export default function ThemePlayer({
   appid: propAppId
@@ -24,10 +26,11 @@ export default function ThemePlayer({
   useEffect(() => {
     async function getData() {
       const cache = await getCache(appid);
+      const gain = audio.videoId.length ? await getAudioGain(audio.videoId) : 1;
       if (typeof cache?.volume === 'number' && isFinite(cache.volume)) {
-        audioPlayer.setVolume(cache.volume);
+        audioPlayer.setVolume(Math.min(1, cache.volume * gain));
       } else {
-        audioPlayer.setVolume(settings.volume);
+        audioPlayer.setVolume(Math.min(1, settings.volume * gain));
       }
     }
     if (!settingsIsLoading) {
@@ -35,7 +38,7 @@ export default function ThemePlayer({
         return;
       });
     }
-  }, [settingsIsLoading]);
+  }, [settingsIsLoading, audio.videoId]);
 
   useEffect(() => {
     if (
@@ -50,5 +53,21 @@ export default function ThemePlayer({
     }
   }, [audio?.audioUrl, audioPlayer.isReady, gamesRunning]);
 
+  useEffect(() => {
+    if (!audio.videoId.length || !audio.audioUrl.length) return;
+    // Count a play once the theme is actually heard, not when it is resolved or preloaded
+    const element = GlobalAudioPlayer.getInstance().getAudioElement();
+    let recorded = false;
+    const handlePlaying = () => {
+      if (recorded || element.src !== audio.audioUrl) return;
+      recorded = true;
+      recordPlay(audio.videoId);
+    };
+    element.addEventListener('playing', handlePlaying);
+    return () => {
+      element.removeEventListener('playing', handlePlaying);
+    };
+  }, [audio.videoId, audio.audioUrl]);
+
   return <></>;
 }
@@ -42,6 +42,11 @@ const useAudioPlayer = (
         audioPlayer.loop = true;
       }
     }
+    return () => {
+      if (audioUrl?.length) {
+        GlobalAudioPlayer.getInstance().releaseSource(audioUrl);
+      }
+    };
   }, [audioUrl]);
 
   useEffect(() => {
@@ -2,7 +2,12 @@ import { useEffect, useState } from 'react';
 
 import { getResolverForVideoId } from '../actions/audio';
 
-import { getCache, updateCache } from '../cache/musicCache';
+import {
+  getCache,
+  getPrefetchedCache,
+  getResolvedTheme,
+  updateCache
+} from '../cache/musicCache';
 import { useSettings } from './useSettings';
 
 const useThemeMusic = (appId: number) => {
@@ -17,6 +22,16 @@ const useThemeMusic = (appId: number) => {
   useEffect(() => {
     let ignore = false;
     async function getData() {
+      const resolved = await getResolvedTheme(appId);
+      if (ignore) {
+        return;
+      }
+      if (resolved && (!resolved.videoId || resolved.audioUrl)) {
+        return setAudio({
+          videoId: resolved.videoId,
+          audioUrl: resolved.audioUrl
+        });
+      }
       const cache = await getCache(appId);
       if (cache?.videoId?.length == 0) {
         return setAudio({ videoId: '', audioUrl: '' });
@@ -31,6 +46,21 @@ const useThemeMusic = (appId: number) => {
       } else if (settings.defaultMuted) {
         return setAudio({ videoId: '', audioUrl: '' });
       } else {
+        const prefetched = await getPrefetchedCache(appId);
+        if (prefetched?.videoId?.length) {
+          const newAudio = await getResolverForVideoId(
+            prefetched.videoId
+          ).getAudioUrlFromVideo({ id: prefetched.videoId });
+          if (ignore) {
+            return;
+          }
+          if (newAudio?.length) {
+            return setAudio({
+              videoId: prefetched.videoId,
+              audioUrl: newAudio
+            });
+          }
+        }
         const resolver = getResolverForVideoId('');
         const newAudio = await resolver.getAudio(appName as string);
         if (ignore) {
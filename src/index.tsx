@@ -14,6 +14,7 @@ import {
 } from './state/AudioLoaderCompatState';
 
 import { name } from '@decky/manifest';
+import { applyPrefetchResults, migrateLocalCache } from './cache/musicCache';
 
 export default definePlugin(() => {
   const state: AudioLoaderCompatState = new AudioLoaderCompatState();
@@ -42,6 +43,11 @@ export default definePlugin(() => {
 
   const patchedMenu = patchContextMenu(LibraryContextMenu);
 
+  migrateLocalCache()
+    .catch((e) => console.error('Error migrating theme cache:', e))
+    .then(() => applyPrefetchResults())
+    .catch((e) => console.error('Error applying prefetched themes:', e));
+
   const AppStateRegistrar =
     SteamClient.GameSessions.RegisterForAppLifetimeNotifications(
       (update: AppState) => {
@@ -18,6 +18,20 @@ class GlobalAudioPlayer {
   getAudioElement(): HTMLAudioElement {
     return this.audioElement;
   }
+
+  /**
+   * Free a source that is no longer wanted. Object URLs from streamed local
+   * tracks hold the whole file in memory until they are revoked.
+   */
+  releaseSource(url: string) {
+    if (!url.startsWith('blob:')) return;
+    if (this.audioElement.src === url) {
+      this.audioElement.pause();
+      this.audioElement.removeAttribute('src');
+      this.audioElement.load();
+    }
+    URL.revokeObjectURL(url);
+  }
 }
 
 export default GlobalAudioPlayer;
@@ -0,0 +1,54 @@
+"""
+Shared setup of the backend tests.
+
+main.py imports the `decky` and `settings` modules that Decky Loader provides at runtime, so fake ones
+pointing at a temporary plugin directory are registered before it is imported.
+"""
+import logging
+import sys
+import tempfile
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PLUGIN_ROOT = Path(tempfile.mkdtemp(prefix="gtm-tests-"))
+
+
+class FakeSettingsManager:
+    """
+    In-memory stand-in for Decky's SettingsManager.
+    """
+
+    def __init__(self, name: str, settings_directory: str | None = None):
+        self.settings = {}
+
+    def read(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def getSetting(self, key: str, defaults=None):
+        return self.settings.get(key, defaults)
+
+    def setSetting(self, key: str, value):
+        self.settings[key] = value
+
+
+def install_fake_decky(root: Path):
+    for name in ("plugin/bin", "runtime", "settings", "logs"):
+        (root / name).mkdir(parents=True, exist_ok=True)
+    decky = types.ModuleType("decky")
+    decky.DECKY_PLUGIN_DIR = str(root / "plugin")
+    decky.DECKY_PLUGIN_RUNTIME_DIR = str(root / "runtime")
+    decky.DECKY_PLUGIN_SETTINGS_DIR = str(root / "settings")
+    decky.DECKY_PLUGIN_LOG_DIR = str(root / "logs")
+    decky.logger = logging.getLogger("decky")
+    settings = types.ModuleType("settings")
+    settings.SettingsManager = FakeSettingsManager
+    sys.modules.setdefault("decky", decky)
+    sys.modules.setdefault("settings", settings)
+
+
+install_fake_decky(PLUGIN_ROOT)
+sys.path.insert(0, str(ROOT))
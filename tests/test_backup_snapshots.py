@@ -0,0 +1,117 @@
+import datetime
+
+import pytest
+
+from main import BackupSnapshotStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Make datetime.now() return a settable time, so each snapshot gets its own second.
+    """
+
+    class FakeDateTime(datetime.datetime):
+        current = datetime.datetime(2024, 1, 1, 12, 0, 0)
+
+        @classmethod
+        def now(cls, tz=None):
+            return cls.current
+
+    monkeypatch.setattr(datetime, "datetime", FakeDateTime)
+
+    def advance(**delta):
+        FakeDateTime.current += datetime.timedelta(**delta)
+
+    return advance
+
+
+def kinds(store: BackupSnapshotStore) -> list[str]:
+    return [snapshot["kind"] for snapshot in store.list()]
+
+
+def test_first_snapshot_is_full_and_later_ones_are_deltas(tmp_path, clock):
+    store = BackupSnapshotStore(str(tmp_path))
+    first = store.snapshot({"assignments": {"1": {"videoId": "a"}}})
+    clock(seconds=1)
+    second = store.snapshot({"assignments": {"1": {"videoId": "b"}, "2": {"videoId": "c"}}})
+    assert kinds(store) == ["full", "delta"]
+    assert store.state(first) == {"assignments": {"1": {"videoId": "a"}}}
+    assert store.state(second) == {"assignments": {"1": {"videoId": "b"}, "2": {"videoId": "c"}}}
+
+
+def test_deleted_keys_and_sections_are_replayed(tmp_path, clock):
+    store = BackupSnapshotStore(str(tmp_path))
+    store.snapshot({"assignments": {"1": {}, "2": {}}, "play_stats": {"a": {"plays": 1}}})
+    clock(seconds=1)
+    name = store.snapshot({"assignments": {"2": {}}})
+    assert store.state(name) == {"assignments": {"2": {}}, "play_stats": {}}
+
+
+def test_unchanged_state_writes_nothing(tmp_path, clock):
+    store = BackupSnapshotStore(str(tmp_path))
+    state = {"assignments": {"1": {"videoId": "a"}}}
+    first = store.snapshot(state)
+    clock(seconds=1)
+    assert store.snapshot(state) == first
+    assert len(store.list()) == 1
+
+
+def test_full_checkpoint_after_full_every_deltas(tmp_path, clock):
+    store = BackupSnapshotStore(str(tmp_path))
+    for index in range(6):
+        store.snapshot({"assignments": {"1": {"videoId": str(index)}}}, full_every=2)
+        clock(seconds=1)
+    assert kinds(store) == ["full", "delta", "delta", "full", "delta", "delta"]
+
+
+def test_missing_parent_is_reported(tmp_path, clock):
+    store = BackupSnapshotStore(str(tmp_path))
+    store.snapshot({"assignments": {"1": {}}})
+    clock(seconds=1)
+    name = store.snapshot({"assignments": {"2": {}}})
+    store.list()[0]["path"].unlink()
+    with pytest.raises(FileNotFoundError):
+        store.state(name)
+
+
+def test_deleting_a_parent_keeps_its_deltas_restorable(tmp_path, clock):
+    store = BackupSnapshotStore(str(tmp_path))
+    names = []
+    for index in range(3):
+        names.append(store.snapshot({"assignments": {str(key): {} for key in range(index + 1)}}))
+        clock(seconds=1)
+    store.delete({names[0]})
+    assert [snapshot["name"] for snapshot in store.list()] == names[1:]
+    assert kinds(store) == ["full", "delta"]
+    assert store.state(names[2]) == {"assignments": {"0": {}, "1": {}, "2": {}}}
+
+
+def test_prune_keeps_last_daily_and_weekly(tmp_path, clock):
+    store = BackupSnapshotStore(str(tmp_path))
+    names = []
+    # Two snapshots a day for 21 days
+    for index in range(42):
+        names.append(store.snapshot({"assignments": {"1": {"videoId": str(index)}}}))
+        clock(hours=12)
+    deleted = store.prune(keep_last=2, keep_daily=3, keep_weekly=2)
+    kept = [snapshot["name"] for snapshot in store.list()]
+    # Last two (Jan 22 00:00, Jan 21 12:00), newest of Jan 22, 21 and 20 (adds Jan 20 12:00),
+    # newest of the weeks starting Jan 22 and Jan 15 (already kept)
+    assert kept == [names[-4], names[-2], names[-1]]
+    assert deleted == len(names) - 3
+    for name in kept:
+        assert store.state(name)["assignments"]["1"]["videoId"] == str(names.index(name))
+
+
+def test_prune_keeps_weekly_rollups_of_older_weeks(tmp_path, clock):
+    store = BackupSnapshotStore(str(tmp_path))
+    names = []
+    # One snapshot a day for four weeks
+    for index in range(28):
+        names.append(store.snapshot({"assignments": {"1": {"videoId": str(index)}}}))
+        clock(days=1)
+    store.prune(keep_last=1, keep_daily=0, keep_weekly=3)
+    kept = [snapshot["name"] for snapshot in store.list()]
+    # Jan 1 2024 is a Monday, so the newest snapshots of the last three weeks are Sundays
+    assert kept == [names[13], names[20], names[27]]
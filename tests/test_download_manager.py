@@ -0,0 +1,233 @@
+import asyncio
+
+import pytest
+
+from main import DownloadManager, YtDlpJob
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_same_id_is_downloaded_once():
+    async def scenario():
+        manager = DownloadManager(size=2)
+        calls = []
+
+        async def download(job):
+            calls.append(job["id"])
+            await asyncio.sleep(0.01)
+
+        first = manager.enqueue("a", download)
+        second = manager.enqueue("a", download)
+        await asyncio.gather(first, second)
+        await manager.stop()
+        return calls, manager.completed
+
+    calls, completed = run(scenario())
+    assert calls == ["a"]
+    assert completed == 1
+
+
+def test_lower_priority_runs_first():
+    async def scenario():
+        manager = DownloadManager(size=1)
+        order = []
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def blocker(job):
+            started.set()
+            await release.wait()
+
+        def record(key):
+            async def download(job):
+                order.append(key)
+            return download
+
+        manager.enqueue("blocker", blocker)
+        await started.wait()
+        futures = [
+            manager.enqueue("background", record("background"), DownloadManager.PRIORITY_BACKGROUND),
+            manager.enqueue("normal", record("normal"), DownloadManager.PRIORITY_NORMAL),
+            manager.enqueue("focused", record("focused"), DownloadManager.PRIORITY_FOCUSED),
+        ]
+        release.set()
+        await asyncio.gather(*futures)
+        await manager.stop()
+        return order
+
+    assert run(scenario()) == ["focused", "normal", "background"]
+
+
+def test_priority_bump_of_a_queued_job():
+    async def scenario():
+        manager = DownloadManager(size=1)
+        order = []
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def blocker(job):
+            started.set()
+            await release.wait()
+
+        def record(key):
+            async def download(job):
+                order.append(key)
+            return download
+
+        manager.enqueue("blocker", blocker)
+        await started.wait()
+        first = manager.enqueue("first", record("first"), DownloadManager.PRIORITY_NORMAL)
+        late = manager.enqueue("late", record("late"), DownloadManager.PRIORITY_BACKGROUND)
+        bumped = manager.enqueue("late", record("late"), DownloadManager.PRIORITY_FOCUSED)
+        release.set()
+        await asyncio.gather(first, late, bumped)
+        await manager.stop()
+        return order
+
+    assert run(scenario()) == ["late", "first"]
+
+
+def test_cancelling_one_waiter_does_not_cancel_the_others():
+    async def scenario():
+        manager = DownloadManager(size=1)
+
+        async def download(job):
+            await asyncio.sleep(0.02)
+
+        cancelled = manager.enqueue("a", download)
+        kept = manager.enqueue("a", download)
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await kept
+        await manager.stop()
+        return cancelled.cancelled(), manager.completed
+
+    assert run(scenario()) == (True, 1)
+
+
+def test_worker_survives_a_cancelled_future():
+    async def scenario():
+        manager = DownloadManager(size=1)
+
+        async def fail(job):
+            await asyncio.sleep(0.01)
+            raise RuntimeError("broken download")
+
+        async def succeed(job):
+            pass
+
+        manager.enqueue("failing", fail).cancel()
+        manager.enqueue("succeeding", lambda job: asyncio.sleep(0.02)).cancel()
+        await asyncio.sleep(0.05)
+        assert all(not worker.done() for worker in manager.workers)
+        await asyncio.wait_for(manager.enqueue("next", succeed), timeout=1)
+        await manager.stop()
+        return manager.completed, manager.failed
+
+    assert run(scenario()) == (2, 1)
+
+
+def test_failure_is_reported_to_every_waiter():
+    async def scenario():
+        manager = DownloadManager(size=1)
+
+        async def fail(job):
+            raise RuntimeError("broken download")
+
+        first = manager.enqueue("a", fail)
+        second = manager.enqueue("a", fail)
+        results = await asyncio.gather(first, second, return_exceptions=True)
+        status = manager.status()
+        await manager.stop()
+        return results, status
+
+    results, status = run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert status["failed"] == 1
+    assert status["jobs"] == []
+
+
+def test_status_reports_progress():
+    async def scenario():
+        manager = DownloadManager(size=1)
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def download(job):
+            job["downloaded"], job["total"] = 50, 100
+            started.set()
+            await release.wait()
+
+        future = manager.enqueue("a", download)
+        await started.wait()
+        status = manager.status()
+        release.set()
+        await future
+        await manager.stop()
+        return status
+
+    status = run(scenario())
+    assert status["running"] == 1
+    assert status["jobs"][0] == {"id": "a", "status": "running", "priority": DownloadManager.PRIORITY_NORMAL,
+                                 "downloaded": 50, "total": 100}
+
+
+def test_stop_cancels_pending_downloads():
+    async def scenario():
+        manager = DownloadManager(size=1)
+        future = manager.enqueue("a", lambda job: asyncio.sleep(10))
+        await asyncio.sleep(0)
+        await manager.stop()
+        with pytest.raises(asyncio.CancelledError):
+            await future
+
+    run(scenario())
+
+
+def test_worker_progress_is_reported_before_the_result():
+    async def scenario():
+        job = YtDlpJob(worker=None, job_id=1)
+        download = {"downloaded": 0, "total": None}
+        job.on_progress = download.update
+        job.messages.put_nowait({"id": 1, "progress": {"downloaded": 10, "total": None}})
+        job.messages.put_nowait({"id": 1, "progress": {"downloaded": 40, "total": 100}})
+        job.messages.put_nowait({"id": 1, "done": True, "result": 0})
+        return await job.result(), download
+
+    assert run(scenario()) == (0, {"downloaded": 40, "total": 100})
+
+
+def test_cancel_drops_a_queued_download_only():
+    async def scenario():
+        manager = DownloadManager(size=1)
+        calls = []
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def blocker(job):
+            calls.append(job["id"])
+            started.set()
+            await release.wait()
+
+        async def download(job):
+            calls.append(job["id"])
+
+        running = manager.enqueue("running", blocker)
+        await started.wait()
+        dropped = manager.enqueue("dropped", download, DownloadManager.PRIORITY_BACKGROUND)
+        bumped = manager.enqueue("bumped", download, DownloadManager.PRIORITY_BACKGROUND)
+        manager.enqueue("bumped", download, DownloadManager.PRIORITY_FOCUSED)
+        results = (
+            manager.cancel("running"),
+            manager.cancel("dropped", DownloadManager.PRIORITY_BACKGROUND),
+            manager.cancel("bumped", DownloadManager.PRIORITY_BACKGROUND),
+        )
+        release.set()
+        await asyncio.gather(running, bumped)
+        await asyncio.sleep(0)
+        await manager.stop()
+        return results, dropped.cancelled(), calls
+
+    assert run(scenario()) == ((False, True, False), True, ["running", "bumped"])
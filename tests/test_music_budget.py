@@ -0,0 +1,80 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from conftest import FakeSettingsManager
+from main import MusicLibraryIndex, PlayStatsStore, Plugin, SidecarStore, ThemeDatabase
+
+
+def make_plugin(tmp_path, files: dict[str, int]) -> Plugin:
+    music = tmp_path / "music"
+    music.mkdir()
+    for index, (name, size) in enumerate(files.items()):
+        path = music / name
+        path.write_bytes(bytes(size))
+        os.utime(path, (1000 + index, 1000 + index))
+    plugin = Plugin()
+    plugin.settings = FakeSettingsManager("test")
+    plugin.music_path = str(music)
+    plugin.io_executor = ThreadPoolExecutor(max_workers=2)
+    plugin.music_index = MusicLibraryIndex(str(music))
+    plugin.music_index.reload()
+    plugin.theme_db = ThemeDatabase(str(tmp_path / "themes.db"))
+    plugin.theme_db.open()
+    plugin.play_stats = PlayStatsStore(plugin.theme_db, "play_stats")
+    plugin.play_stats.load()
+    plugin.audio_analysis = SidecarStore(plugin.theme_db, "audio_analysis")
+    plugin.track_info = SidecarStore(plugin.theme_db, "track_info")
+    return plugin
+
+
+def close(plugin: Plugin):
+    for store in (plugin.play_stats, plugin.audio_analysis, plugin.track_info):
+        store.save()
+    plugin.theme_db.close()
+    plugin.io_executor.shutdown()
+
+
+def remaining(tmp_path) -> list[str]:
+    return sorted(os.listdir(tmp_path / "music"))
+
+
+def test_only_downloaded_files_are_evicted(tmp_path):
+    # my_theme_01 is shaped like a YouTube ID but was imported before imports were recorded
+    plugin = make_plugin(tmp_path, {"my_theme_01.mp3": 100, "dQw4w9WgXcQ.webm": 100, "aaaaaaaaaaa.webm": 100})
+
+    async def scenario():
+        plugin.settings.setSetting("music_max_files", 1)
+        plugin.play_stats.set_downloaded("dQw4w9WgXcQ")
+        plugin.play_stats.set_downloaded("aaaaaaaaaaa")
+        plugin.play_stats.set_pinned("aaaaaaaaaaa", True)
+        try:
+            await plugin._enforce_music_budget()
+        finally:
+            close(plugin)
+
+    asyncio.run(scenario())
+    assert remaining(tmp_path) == ["aaaaaaaaaaa.webm", "my_theme_01.mp3"]
+
+
+def test_migration_records_assigned_downloads_once(tmp_path):
+    plugin = make_plugin(tmp_path, {"my_theme_01.mp3": 100, "dQw4w9WgXcQ.webm": 100, "itunes_42.m4a": 100})
+
+    async def scenario():
+        plugin.theme_db.set_assignments({
+            "1": {"videoId": "dQw4w9WgXcQ"},
+            "2": {"videoId": "itunes_42"},
+            "3": {"videoId": "local_my_theme_01"},
+        })
+        try:
+            await plugin._migrate_download_records()
+            downloaded = {stem for stem in ("my_theme_01", "dQw4w9WgXcQ", "itunes_42") if plugin.play_stats.is_downloaded(stem)}
+            plugin.theme_db.set_assignments({"4": {"videoId": "my_theme_01"}})
+            await plugin._migrate_download_records()
+            return downloaded, plugin.play_stats.is_downloaded("my_theme_01")
+        finally:
+            close(plugin)
+
+    downloaded, migrated_again = asyncio.run(scenario())
+    assert downloaded == {"dQw4w9WgXcQ", "itunes_42"}
+    assert not migrated_again
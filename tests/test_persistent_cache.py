@@ -0,0 +1,121 @@
+import asyncio
+import json
+import time
+
+import main
+from main import PersistentTTLCache, StreamUrlCache
+
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_entries_expire(tmp_path, monkeypatch):
+    clock = Clock(1000.0)
+    monkeypatch.setattr(main.time, "time", clock)
+
+    async def scenario():
+        cache = PersistentTTLCache(str(tmp_path / "cache.json"), default_ttl=60)
+        cache.put("short", 1, expires=1010)
+        cache.put("default", 2)
+        assert cache.get("short") == 1
+        clock.now = 1010
+        assert cache.get("short") is None
+        assert "short" not in cache.entries
+        assert cache.get("default") == 2
+        clock.now = 1061
+        assert cache.get("default") is None
+        cache.save()
+
+    run(scenario())
+
+
+def test_already_expired_values_are_not_stored(tmp_path, monkeypatch):
+    monkeypatch.setattr(main.time, "time", Clock(1000.0))
+
+    async def scenario():
+        cache = PersistentTTLCache(str(tmp_path / "cache.json"))
+        cache.put("stale", 1, expires=999)
+        cache.save()
+        return cache.entries
+
+    assert run(scenario()) == {}
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    async def scenario():
+        cache = PersistentTTLCache(str(tmp_path / "cache.json"), max_entries=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        cache.save()
+        return list(cache.entries)
+
+    assert run(scenario()) == ["a", "c"]
+
+
+def test_save_and_load_drop_expired_entries(tmp_path, monkeypatch):
+    clock = Clock(1000.0)
+    monkeypatch.setattr(main.time, "time", clock)
+    path = str(tmp_path / "cache.json")
+
+    async def scenario():
+        cache = PersistentTTLCache(path)
+        cache.put("kept", "value", expires=2000)
+        cache.put("dropped", "value", expires=1100)
+        cache.save()
+
+    run(scenario())
+    clock.now = 1500
+    cache = PersistentTTLCache(path)
+    cache.load()
+    assert cache.get("kept") == "value"
+    assert list(cache.entries) == ["kept"]
+
+
+def test_load_ignores_a_corrupt_file(tmp_path):
+    path = tmp_path / "cache.json"
+    path.write_text("{not json")
+    cache = PersistentTTLCache(str(path))
+    cache.load()
+    assert cache.entries == {}
+
+
+def test_writes_are_batched(tmp_path):
+    path = tmp_path / "cache.json"
+
+    async def scenario():
+        cache = PersistentTTLCache(str(path))
+        cache.put("a", 1)
+        handle = cache.save_handle
+        cache.put("b", 2)
+        assert cache.save_handle is handle
+        assert not path.exists()
+        cache.save()
+        assert cache.save_handle is None
+
+    run(scenario())
+    assert set(json.loads(path.read_text())) == {"a", "b"}
+
+
+def test_stream_url_expires_with_the_url(tmp_path):
+    async def scenario():
+        cache = StreamUrlCache(str(tmp_path / "urls.json"), margin=300)
+        expire = int(time.time()) + 3600
+        cache.put("video", f"https://rr1---sn.googlevideo.com/videoplayback?expire={expire}&id=1")
+        cache.put("plain", "https://example.com/audio.webm")
+        cache.save()
+        return cache.entries, expire
+
+    entries, expire = run(scenario())
+    assert entries["video"]["expires"] == expire - 300
+    assert entries["plain"]["expires"] > time.time() + 3000
@@ -0,0 +1,85 @@
+from main import LibrarySearchIndex
+
+
+def build(documents: dict[str, dict[str, str]]) -> LibrarySearchIndex:
+    index = LibrarySearchIndex()
+    for doc_id, fields in documents.items():
+        index.add(doc_id, fields)
+    return index
+
+
+def ids(results: list[tuple[str, float]]) -> list[str]:
+    return [doc_id for doc_id, _ in results]
+
+
+def test_tokenize_folds_accents_and_separators():
+    assert LibrarySearchIndex.tokenize("Pokémon_Red-Version (1996)") == ["pokemon", "red", "version", "1996"]
+
+
+def test_exact_match_beats_prefix_and_typo():
+    index = build({
+        "exact": {"name": "castlevania"},
+        "prefix": {"name": "castlevanias"},
+        "typo": {"name": "castelvania"},
+        "other": {"name": "mario"},
+    })
+    assert ids(index.search("castlevania", 10)) == ["exact", "prefix", "typo"]
+
+
+def test_last_word_matches_as_prefix_while_typing():
+    index = build({"hollow": {"name": "hollow_knight_theme"}, "holiday": {"name": "holiday"}})
+    assert ids(index.search("hollow kni", 10))[0] == "hollow"
+    assert set(ids(index.search("hol", 10))) == {"hollow", "holiday"}
+
+
+def test_documents_matching_more_words_rank_first():
+    index = build({
+        "both": {"name": "super_mario_galaxy"},
+        "one": {"name": "mario"},
+        "other": {"name": "galaxy"},
+    })
+    assert ids(index.search("mario galaxy", 10))[0] == "both"
+
+
+def test_rare_words_count_more_than_common_ones():
+    index = build({
+        "rare": {"name": "theme_celeste"},
+        **{f"common{i}": {"name": f"theme_{i}"} for i in range(20)},
+    })
+    results = index.search("theme celeste", 5)
+    assert results[0][0] == "rare"
+    assert results[0][1] > results[1][1]
+
+
+def test_shorter_names_rank_higher_for_the_same_word():
+    index = build({"short": {"name": "portal"}, "long": {"name": "portal_still_alive_end_credits"}})
+    assert ids(index.search("portal", 10)) == ["short", "long"]
+
+
+def test_tag_fields_are_weighted_below_the_name():
+    index = build({"named": {"name": "doom"}, "album": {"name": "track01", "album": "doom"}})
+    assert ids(index.search("doom", 10)) == ["named", "album"]
+
+
+def test_limit_is_applied():
+    index = build({f"song{i}": {"name": f"song_{i}"} for i in range(50)})
+    assert len(index.search("song", 7)) == 7
+
+
+def test_replacing_and_removing_documents():
+    index = build({"a": {"name": "halo"}})
+    index.add("a", {"name": "metroid"})
+    assert index.search("halo", 10) == []
+    assert ids(index.search("metroid", 10)) == ["a"]
+    index.remove("a")
+    assert index.search("metroid", 10) == []
+    assert index.vocabulary == []
+    assert index.postings == {}
+    assert index.trigrams == {}
+
+
+def test_queries_without_words_match_nothing():
+    index = build({"a": {"name": "halo"}})
+    assert index.search("", 10) == []
+    assert index.search("!!", 10) == []
+    assert index.search("zzzz", 10) == []
@@ -0,0 +1,146 @@
+import asyncio
+import random
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from main import MusicLibraryIndex, Plugin, SidecarStore, ThemeDatabase, TrackMetadataReader
+
+
+def wav(seconds: float, tags: dict[bytes, str]) -> bytes:
+    byte_rate = 8000 * 2
+    fmt = struct.pack("<HHIIHH", 1, 1, 8000, byte_rate, 2, 16)
+    info = b"INFO"
+    for key, value in tags.items():
+        text = value.encode() + b"\x00"
+        info += key + struct.pack("<I", len(text)) + text + (b"\x00" if len(text) & 1 else b"")
+    data = bytes(int(seconds * byte_rate))
+    body = (b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+            + b"LIST" + struct.pack("<I", len(info)) + info
+            + b"data" + struct.pack("<I", len(data)) + data)
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def flac(seconds: int, comments: dict[str, str]) -> bytes:
+    sample_rate = 44100
+    streaminfo = bytearray(34)
+    streaminfo[10:18] = ((sample_rate << 44) | (2 - 1) << 41 | (16 - 1) << 36 | seconds * sample_rate).to_bytes(8, "big")
+    vendor = b"test"
+    block = struct.pack("<I", len(vendor)) + vendor + struct.pack("<I", len(comments))
+    for key, value in comments.items():
+        entry = f"{key}={value}".encode()
+        block += struct.pack("<I", len(entry)) + entry
+    return (b"fLaC" + bytes([0]) + len(streaminfo).to_bytes(3, "big") + bytes(streaminfo)
+            + bytes([0x84]) + len(block).to_bytes(3, "big") + block)
+
+
+def id3_frame(frame_id: str, text: str) -> bytes:
+    body = b"\x03" + text.encode()
+    return frame_id.encode() + struct.pack(">I", len(body)) + b"\x00\x00" + body
+
+
+def mp3(frames: int, tags: dict[str, str]) -> bytes:
+    tag = b"".join(id3_frame(frame_id, text) for frame_id, text in tags.items())
+    size = len(tag)
+    syncsafe = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+    # MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, no padding: 417 byte frames
+    frame = b"\xff\xfb\x90\x00" + bytes(413)
+    return b"ID3\x03\x00\x00" + syncsafe + tag + frame * frames
+
+
+def box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I", 8 + len(payload)) + box_type + payload
+
+
+def mp4(seconds: int, tags: dict[bytes, str]) -> bytes:
+    mvhd = box(b"mvhd", bytes(4) + bytes(8) + struct.pack(">II", 1000, seconds * 1000) + bytes(80))
+    items = b"".join(box(key, box(b"data", struct.pack(">I", 1) + bytes(4) + value.encode())) for key, value in tags.items())
+    meta = box(b"meta", bytes(4) + box(b"hdlr", bytes(25)) + box(b"ilst", items))
+    return box(b"ftyp", b"M4A " + bytes(4)) + box(b"moov", mvhd + box(b"udta", meta)) + box(b"mdat", bytes(64))
+
+
+SAMPLES = {
+    "wav": (wav(2.5, {b"INAM": "Title", b"IART": "Artist", b"IPRD": "Album"}), 2.5),
+    "flac": (flac(3, {"TITLE": "Title", "artist": "Artist", "ALBUM": "Album"}), 3.0),
+    "mp3": (mp3(100, {"TIT2": "Title", "TPE1": "Artist", "TALB": "Album"}), 100 * 417 * 8 / 128000),
+    "mp4": (mp4(7, {b"\xa9nam": "Title", b"\xa9ART": "Artist", b"\xa9alb": "Album"}), 7.0),
+}
+
+
+@pytest.mark.parametrize("name", SAMPLES)
+def test_reads_duration_and_tags(tmp_path, name):
+    data, duration = SAMPLES[name]
+    path = tmp_path / f"sample.{name}"
+    path.write_bytes(data)
+    info = TrackMetadataReader.read(str(path))
+    assert info["format"] == name
+    assert info["duration"] == pytest.approx(duration, abs=0.01)
+    assert (info["title"], info["artist"], info["album"]) == ("Title", "Artist", "Album")
+
+
+def test_id3_length_frame_wins_over_the_frame_estimate(tmp_path):
+    path = tmp_path / "sample.mp3"
+    path.write_bytes(mp3(10, {"TLEN": "123456"}))
+    assert TrackMetadataReader.read(str(path))["duration"] == 123.456
+
+
+def test_unknown_format_returns_empty_fields(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_bytes(b"just some text")
+    assert TrackMetadataReader.read(str(path)) == {
+        "format": None, "duration": None, "title": None, "artist": None, "album": None
+    }
+
+
+@pytest.mark.parametrize("name", SAMPLES)
+def test_truncated_and_corrupted_files_do_not_raise(tmp_path, name):
+    data, _ = SAMPLES[name]
+    path = tmp_path / f"broken.{name}"
+    generator = random.Random(name)
+    for _ in range(200):
+        broken = bytearray(data[:generator.randint(0, len(data))])
+        for _ in range(generator.randint(0, 8)):
+            if broken:
+                broken[generator.randrange(len(broken))] = generator.randrange(256)
+        path.write_bytes(bytes(broken))
+        info = TrackMetadataReader.read(str(path))
+        assert set(info) == {"format", "duration", "title", "artist", "album"}
+        assert info["duration"] is None or info["duration"] > 0
+
+
+def test_scan_skips_files_the_parser_fails_on(tmp_path, monkeypatch):
+    music = tmp_path / "music"
+    music.mkdir()
+    (music / "good.wav").write_bytes(SAMPLES["wav"][0])
+    (music / "bad.wav").write_bytes(SAMPLES["wav"][0])
+    read = TrackMetadataReader.read
+
+    def flaky_read(path: str) -> dict:
+        if path.endswith("bad.wav"):
+            raise RuntimeError("parser bug")
+        return read(path)
+
+    monkeypatch.setattr(TrackMetadataReader, "read", staticmethod(flaky_read))
+
+    async def scenario():
+        plugin = Plugin()
+        plugin.music_path = str(music)
+        plugin.io_executor = ThreadPoolExecutor(max_workers=2)
+        plugin.music_index = MusicLibraryIndex(str(music))
+        plugin.music_index.reload()
+        database = ThemeDatabase(str(tmp_path / "themes.db"))
+        database.open()
+        plugin.track_info = SidecarStore(database, "track_info")
+        plugin.track_info.load()
+        try:
+            await plugin._scan_track_info()
+            return await plugin._read_track_info("bad"), plugin.track_info.get("good", plugin.music_index.get("good"))
+        finally:
+            plugin.track_info.save()
+            database.close()
+            plugin.io_executor.shutdown()
+
+    bad, good = asyncio.run(scenario())
+    assert bad is None
+    assert good["title"] == "Title"
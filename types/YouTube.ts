@@ -3,6 +3,7 @@ export type YouTubeVideo = { id: string; url?: string };
 export type YouTubeVideoPreview = YouTubeVideo & {
   title: string;
   thumbnail: string;
+  duration?: number;
 };
 
 export type YouTubeInitialData = {